@@ -20,8 +20,8 @@ import redis.asyncio as aioredis
 # Add project root to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from shared.pattern_logic import count_keywords, count_words
-from shared.python.redis_client import get_redis_sync
+from shared.python.pattern_logic import get_keyword_hits, count_words, kw_field, hour_field
+from shared.python.redis_client import REDIS_URL
 
 # Setup logging
 logging.basicConfig(
@@ -32,11 +32,9 @@ logging.basicConfig(
 logger = logging.getLogger("BackfillPatterns")
 
 # Define redis helpers locally to avoid dependency on Cog instance
-def K_KW(gid, uid, date, group):  return f"pat:kw:{gid}:{uid}:{date}:{group}"
-def K_MSG(gid, uid, date):        return f"pat:msg:{gid}:{uid}:{date}"
+def K_DAY(gid, uid, date):        return f"pat:day:{gid}:{uid}:{date}"
 def K_FIRST(gid, uid):            return f"pat:first_msg:{gid}:{uid}"
 def K_JOIN(gid, uid):             return f"pat:user_join:{gid}:{uid}"
-def K_HOUR(gid, uid, date):       return f"pat:hour:{gid}:{uid}:{date}"
 
 PAT_TTL = 730 * 86400  # 2 years TTL
 
@@ -144,12 +142,9 @@ class BackfillPatternsClient(discord.Client):
                         }
 
                     # Keyword scanning
-                    from shared.pattern_logic import KEYWORD_GROUPS
-                    for group in KEYWORD_GROUPS:
-                        hits = count_keywords(text, group)
-                        if hits > 0:
-                            buffer[(uid, date_str, "kw", group)] += hits
-                            total_hits += hits
+                    for group, hits in get_keyword_hits(text).items():
+                        buffer[(uid, date_str, "kw", group)] += hits
+                        total_hits += hits
 
                     chan_msgs += 1
                     total_msgs += 1
@@ -188,19 +183,17 @@ class BackfillPatternsClient(discord.Client):
         
         # Flush keyword hits and hourly counts
         for (uid, date, btype, subtype), count in buffer.items():
+            key = K_DAY(gid, uid, date)
             if btype == "kw":
-                key = K_KW(gid, uid, date, subtype)
-                pipe.incrby(key, count)
-                pipe.expire(key, PAT_TTL)
+                pipe.hincrby(key, kw_field(subtype), count)
             elif btype == "hour":
-                key = K_HOUR(gid, uid, date)
-                pipe.hincrby(key, subtype, count)
-                pipe.expire(key, PAT_TTL)
+                pipe.hincrby(key, hour_field(int(subtype)), count)
+            pipe.expire(key, PAT_TTL)
         buffer.clear()
 
         # Flush message stats
         for (uid, date), s in stats.items():
-            key = K_MSG(gid, uid, date)
+            key = K_DAY(gid, uid, date)
             pipe.hincrby(key, "word_count", s["wc"])
             pipe.hincrby(key, "msg_count", s["mc"])
             pipe.hincrby(key, "char_count", s["cc"])
@@ -187,6 +187,10 @@ class BackfillClient(discord.Client):
         await self.redis.expire(progress_key, 3600)  # Keep for 1 hour
         print(f"Backfill completed: {msg_count} messages, {audit_ops} actions.")
 
+        # Dashboard aggregations read the packed day buckets, regenerate them from the sorted sets
+        from rebuild_event_buckets import rebuild_event_buckets
+        await rebuild_event_buckets(gid, self.days + 1)
+
 if __name__ == "__main__":
     client = BackfillClient(args.guild_id, args.days)
     client.run(args.token)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Discourse Publisher Benchmark
+Simulates a scan that produces --alerts Discourse alert cards (some users
+twice) and compares:
+
+  before  one publish per alert, awaited by the scan (the old per-alert
+          `rails runner`, each paying the Rails boot)
+  after   the scan only enqueues into DiscoursePublishQueue; drain() then
+          publishes batches through the same stub
+
+The stub publisher stands in for Discourse: every publish() call costs
+--boot-s (Rails boot) plus --post-ms per post and fails the first attempt
+of every --fail-every'th user, so retries are exercised.
+
+Uses Redis at --redis-url, or an in-memory fakeredis if that is installed
+and no URL is given.
+
+Usage:
+  python scripts/benchmarks/bench_discourse_publisher.py [--alerts 50] [--boot-s 2] [--post-ms 50]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import shared.python.discourse_publisher as dp
+from shared.python.discourse_publisher import DiscoursePublishQueue, PublishResult, drain
+
+
+class StubPublisher:
+    def __init__(self, boot_s: float, post_ms: int, fail_every: int):
+        self.boot_s = boot_s
+        self.post_ms = post_ms
+        self.fail_every = fail_every
+        self.calls = 0
+        self.posts = []  # (user_id, topic_id, raw)
+        self.topics = {}  # title -> topic id
+        self._failed_once = set()
+
+    async def publish(self, jobs):
+        self.calls += 1
+        await asyncio.sleep(self.boot_s)
+        results = {}
+        for job in jobs:
+            await asyncio.sleep(self.post_ms / 1000)
+            if self.fail_every and job.user_id % self.fail_every == 0 and job.user_id not in self._failed_once:
+                self._failed_once.add(job.user_id)
+                results[job.user_id] = PublishResult(error="stub: temporary failure")
+                continue
+            topic_id = job.topic_id or self.topics.get(job.title)
+            created = not topic_id
+            if created:
+                topic_id = self.topics[job.title] = 1000 + len(self.topics)
+            self.posts.append((job.user_id, topic_id, job.raw))
+            results[job.user_id] = PublishResult(topic_id, created)
+        return results
+
+
+async def get_redis_factory(url: str):
+    if url:
+        import redis.asyncio as aioredis
+        pool = aioredis.ConnectionPool.from_url(url, decode_responses=True)
+        return lambda: _async(aioredis.Redis(connection_pool=pool))
+    import fakeredis
+    import fakeredis.aioredis
+    server = fakeredis.FakeServer()
+    return lambda: _async(fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+
+
+async def _async(value):
+    return value
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--alerts", type=int, default=50)
+    parser.add_argument("--boot-s", type=float, default=2.0, help="Stub Rails boot per publish call")
+    parser.add_argument("--post-ms", type=int, default=50, help="Stub cost per post")
+    parser.add_argument("--fail-every", type=int, default=10, help="Fail the first attempt of every n-th user (0 = never)")
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL"))
+    args = parser.parse_args()
+
+    # Users 1..n, the first few alerting twice in the same scan
+    alerts = [(uid, f"Karta: user{uid}", f"scan card for {uid}") for uid in range(1, args.alerts + 1)]
+    alerts += [(uid, f"Karta: user{uid}", f"updated card for {uid}") for uid in range(1, args.alerts // 10 + 1)]
+
+    # Before: every alert published inline by the scan
+    before = StubPublisher(args.boot_s, args.post_ms, 0)
+    started = time.perf_counter()
+    for uid, title, raw in alerts:
+        await before.publish([dp.PublishJob(uid, title, raw)])
+    scan_before = time.perf_counter() - started
+
+    # After: enqueue during the scan, drain in batches (retries due immediately)
+    dp.RETRY_BASE = 0
+    get_redis = await get_redis_factory(args.redis_url)
+    queue = DiscoursePublishQueue(get_redis)
+    r = await get_redis()
+    await r.delete(dp.K_PUBLISH_QUEUE, dp.K_PUBLISH_JOBS, dp.K_PUBLISH_FAILED)
+
+    after = StubPublisher(args.boot_s, args.post_ms, args.fail_every)
+    started = time.perf_counter()
+    for uid, title, raw in alerts:
+        await queue.enqueue(uid, title, raw)
+    scan_after = time.perf_counter() - started
+
+    topics = {}
+    totals = {"published": 0, "retried": 0, "failed": 0}
+    while await queue.depth():
+        counts = await drain(queue, after, lookup_topics=lambda uids: _async({u: topics[u] for u in uids if u in topics}))
+        topics.update(counts["topics"])
+        for k in totals:
+            totals[k] += counts[k]
+    published_after = time.perf_counter() - started
+
+    users = {uid for uid, _, _ in alerts}
+    latest = {uid: raw for uid, _, raw in alerts}
+    posted = {uid: raw for uid, _, raw in after.posts}
+    ok = set(posted) == users and posted == latest and len(after.posts) == len(users)
+
+    print(f"{len(alerts)} alerts for {len(users)} users, stub boot {args.boot_s}s + {args.post_ms} ms/post")
+    print(f"Before: scan blocked {scan_before:>7.2f}s, {before.calls} publish calls, {len(before.posts)} posts")
+    print(f"After:  scan blocked {scan_after:>7.2f}s, all published after {published_after:.2f}s, "
+          f"{after.calls} publish calls, {len(after.posts)} posts, {totals['retried']} retried, {totals['failed']} failed")
+    print(f"One post per user with the latest card: {'yes' if ok else 'NO'}")
+    await r.aclose()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
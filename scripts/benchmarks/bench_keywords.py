@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Keyword Matcher Benchmark
+Compares the original per-group keyword counting (normalize + regex/substring
+search for every group) with the precompiled single-pass KeywordMatcher in
+shared/python/pattern_logic.py, and verifies both return identical hits.
+
+Usage:
+  python scripts/benchmarks/bench_keywords.py [--messages 20000] [--corpus file.txt]
+
+--corpus takes a UTF-8 file with one message per line (e.g. an export of real
+messages); without it a synthetic Czech corpus is generated.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from shared.python.pattern_logic import KEYWORD_GROUPS, SHORT_WORDS, normalize_text, get_keyword_hits
+
+FILLER = (
+    "dneska jsem měl docela těžký den v práci a večer jsem byl unavený ale "
+    "vydržel jsem díky tomu že jsem šel ven na procházku se psem potom jsem "
+    "si četl knížku a šel spát brzo zítra mě čeká další den tak uvidíme jak "
+    "to půjde chci poděkovat všem tady za podporu hodně mi to pomáhá moc "
+    "díky kluci jste skvělá parta myslím že tentokrát to vyjde protože mám "
+    "lepší plán než minule"
+).split()
+PUNCT = [".", ",", "!", "?", "...", ":)", " 😊", ""]
+
+
+def reference_count_keywords(text: str, group: str) -> int:
+    """Original implementation: normalize and search once per group."""
+    norm = normalize_text(text)
+    if not norm:
+        return 0
+    count = 0
+    for kw in KEYWORD_GROUPS.get(group, []):
+        if len(kw) <= 4 or kw in SHORT_WORDS:
+            count += len(re.findall(rf"\b{re.escape(kw)}\b", norm))
+        else:
+            count += norm.count(kw)
+    return count
+
+
+def reference_keyword_hits(text: str) -> dict:
+    hits = {}
+    for group in KEYWORD_GROUPS:
+        count = reference_count_keywords(text, group)
+        if count > 0:
+            hits[group] = count
+    return hits
+
+
+def synthetic_corpus(n: int, seed: int = 42) -> list:
+    """Czech-like messages mixing filler words with keywords, casing and punctuation."""
+    rnd = random.Random(seed)
+    keywords = [kw for kws in KEYWORD_GROUPS.values() for kw in kws]
+    corpus = []
+    for _ in range(n):
+        words = []
+        for _ in range(rnd.choice([3, 8, 15, 30, 60, 120])):
+            if rnd.random() < 0.12:
+                kw = rnd.choice(keywords)
+                # Glue keywords to neighbours sometimes to exercise word boundaries
+                if rnd.random() < 0.15:
+                    kw = kw + rnd.choice(["ní", "x", "_", "1"])
+                words.append(kw.upper() if rnd.random() < 0.1 else kw)
+            else:
+                words.append(rnd.choice(FILLER))
+            if rnd.random() < 0.1:
+                words[-1] += rnd.choice(PUNCT)
+        corpus.append(rnd.choice([" ", "  ", "\n"]).join(words))
+    return corpus
+
+
+def bench(fn, corpus: list, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for msg in corpus:
+            fn(msg)
+        best = min(best, time.perf_counter() - start)
+    return len(corpus) / best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--corpus", type=str, help="File with one message per line")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = [line.rstrip("\n") for line in f if line.strip()]
+    else:
+        corpus = synthetic_corpus(args.messages)
+
+    mismatches = [m for m in corpus if reference_keyword_hits(m) != get_keyword_hits(m)]
+    print(f"Corpus: {len(corpus)} messages, {sum(len(m) for m in corpus) // max(1, len(corpus))} chars avg")
+    print(f"Equivalence: {len(corpus) - len(mismatches)}/{len(corpus)} identical")
+    for m in mismatches[:5]:
+        print(f"  MISMATCH {m[:80]!r}: {reference_keyword_hits(m)} != {get_keyword_hits(m)}")
+
+    before = bench(reference_keyword_hits, corpus, args.rounds)
+    after = bench(get_keyword_hits, corpus, args.rounds)
+    print(f"Per-group (before): {before:>10,.0f} msg/s")
+    print(f"Single-pass (after): {after:>9,.0f} msg/s  ({after / before:.1f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Local LLM Scheduler Benchmark
+Floods a stub of Ollama's /api/generate with background sentiment prompts
+and, half way through, presses the "AI draft" button. Runs the original
+pattern (one task and one httpx client per message behind a semaphore) and
+shared/python/llm_scheduler.py against the same stub and prints how long the
+interactive draft waited, how many sentiment jobs were answered or dropped
+and the peak number of pending jobs held in memory.
+
+The stub answers one request at a time (like a CPU-bound model) after
+--gen-ms, and checks every request carries keep_alive.
+
+Usage:
+  python scripts/benchmarks/bench_llm_scheduler.py [--messages 300] [--gen-ms 40] [--rate 100] [--max-age 2]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from aiohttp import web
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from shared.python.llm_scheduler import LLMJobDropped, LLMScheduler, Priority
+
+SENTIMENT_MODEL = "llama3.2:3b"
+DRAFT_MODEL = "llama3.2:1b"
+
+
+async def start_stub(gen_ms: int):
+    """Single-slot /api/generate stand-in; returns (runner, base_url, stats)."""
+    stats = {"requests": 0, "keep_alive": 0, "max_inflight": 0}
+    inflight = 0
+    slot = asyncio.Lock()
+
+    async def generate(request):
+        nonlocal inflight
+        body = await request.json()
+        stats["requests"] += 1
+        stats["keep_alive"] += "keep_alive" in body
+        inflight += 1
+        stats["max_inflight"] = max(stats["max_inflight"], inflight)
+        try:
+            async with slot:
+                await asyncio.sleep(gen_ms / 1000)
+        finally:
+            inflight -= 1
+        text = "NEUTRAL" if body.get("model") == SENTIMENT_MODEL else "Ahoj, jak se dnes máš?"
+        return web.json_response({"model": body.get("model"), "response": text, "done": True})
+
+    app = web.Application()
+    app.router.add_post("/api/generate", generate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", stats
+
+
+async def run_legacy(base: str, args) -> dict:
+    semaphore = asyncio.Semaphore(1)
+    result = {"answered": 0, "dropped": 0, "peak_pending": 0}
+    pending = set()
+
+    async def call(model, timeout):
+        async with semaphore:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                response = await client.post(f"{base}/api/generate", json={"model": model, "prompt": "x", "stream": False})
+                response.raise_for_status()
+                return response.json()["response"]
+
+    async def sentiment():
+        try:
+            await call(SENTIMENT_MODEL, 10.0)
+            result["answered"] += 1
+        except Exception:
+            result["dropped"] += 1
+
+    async def draft():
+        started = time.perf_counter()
+        await call(DRAFT_MODEL, 120.0)
+        result["draft_ms"] = (time.perf_counter() - started) * 1000
+
+    draft_task = None
+    for i in range(args.messages):
+        task = asyncio.create_task(sentiment())
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        result["peak_pending"] = max(result["peak_pending"], len(pending))
+        if i == args.messages // 2:
+            draft_task = asyncio.create_task(draft())
+        await asyncio.sleep(1 / args.rate)
+    await draft_task
+    await asyncio.gather(*pending)
+    return result
+
+
+async def run_scheduler(base: str, args) -> dict:
+    llm = LLMScheduler(host=base, max_queue=args.queue)
+    result = {"answered": 0, "dropped": 0, "peak_pending": 0}
+    pending = set()
+
+    async def sentiment(job):
+        try:
+            await job
+            result["answered"] += 1
+        except LLMJobDropped:
+            result["dropped"] += 1
+
+    async def draft():
+        started = time.perf_counter()
+        await llm.generate(DRAFT_MODEL, "x", Priority.DRAFT)
+        result["draft_ms"] = (time.perf_counter() - started) * 1000
+
+    draft_task = None
+    for i in range(args.messages):
+        try:
+            job = llm.submit(SENTIMENT_MODEL, "x", Priority.SENTIMENT, timeout=10.0, max_age=args.max_age)
+        except LLMJobDropped:
+            result["dropped"] += 1
+        else:
+            task = asyncio.create_task(sentiment(job))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        result["peak_pending"] = max(result["peak_pending"], len(pending))
+        if i == args.messages // 2:
+            draft_task = asyncio.create_task(draft())
+        await asyncio.sleep(1 / args.rate)
+    await draft_task
+    await asyncio.gather(*pending)
+    result["metrics"] = llm.metrics()
+    await llm.close()
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300, help="Sentiment prompts to submit")
+    parser.add_argument("--rate", type=float, default=100, help="Messages per second")
+    parser.add_argument("--gen-ms", type=int, default=40, help="Stub generation time per request")
+    parser.add_argument("--queue", type=int, default=64, help="Scheduler queue bound")
+    parser.add_argument("--max-age", type=float, default=2.0, help="Sentiment deadline in seconds")
+    args = parser.parse_args()
+
+    runner, base, stub = await start_stub(args.gen_ms)
+    try:
+        print(f"{args.messages} messages at {args.rate:.0f}/s, stub {args.gen_ms} ms per generation")
+        before = await run_legacy(base, args)
+        legacy_requests = stub["requests"]
+        after = await run_scheduler(base, args)
+    finally:
+        await runner.cleanup()
+
+    m = after["metrics"]
+    print(f"{'':<22}{'draft wait':>12}{'answered':>10}{'dropped':>9}{'peak pending':>14}")
+    for name, res in (("Semaphore (before)", before), ("Scheduler (after)", after)):
+        print(f"{name:<22}{res['draft_ms']:>10.0f}ms{res['answered']:>10}{res['dropped']:>9}{res['peak_pending']:>14}")
+    print(f"Scheduler: expired {m['sentiment_expired']}, rejected {m['sentiment_rejected']}, "
+          f"sentiment wait p95 {m['sentiment_wait_p95_ms']:.0f} ms, draft wait p95 {m['draft_wait_p95_ms']:.0f} ms")
+    print(f"Stub: max in-flight {stub['max_inflight']}, keep_alive on "
+          f"{stub['keep_alive']}/{stub['requests'] - legacy_requests} scheduler requests")
+    return 0 if after["draft_ms"] <= before["draft_ms"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+NSFW Avatar Scan Benchmark
+Runs the original one-at-a-time avatar scan (download, preprocess, single
+image inference with one thread) and the batched pipeline from
+shared/python/nsfw_scan.py over the same images, checks both produce the
+same scores and prints the throughput of each.
+
+Images come from a local directory and are served by a small aiohttp
+server standing in for the Discord CDN (with optional per-request latency),
+so the download stage is exercised too.
+
+Usage:
+  python scripts/benchmarks/bench_nsfw_scan.py --model nsfw_model.onnx [--images dir/] [--latency-ms 80]
+
+Without --images, 200 synthetic avatars are generated into a temp directory.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from shared.python.nsfw_scan import NSFWScorer, load_session, preprocess, scan_images
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".gif")
+
+
+def synthetic_images(directory: str, n: int, seed: int = 7):
+    rnd = np.random.default_rng(seed)
+    for i in range(n):
+        size = int(rnd.choice([128, 256, 512]))
+        arr = rnd.integers(0, 255, (size, size, 3), dtype=np.uint8)
+        Image.fromarray(arr).save(os.path.join(directory, f"avatar_{i:04d}.png"))
+
+
+async def start_cdn(directory: str, latency_ms: int):
+    """Serve `directory` over HTTP with a fixed per-request delay."""
+    async def handler(request):
+        path = os.path.join(directory, os.path.basename(request.match_info["name"]))
+        if not os.path.exists(path):
+            return web.Response(status=404)
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000 * random.uniform(0.5, 1.5))
+        with open(path, "rb") as f:
+            return web.Response(body=f.read(), content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="nsfw_model.onnx")
+    parser.add_argument("--images", help="Directory with avatar images")
+    parser.add_argument("--count", type=int, default=200, help="Synthetic images without --images")
+    parser.add_argument("--latency-ms", type=int, default=80, help="Simulated CDN latency per request")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=16)
+    args = parser.parse_args()
+
+    tmp = None
+    directory = args.images
+    if not directory:
+        tmp = tempfile.TemporaryDirectory()
+        directory = tmp.name
+        synthetic_images(directory, args.count)
+    names = sorted(f for f in os.listdir(directory) if f.lower().endswith(IMAGE_EXTS))
+
+    runner, base = await start_cdn(directory, args.latency_ms)
+    http = aiohttp.ClientSession()
+
+    async def fetch(url):
+        async with http.get(url, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+            return await resp.read() if resp.status == 200 else None
+
+    urls = [f"{base}/{name}" for name in names]
+    print(f"Images: {len(urls)} from {directory}, CDN latency ~{args.latency_ms} ms")
+
+    try:
+        # Original: one member at a time, preprocessing and inference on the loop, 1 thread
+        single = load_session(args.model, threads=1)
+        input_name = single.get_inputs()[0].name
+        reference = {}
+        started = time.perf_counter()
+        for url in urls:
+            img_bytes = await fetch(url)
+            arr = preprocess(img_bytes) if img_bytes else None
+            if arr is not None:
+                reference[url] = [float(x) for x in single.run(None, {input_name: arr[None]})[0][0]]
+        before = len(urls) / (time.perf_counter() - started)
+
+        # Pipeline
+        scorer = NSFWScorer(load_session(args.model))
+        pipelined = {}
+
+        async def on_result(result):
+            if result.scores is not None:
+                pipelined[result.url] = result.scores
+
+        async def on_progress(stats):
+            print(f"  {stats.summary()}")
+
+        stats = await scan_images(
+            [(url, url) for url in urls], fetch, scorer, on_result=on_result, on_progress=on_progress,
+            concurrency=args.concurrency, batch_size=args.batch, progress_every=max(1, len(urls) // 4),
+        )
+        scorer.close()
+    finally:
+        await http.close()
+        await runner.cleanup()
+        if tmp:
+            tmp.cleanup()
+
+    mismatches = [u for u in reference if u not in pipelined or not np.allclose(reference[u], pipelined[u], atol=1e-4)]
+    print(f"Equivalence: {len(reference) - len(mismatches)}/{len(reference)} identical scores")
+    print(f"Sequential (before): {before:>8.1f} avatars/s  (+0.3 s sleep per member in the old scan)")
+    print(f"Pipeline (after):    {stats.rate:>8.1f} avatars/s  ({stats.rate / before:.1f}x, {stats.batches} batches)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
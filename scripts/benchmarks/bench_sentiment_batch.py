@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Sentiment Batching Benchmark
+Classifies the same synthetic messages one prompt per message (the
+original SentimentEngine behaviour) and through SentimentBatcher from
+shared/python/sentiment_batch.py, against a stub of Ollama's /api/generate,
+and prints messages/second and whether both runs agree on every label.
+
+The stub serves one request at a time and models a CPU-only box: each
+request costs --overhead-ms (request setup, prompt template, sampling
+start) plus --item-ms per message in the prompt. It labels every message
+deterministically from its text, so a batch answer can be checked against
+the single answer.
+
+Usage:
+  python scripts/benchmarks/bench_sentiment_batch.py [--messages 200] [--overhead-ms 400] [--item-ms 40] [--batch 16]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import re
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from shared.python.llm_scheduler import LLMScheduler
+from shared.python.sentiment_batch import LABELS, SentimentBatcher
+
+MODEL = "llama3.2:3b"
+WORDS = ("dnes", "to", "šlo", "dobře", "bylo", "těžké", "díky", "za", "podporu", "den", "bez",
+         "deník", "píšu", "zase", "večer", "cítím", "se", "lépe", "horší", "nálada")
+
+
+def label_for(text: str) -> str:
+    return LABELS[hashlib.md5(text.encode()).digest()[0] % 3]  # never URGENT, like most chat
+
+
+def synthetic_messages(n: int, seed: int = 11):
+    rnd = random.Random(seed)
+    return [" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(4, 30))) + f" #{i}" for i in range(n)]
+
+
+async def start_stub(overhead_ms: int, item_ms: int):
+    stats = {"requests": 0}
+    slot = asyncio.Lock()
+
+    async def generate(request):
+        body = await request.json()
+        prompt = body["prompt"]
+        numbered = re.findall(r"^(\d+)\. (.*)$", prompt, flags=re.M)
+        async with slot:
+            stats["requests"] += 1
+            await asyncio.sleep((overhead_ms + item_ms * max(1, len(numbered))) / 1000)
+        if numbered:
+            text = "\n".join(f"{n}: {label_for(t)}" for n, t in numbered)
+        else:
+            text = label_for(prompt.split("Message: ", 1)[1])
+        return web.json_response({"model": body.get("model"), "response": text, "done": True})
+
+    app = web.Application()
+    app.router.add_post("/api/generate", generate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", stats
+
+
+async def classify(base: str, messages, batch_size: int, window_ms: int):
+    llm = LLMScheduler(host=base, max_queue=len(messages) + 1)
+    batcher = SentimentBatcher(llm, MODEL, window_ms=window_ms, batch_size=batch_size)
+    started = time.perf_counter()
+    labels = await asyncio.gather(*(batcher.submit(text) for text in messages))
+    elapsed = time.perf_counter() - started
+    await llm.close()
+    return labels, len(messages) / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--overhead-ms", type=int, default=400, help="Stub fixed cost per request")
+    parser.add_argument("--item-ms", type=int, default=40, help="Stub cost per message in the prompt")
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--window-ms", type=int, default=500)
+    args = parser.parse_args()
+
+    messages = synthetic_messages(args.messages)
+    runner, base, stub = await start_stub(args.overhead_ms, args.item_ms)
+    try:
+        print(f"{len(messages)} messages, stub {args.overhead_ms} ms/request + {args.item_ms} ms/message")
+        single, before = await classify(base, messages, 1, args.window_ms)
+        single_requests = stub["requests"]
+        batched, after = await classify(base, messages, args.batch, args.window_ms)
+    finally:
+        await runner.cleanup()
+
+    expected = [label_for(text) for text in messages]
+    agree = sum(a == b == c for a, b, c in zip(single, batched, expected))
+    print(f"Agreement: {agree}/{len(messages)} identical labels")
+    print(f"One prompt per message (before): {before:>7.2f} msg/s  ({single_requests} requests)")
+    print(f"Batches of {args.batch:<3} (after):        {after:>7.2f} msg/s  "
+          f"({stub['requests'] - single_requests} requests, {after / before:.1f}x)")
+    return 0 if agree == len(messages) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Sentiment Pre-classifier Benchmark
+Runs shared/python/sentiment_prefilter.py over a labeled sample and prints
+how many model calls it avoids, how often its labels agree with the
+reference labels and whether any NEGATIVE/URGENT message was labeled
+without the model (which must not happen).
+
+Every run also checks CRISIS_SAMPLE, short suicide and self-harm messages
+without the usual despair keywords: none of them may be labeled locally,
+and the share caught by has_crisis_cues (the fast path ahead of the batch
+window) is reported. The exit status is 1 if any URGENT or crisis message
+was labeled without the model.
+
+Reference labels come from, in order of preference:
+  --sample file.jsonl   lines of {"text": ..., "label": ...}
+  --texts file.txt      one message per line, labeled by the model at
+                        OLLAMA_HOST through the LLM scheduler
+  (neither)             the small hand-labeled sample below
+
+Usage:
+  python scripts/benchmarks/bench_sentiment_prefilter.py [--sample labeled.jsonl | --texts msgs.txt]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from shared.python.sentiment_batch import has_crisis_cues
+from shared.python.sentiment_prefilter import prefilter
+
+BUILTIN_SAMPLE = [
+    ("díky moc, taky se mám fajn", "POSITIVE"),
+    ("dobré ráno všem, hezký den", "POSITIVE"),
+    ("super, gratuluju k 30 dnům!", "POSITIVE"),
+    ("drž se, zvládneš to 💪", "POSITIVE"),
+    ("vítej mezi námi, rád tě vidím", "POSITIVE"),
+    ("dneska mi to jde skvěle 🙂", "POSITIVE"),
+    ("kdy je další online setkání?", "NEUTRAL"),
+    ("posílám odkaz na ten článek", "NEUTRAL"),
+    ("jdu do práce, večer se ozvu", "NEUTRAL"),
+    ("ten podcast vyšel v pondělí", "NEUTRAL"),
+    ("máte někdo tip na dobrou knížku", "NEUTRAL"),
+    ("zítra mám zkoušku z matiky", "NEUTRAL"),
+    ("zase jsem to nezvládl, bohužel", "NEGATIVE"),
+    ("cítím se dnes hrozně, nic mě nebaví", "NEGATIVE"),
+    ("relaps po 40 dnech, jsem zklamaný", "NEGATIVE"),
+    ("pořád stejné, nevím jak dál", "NEGATIVE"),
+    ("mám strašnou chuť, nevím co dělat", "NEGATIVE"),
+    ("je mi smutno a jsem sám", "NEGATIVE"),
+    ("už nemůžu, nemá to cenu, končím", "URGENT"),
+    ("vzdávám to, sbohem všem", "URGENT"),
+    ("panika, potřebuju krizový plán hned", "URGENT"),
+    ("není to super, spíš naopak", "NEGATIVE"),
+    ("dneska jsem si psal deník a bylo to fajn", "POSITIVE"),
+    ("ahoj, jsem tu nový a zkusím to", "NEUTRAL"),
+    ("ahoj, jak se máš?", "NEUTRAL"),
+    ("ok, jdu do práce, zítra se ozvu", "NEUTRAL"),
+    ("dobrou noc všem 😢", "NEGATIVE"),
+]
+
+# Short suicide and self-harm messages, all URGENT; many carry no despair keyword
+CRISIS_SAMPLE = [
+    "chci se zabít",
+    "chci umřít",
+    "myslím na sebevraždu",
+    "nemá smysl žít",
+    "dneska jsem se řezal",
+    "mám v ruce prášky, celé balení",
+    "nikomu bych nechyběl",
+    "nikomu bych nechyběla",
+    "bez mě by jim bylo líp",
+    "chci usnout a neprobudit se",
+    "už nechci žít",
+    "zase jsem se pořezala",
+    "přemýšlím jak to ukončit",
+    "koupil jsem provaz",
+    "dnes v noci to udělám",
+    "napsal jsem dopis na rozloučenou",
+    "chtěl bych prostě zmizet navždy",
+    "stojím na mostě",
+    "nevidím důvod pokračovat",
+    "všem bude líp beze mě",
+    "chci skočit z okna",
+    "spolykám všechny prášky co mám",
+    "ahoj všem, dobrou noc navždy",
+    "díky za všechno, sbohem",
+    "chci umrit",
+    "myslim na sebevrazdu",
+    "mam v ruce prasky",
+    "rezu se",
+]
+
+
+def load_sample(path: str):
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["text"], row["label"].upper()) for row in rows]
+
+
+async def label_with_model(path: str):
+    from shared.python.llm_scheduler import LLMScheduler, Priority
+    from shared.python.sentiment_batch import parse_single, single_prompt
+
+    with open(path, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    llm = LLMScheduler(max_queue=len(texts) + 1)
+    try:
+        responses = await asyncio.gather(*(
+            llm.generate("llama3.2:3b", single_prompt(t), Priority.SENTIMENT,
+                         options={"temperature": 0.1, "num_predict": 5}, timeout=60.0)
+            for t in texts
+        ))
+    finally:
+        await llm.close()
+    return [(t, parse_single(r)) for t, r in zip(texts, responses)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sample", help="JSONL with text and label")
+    parser.add_argument("--texts", help="Plain messages, labeled by the model")
+    args = parser.parse_args()
+
+    if args.sample:
+        sample = load_sample(args.sample)
+    elif args.texts:
+        sample = asyncio.run(label_with_model(args.texts))
+    else:
+        sample = BUILTIN_SAMPLE
+
+    started = time.perf_counter()
+    predicted = [prefilter(text) for text, _ in sample]
+    per_msg_us = (time.perf_counter() - started) / len(sample) * 1e6
+
+    decided = [(p, ref) for p, (_, ref) in zip(predicted, sample) if p]
+    agree = sum(p == ref for p, ref in decided)
+    missed = [(text, ref) for p, (text, ref) in zip(predicted, sample) if p and ref in ("NEGATIVE", "URGENT")]
+    by_label = Counter(ref for _, ref in sample)
+    routed = Counter(ref for p, (_, ref) in zip(predicted, sample) if not p)
+
+    print(f"Sample: {len(sample)} messages {dict(by_label)}")
+    print(f"Labeled without the model: {len(decided)}/{len(sample)} ({len(decided) / len(sample):.0%} of calls avoided)")
+    if decided:
+        print(f"Agreement with reference on those: {agree}/{len(decided)} ({agree / len(decided):.0%})")
+    print(f"Sent to the model by reference label: {dict(routed)}")
+    print(f"NEGATIVE/URGENT labeled without the model: {len(missed)}")
+    for text, ref in missed:
+        print(f"  [{ref}] {text}")
+    print(f"Pre-classifier cost: {per_msg_us:.1f} µs/message")
+
+    crisis_local = [(text, label) for text in CRISIS_SAMPLE for label in [prefilter(text)] if label]
+    fast_path = sum(has_crisis_cues(text) for text in CRISIS_SAMPLE)
+    print(f"Crisis set: {len(CRISIS_SAMPLE) - len(crisis_local)}/{len(CRISIS_SAMPLE)} sent to the model, "
+          f"{fast_path}/{len(CRISIS_SAMPLE)} on the crisis fast path")
+    for text, label in crisis_local:
+        print(f"  labeled {label} locally: {text}")
+    return 1 if crisis_local or any(ref == "URGENT" for _, ref in missed) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Fills Redis with a SyntheticCommunity (scripts/benchmarks/synthetic.py) at
+several scales and times the hot paths against it:
+
+  scan_user         PatternDetectors.scan_user, per recently active user
+  scan_guild        PatternScanner.scan_guild over the whole guild (the 50 ms
+                    pacing sleeps are skipped and reported as pacing_s)
+  deep_stats        get_deep_stats_redis, 30 days (cold: response cache dropped)
+  security_score    get_security_score, 7 days
+  leaderboard       get_leaderboard_data: the dashboard's last-30-days preset (a
+                    maintained board), all time and a custom 30-day range
+  export_<type>     the /api/export/<type> handler, CSV
+  on_message        PatternSignals.on_message throughput, 50 concurrent
+
+"cold" runs drop the dashboard caches first (cache:* in Redis and the
+in-process tier of shared.python.cache); "warm" runs repeat the call with
+the caches filled. Every result carries the Redis commands and round-trips
+per run, counted by the instrumented clients of
+shared.python.redis_client, so a change that adds round-trips shows up
+even when the stand-in Redis hides the latency.
+
+Without --redis-url an in-process fakeredis stands in. Its SCAN walks and
+sorts the whole keyspace on every call, so SCAN-heavy paths (scan_user,
+scan_guild) are far slower than on Redis: trust their command and
+round-trip counts there, and take timings from a real --redis-url run. The
+target database must be empty or --flush given; it is flushed between
+scales. Results go to --out as JSON; --compare prints the median ratio
+against an earlier run and exits 1 on regressions.
+
+Usage:
+  python scripts/benchmarks/run_suite.py [--scales 1000,10000,100000] [--days 30] [--seed 42] \
+      [--redis-url redis://localhost:6379/15 --flush] [--only scan_user,deep_stats] \
+      [--out bench.json] [--compare baseline.json --threshold 1.25]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import types
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import shared.python.redis_client as redis_client
+from shared.python.cache import clear_local
+from shared.python.redis_client import RedisManager, configure_redis, redis_stats, reset_redis_stats
+
+from synthetic import SyntheticCommunity, sample_messages
+
+DEFAULT_SCALES_FAKE = "1000"
+DEFAULT_SCALES_REDIS = "1000,10000,100000"
+EXPORT_TYPES = ("leaderboard", "voice_top", "commands_top", "emojis_top", "channels",
+                "activity", "users", "hourly_heatmap", "msg_lengths")
+CACHE_PATTERNS = ("cache:*",)
+
+
+class FakeRedisManager(RedisManager):
+    """RedisManager whose pools talk to one in-process fakeredis server."""
+
+    def __init__(self):
+        super().__init__(url="redis://fakeredis")
+        import fakeredis
+        self.server = fakeredis.FakeServer()
+
+    def _pool(self, url, decode):
+        import fakeredis.aioredis
+        import redis.asyncio as aioredis
+        key = (url, decode)
+        if key not in self._pools:
+            self._pools[key] = aioredis.ConnectionPool(
+                connection_class=fakeredis.aioredis.FakeConnection,
+                server=self.server, decode_responses=decode,
+            )
+        return self._pools[key]
+
+
+# ─── Measurement ─────────────────────────────────────────────────────
+
+def _summary(samples_ms, commands, trips, **extra):
+    ordered = sorted(samples_ms)
+    runs = len(ordered)
+    return {
+        "runs": runs,
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(runs - 1, int(runs * 0.95))], 3),
+        "max_ms": round(ordered[-1], 3),
+        "redis_cmds": round(commands / runs, 1),
+        "redis_trips": round(trips / runs, 1),
+        **extra,
+    }
+
+
+async def measure(call, runs: int, before=None, warmup: bool = False, **extra):
+    """
+    Time `await call(i)` runs times; before() (not timed, not counted) runs
+    first each time. warmup makes one untimed call first (fills caches).
+    """
+    if warmup:
+        await call(-1)
+    samples, commands, trips = [], 0, 0
+    for i in range(runs):
+        if before is not None:
+            await before()
+        reset_redis_stats()
+        started = time.perf_counter()
+        await call(i)
+        samples.append((time.perf_counter() - started) * 1000)
+        stats = redis_stats()
+        commands += sum(s["commands"] for s in stats.values())
+        trips += sum(s["round_trips"] for s in stats.values())
+    return _summary(samples, commands, trips, **extra)
+
+
+async def drop_caches(r):
+    clear_local()
+    for pattern in CACHE_PATTERNS:
+        keys = [k async for k in r.scan_iter(match=pattern, count=1000)]
+        if keys:
+            await r.delete(*keys)
+
+
+def _import_dashboard(with_app: bool):
+    """backend.utils (and backend.main) as a package, like uvicorn loads them."""
+    if "backend" not in sys.modules:
+        backend = types.ModuleType("backend")
+        backend.__path__ = [os.path.join(ROOT, "services", "dashboard", "backend")]
+        sys.modules["backend"] = backend
+        sys.path.insert(0, os.path.join(ROOT, "services", "dashboard"))
+    import importlib
+    utils = importlib.import_module("backend.utils")
+    return importlib.import_module("backend.main") if with_app else utils
+
+
+# ─── Benchmarks ──────────────────────────────────────────────────────
+
+async def bench_scan_user(ctx):
+    from services.worker.commands.patterns.detectors import PatternDetectors
+    detectors = PatternDetectors(ctx.gid)
+    uids = ctx.active[:ctx.sample]
+    now = datetime.now(timezone.utc)
+    today = now.strftime("%Y%m%d")
+    alerts = 0
+
+    async def call(i):
+        nonlocal alerts
+        alerts += len(await detectors.scan_user(ctx.r, ctx.gid, uids[i], now, today))
+
+    result = await measure(call, len(uids))
+    result["alerts_per_user"] = round(alerts / max(1, len(uids)), 2)
+    return {"scan_user": result}
+
+
+class _CountingAlerts:
+    """PatternAlerts stand-in: no dedupe, no Discord; counts what would be sent."""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def should_send_alert(self, r, gid, alert):
+        return True
+
+    async def send_batched_alerts(self, uid, alerts, gid=None):
+        self.sent += len(alerts)
+
+    async def mark_alert_sent(self, r, gid, alert):
+        pass
+
+
+async def bench_scan_guild(ctx):
+    import services.worker.commands.patterns.scanner as scanner_mod
+    from services.worker.commands.patterns.detectors import PatternDetectors
+
+    # Constructed without __init__, which would start the discord.ext loop
+    scanner = scanner_mod.PatternScanner.__new__(scanner_mod.PatternScanner)
+    scanner.bot = SimpleNamespace(get_guild=lambda gid: None)
+    scanner._guild_id = ctx.gid
+    scanner._get_redis = redis_client.get_redis
+    scanner.detectors = PatternDetectors(ctx.gid)
+    scanner.alerts = _CountingAlerts()
+
+    pacing = {"sleeps": 0, "seconds": 0.0}
+
+    async def skip_sleep(delay, *args, **kwargs):
+        pacing["sleeps"] += 1
+        pacing["seconds"] += delay
+
+    real_asyncio = scanner_mod.asyncio
+    scanner_mod.asyncio = SimpleNamespace(sleep=skip_sleep)
+    try:
+        result = await measure(lambda i: scanner.scan_guild(ctx.r, ctx.gid), ctx.guild_runs)
+    finally:
+        scanner_mod.asyncio = real_asyncio
+    result["users_scanned"] = len(ctx.active)
+    result["alerts"] = scanner.alerts.sent // ctx.guild_runs
+    result["pacing_s"] = round(pacing["seconds"] / ctx.guild_runs, 2)
+    return {"scan_guild": result}
+
+
+async def bench_deep_stats(ctx):
+    utils = _import_dashboard(False)
+    call = lambda i: utils.get_deep_stats_redis(ctx.gid)
+    return {
+        "deep_stats_cold": await measure(call, ctx.runs, before=lambda: drop_caches(ctx.r)),
+        "deep_stats_warm": await measure(call, ctx.runs, warmup=True),
+    }
+
+
+async def bench_security_score(ctx):
+    utils = _import_dashboard(False)
+    await drop_caches(ctx.r)
+    return {
+        "security_score_cold": await measure(lambda i: utils.get_security_score.__wrapped__(ctx.gid, 7), ctx.runs),
+        "security_score_warm": await measure(lambda i: utils.get_security_score(ctx.gid, 7), ctx.runs, warmup=True),
+    }
+
+
+async def bench_leaderboard(ctx):
+    utils = _import_dashboard(False)
+    end = datetime.now(timezone.utc)
+    preset = dict(start_date=(end - timedelta(days=30)).strftime("%Y-%m-%d"), end_date=end.strftime("%Y-%m-%d"))
+    ranged = lambda i: utils.get_leaderboard_data.__wrapped__(ctx.gid, limit=15, **preset)
+    custom = lambda i: utils.get_leaderboard_data.__wrapped__(ctx.gid, limit=15, start_date=ctx.start_date, end_date=ctx.end_date)
+    return {
+        "leaderboard_30d_cold": await measure(ranged, ctx.runs, before=lambda: drop_caches(ctx.r)),
+        "leaderboard_all_cold": await measure(lambda i: utils.get_leaderboard_data.__wrapped__(ctx.gid, limit=15), ctx.runs),
+        "leaderboard_custom_cold": await measure(custom, ctx.runs, before=lambda: drop_caches(ctx.r)),
+        "leaderboard_30d_warm": await measure(
+            lambda i: utils.get_leaderboard_data(ctx.gid, limit=15, **preset), ctx.runs, warmup=True),
+    }
+
+
+async def bench_export(ctx):
+    main = _import_dashboard(True)
+    request = SimpleNamespace(session={"guild_id": ctx.gid})
+    results = {}
+    for export_type in EXPORT_TYPES:
+        size = {}
+
+        async def call(i, export_type=export_type):
+            response = await main.export_data(export_type, request, format="csv",
+                                              start_date=ctx.start_date, end_date=ctx.end_date, _=None)
+            if response.status_code != 200:
+                raise RuntimeError(f"export {export_type}: HTTP {response.status_code}")
+            size["bytes"] = len(response.body)
+
+        summary = await measure(call, ctx.runs, before=lambda: drop_caches(ctx.r))
+        results[f"export_{export_type}"] = {**summary, **size}
+    return results
+
+
+def _fake_message(gid, uid, mid, text, channel, reply_to=None):
+    now = datetime.now(timezone.utc)
+    return SimpleNamespace(
+        id=mid, guild=SimpleNamespace(id=gid), channel=channel, content=text, mentions=[], created_at=now,
+        author=SimpleNamespace(id=uid, bot=False, display_name=f"user{uid}"),
+        reference=None if reply_to is None else SimpleNamespace(message_id=reply_to.id, cached_message=reply_to),
+    )
+
+
+async def bench_on_message(ctx):
+    from services.worker.commands.patterns.signals import PatternSignals
+
+    # Without __init__: no Discourse ingester, no background loop
+    signals = PatternSignals.__new__(PatternSignals)
+    signals.bot = None
+    signals._guild_id = ctx.gid
+    signals._get_redis = redis_client.get_redis
+
+    async def no_fetch(message_id):
+        raise LookupError(message_id)
+
+    channels = [SimpleNamespace(id=1, name="obecne", fetch_message=no_fetch),
+                SimpleNamespace(id=2, name="denik-ondra", fetch_message=no_fetch)]
+    texts = sample_messages(ctx.messages, seed=ctx.seed)
+    uids = ctx.active or [ctx.uid_base]
+    messages = []
+    for i, text in enumerate(texts):
+        reply_to = messages[-1] if messages and i % 3 == 0 else None
+        channel = channels[1] if i % 7 == 0 else channels[0]
+        messages.append(_fake_message(ctx.gid, uids[i % len(uids)], 900000000000000000 + i, text, channel, reply_to))
+
+    concurrency = 50
+
+    async def call(i):
+        for start in range(0, len(messages), concurrency):
+            await asyncio.gather(*(signals.on_message(m) for m in messages[start:start + concurrency]))
+
+    result = await measure(call, 1)
+    result["messages"] = len(messages)
+    result["msgs_per_s"] = round(len(messages) / (result["median_ms"] / 1000), 1)
+    result["redis_cmds"] = round(result["redis_cmds"] / len(messages), 1)
+    result["redis_trips"] = round(result["redis_trips"] / len(messages), 1)
+    result["per"] = "message"
+    return {"on_message": result}
+
+
+BENCHMARKS = {
+    "scan_user": bench_scan_user,
+    "scan_guild": bench_scan_guild,
+    "deep_stats": bench_deep_stats,
+    "security_score": bench_security_score,
+    "leaderboard": bench_leaderboard,
+    "export": bench_export,
+    "on_message": bench_on_message,
+}
+
+
+# ─── Runner ──────────────────────────────────────────────────────────
+
+async def run_scale(users, args):
+    r = await redis_client.get_redis()
+    rb = await redis_client.get_redis_binary()
+    try:
+        await r.flushdb()
+        community = SyntheticCommunity(users, args.days, seed=args.seed)
+        started = time.perf_counter()
+        written = await community.populate(r, rb)
+        populate_s = time.perf_counter() - started
+        print(f"[{users} users] populated in {populate_s:.1f}s: {written['messages']} messages, "
+              f"{written['commands_written']} commands")
+
+        end = datetime.now(timezone.utc)
+        ctx = SimpleNamespace(
+            r=r, gid=community.gid, seed=args.seed, runs=args.runs, guild_runs=args.guild_runs,
+            sample=args.sample, messages=args.messages, active=community.active_uids(),
+            uid_base=int(community.uids[0]),
+            start_date=(end - timedelta(days=29)).strftime("%Y-%m-%d"), end_date=end.strftime("%Y-%m-%d"),
+        )
+        results = {}
+        for name, bench in BENCHMARKS.items():
+            if args.only and name not in args.only:
+                continue
+            try:
+                results.update(await bench(ctx))
+            except Exception as e:
+                results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+            for key in [k for k in results if k == name or k.startswith(name)]:
+                row = results[key]
+                if "skipped" in row:
+                    print(f"  {key:<28} skipped: {row['skipped']}")
+                else:
+                    print(f"  {key:<28} median {row['median_ms']:>10.2f} ms  p95 {row['p95_ms']:>10.2f} ms  "
+                          f"{row['redis_cmds']:>9} cmds  {row['redis_trips']:>8} trips")
+        return {
+            "users": users,
+            "days": args.days,
+            "populate_s": round(populate_s, 2),
+            "written": written,
+            "keys": await r.dbsize(),
+            "active_48h": len(ctx.active),
+            "benchmarks": results,
+        }
+    finally:
+        await r.aclose()
+        await rb.aclose()
+
+
+def compare(current, baseline_path, threshold) -> int:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (regression above {threshold:.2f}x median):")
+    for scale, run in current["scales"].items():
+        old_run = baseline.get("scales", {}).get(scale)
+        if not old_run:
+            continue
+        for name, row in run["benchmarks"].items():
+            old = old_run["benchmarks"].get(name)
+            if not old or "median_ms" not in row or "median_ms" not in old or not old["median_ms"]:
+                continue
+            ratio = row["median_ms"] / old["median_ms"]
+            trips = f"{old['redis_trips']} -> {row['redis_trips']} trips"
+            flag = "REGRESSION" if ratio > threshold else ""
+            regressions += ratio > threshold
+            print(f"  {scale:>7} {name:<28} {ratio:>6.2f}x  {trips:<28} {flag}")
+    return regressions
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", help=f"Users per run (default {DEFAULT_SCALES_FAKE} in-process, "
+                                         f"{DEFAULT_SCALES_REDIS} with --redis-url)")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--runs", type=int, default=5, help="Repeats of the dashboard benchmarks")
+    parser.add_argument("--guild-runs", type=int, default=1, help="Repeats of scan_guild")
+    parser.add_argument("--sample", type=int, default=50, help="Users timed by scan_user")
+    parser.add_argument("--messages", type=int, default=2000, help="Messages fed to on_message")
+    parser.add_argument("--only", help="Comma-separated benchmarks: " + ",".join(BENCHMARKS))
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL"))
+    parser.add_argument("--flush", action="store_true", help="Allow flushing a non-empty --redis-url database")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="Earlier results JSON to compare medians with")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args()
+    args.only = set(args.only.split(",")) if args.only else None
+
+    if args.redis_url:
+        configure_redis(url=args.redis_url)
+        r = await redis_client.get_redis()
+        nonempty = await r.dbsize()
+        await r.aclose()
+        if nonempty and not args.flush:
+            print("Target database is not empty; the suite flushes it. Pick an empty one or pass --flush")
+            return 1
+        backend = args.redis_url.rsplit("@", 1)[-1]
+    else:
+        configure_redis(manager=FakeRedisManager())
+        backend = "fakeredis (in-process)"
+    scales = [int(s) for s in (args.scales or (DEFAULT_SCALES_REDIS if args.redis_url else DEFAULT_SCALES_FAKE)).split(",")]
+
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": backend,
+            "seed": args.seed,
+            "days": args.days,
+        },
+        "scales": {},
+    }
+    try:
+        for users in scales:
+            report["scales"][str(users)] = await run_scale(users, args)
+    finally:
+        await redis_client.close_redis()
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {args.out}")
+
+    if args.compare:
+        return 1 if compare(report, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Synthetic Community
+Seeded generator of a realistic guild for the benchmark suite: N users
+active over the last D days, written in the same Redis layout the Go core,
+the worker and scripts/maintenance/backfill_stats.py produce:
+
+  events:msg|voice|action:{gid}:{uid}   per-user ZSETs (JSON members)
+  evb:msg|voice|action:{gid}:{day}      packed buckets (event_codec) and
+  agg:events:{gid}:{day}                their finalized rollups
+  hll:dau, stats:hourly, stats:user_daily, guild:days
+  stats:heatmap, stats:msglen, stats:total_msgs, stats:channel_total,
+  stats:channel:{gid}:{cid}:{day}, channel:info, guild:meta
+  levels:xp, user:info, and the leaderboards built from the rollups
+  (leaderboard:*, see shared/python/leaderboards.py)
+  stats:voice_duration, stats:commands, stats:emojis
+  pat:day, pat:last_act, pat:active, pat:first_msg, pat:user_join,
+  pat:reply_pair, pat:question (last 24 h)
+  presence:total, stats:total_members, stats:mod_count, stats:mod_actions_30d,
+  guild:verification_level|explicit_filter|mfa_level, guild:roles
+
+Activity is heavy-tailed like a real support community: most members lurk,
+a quarter post now and then, a small core posts daily; messages follow an
+evening-weighted day curve, and every user has a personal keyword profile,
+so the pattern detectors find a realistic mix of alerts. The same seed and
+scale always give the same data relative to "now".
+
+Usage (fills --redis-url; refuses a non-empty database unless --flush):
+  python scripts/benchmarks/synthetic.py --users 10000 [--days 30] [--seed 42] --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from shared.python.event_codec import ACTION_DTYPE, ACTION_TYPES, MSG_DTYPE, MSG_FLAG_REPLY, VOICE_DTYPE, K_EVB
+from shared.python.event_rollups import finalize_days
+from shared.python.leaderboards import rebuild_leaderboards
+from shared.python.keys import K_GUILD_DAYS, K_GUILD_META
+from shared.python.pattern_logic import KEYWORD_GROUPS
+
+BENCH_GID = 100000000000000001
+UID_BASE = 200000000000000000
+CID_BASE = 300000000000000000
+MID_BASE = 400000000000000000
+RID_BASE = 500000000000000000
+
+PIPELINE_CHUNK = 5000  # commands per pipeline round-trip
+
+# (share of members, chance to post on a given day, extra messages per active day)
+TIERS = ((0.70, 0.03, 1.0), (0.25, 0.25, 4.0), (0.05, 0.75, 12.0))
+
+# Share of messages per UTC hour: quiet nights, evening peak
+HOUR_WEIGHTS = np.array([2, 1, 1, 1, 1, 1, 2, 3, 4, 5, 5, 5, 6, 6, 6, 6, 7, 8, 9, 10, 10, 9, 7, 4], dtype=float)
+HOUR_WEIGHTS /= HOUR_WEIGHTS.sum()
+
+CHANNELS = ("obecne", "denik-ondra", "denik-petra", "pomoc", "relapsy", "uspechy", "offtopic",
+            "metodika", "sport", "hudba", "novacci", "podpora")
+ROLES = ("Admin", "Moderátor", "Mentor", "Člen", "Nováček", "Bot")
+COMMANDS = ("rank", "leaderboard", "streak", "help", "report", "challenge", "profile", "stats")
+EMOJIS = ("👍", "❤️", "😂", "🙏", "💪", "🔥", "😢", "<:nepornu:123456789012345678>", "<:streak:223456789012345678>")
+ACTION_WEIGHTS = {"timeout": 0.35, "msg_delete": 0.30, "role_update": 0.15, "kick": 0.08,
+                  "ban": 0.05, "verification": 0.05, "unban": 0.02}
+
+FILLER = ("dneska", "jsem", "byl", "venku", "a", "pak", "jsme", "se", "bavili", "o", "tom", "jak",
+          "to", "jde", "v", "práci", "díky", "moc", "všem", "za", "podporu", "ráno", "večer", "den",
+          "týden", "myslím", "že", "mi", "pomohlo", "běhat", "spát", "číst", "kamarád", "rodina")
+KEYWORD_PHRASES = [phrase for words in KEYWORD_GROUPS.values() for phrase in words]
+
+
+def sample_messages(count: int, seed: int = 42) -> List[str]:
+    """Czech chat-like texts; about a third contain pattern keywords, some are questions."""
+    rng = np.random.default_rng(seed)
+    texts = []
+    for _ in range(count):
+        words = list(rng.choice(FILLER, size=int(rng.integers(2, 25))))
+        for _ in range(rng.poisson(0.5)):
+            words.insert(int(rng.integers(0, len(words) + 1)), str(rng.choice(KEYWORD_PHRASES)))
+        text = " ".join(words).capitalize()
+        texts.append(text + ("?" if rng.random() < 0.15 else "."))
+    return texts
+
+
+class _Writer:
+    """Queues commands on a non-transactional pipeline and flushes in chunks."""
+
+    def __init__(self, r):
+        self.r = r
+        self.pipe = r.pipeline(transaction=False)
+        self.queued = 0
+        self.commands = 0
+
+    async def tick(self, n: int = 1):
+        self.queued += n
+        if self.queued >= PIPELINE_CHUNK:
+            await self.flush()
+
+    async def flush(self):
+        if self.queued:
+            await self.pipe.execute()
+            self.commands += self.queued
+            self.queued = 0
+
+
+class SyntheticCommunity:
+    def __init__(self, users: int, days: int = 30, gid: int = BENCH_GID, seed: int = 42, now: datetime = None):
+        self.users = users
+        self.days = days
+        self.gid = gid
+        self.seed = seed
+        self.now = now or datetime.now(timezone.utc)
+
+        rng = np.random.default_rng(seed)
+        shares = np.array([t[0] for t in TIERS])
+        self.tier = rng.choice(len(TIERS), size=users, p=shares / shares.sum())
+        self.p_active = np.array([t[1] for t in TIERS])[self.tier]
+        self.extra_msgs = np.array([t[2] for t in TIERS])[self.tier]
+        self.uids = UID_BASE + np.arange(users, dtype=np.int64)
+        self.joined = self.now.timestamp() - rng.uniform(days * 0.2, 3 * 365, users) * 86400
+        # Mostly sparse per-user keyword rates (hits per message)
+        self.kw_rates = rng.gamma(0.25, 0.12, size=(users, len(KEYWORD_GROUPS)))
+        core = np.flatnonzero(self.tier == len(TIERS) - 1)
+        self.mods = core[:max(3, users // 500)]
+        channel_weights = 1.0 / np.arange(1, len(CHANNELS) + 1)
+        self.channel_weights = channel_weights / channel_weights.sum()
+        self._rng = rng
+
+    def day_list(self) -> List[str]:
+        """YYYYMMDD of the generated days, oldest first, today last (UTC)."""
+        return [(self.now - timedelta(days=i)).strftime("%Y%m%d") for i in range(self.days - 1, -1, -1)]
+
+    def active_uids(self, hours: int = 48) -> List[int]:
+        """Filled by populate(): users whose last message is within the last `hours`."""
+        cutoff = self.now.timestamp() - hours * 3600
+        return [int(self.uids[i]) for i in np.flatnonzero(self._last_ts >= cutoff)]
+
+    async def populate(self, r, rb) -> Dict[str, int]:
+        """Write the community into Redis (r decoding, rb binary); returns what was written."""
+        rng = self._rng
+        gid = self.gid
+        w = _Writer(r)
+        n = self.users
+        now_ts = int(self.now.timestamp())
+        groups = list(KEYWORD_GROUPS)
+
+        user_msgs = np.zeros(n, dtype=np.int64)
+        first_ts = np.zeros(n, dtype=np.int64)
+        self._last_ts = np.zeros(n, dtype=np.int64)
+        first_mid = np.zeros(n, dtype=np.int64)
+        first_cid = np.zeros(n, dtype=np.int64)
+        voice_total = np.zeros(n, dtype=np.int64)
+        heatmap = Counter()
+        msglen = Counter()
+        channel_total = Counter()
+        reply_pairs = Counter()
+        counts = Counter()
+        next_mid = MID_BASE
+
+        days = self.day_list()
+        for d in days:
+            day_start = int(datetime.strptime(d, "%Y%m%d").replace(tzinfo=timezone.utc).timestamp())
+            span = min(86400, now_ts - day_start)
+
+            # ── Messages ──
+            active = np.flatnonzero(rng.random(n) < self.p_active)
+            per_user = rng.poisson(self.extra_msgs[active]) + 1
+            idx = np.repeat(active, per_user)
+            m = len(idx)
+            hours = rng.choice(24, size=m, p=HOUR_WEIGHTS)
+            ts = day_start + ((hours * 3600 + rng.integers(0, 3600, m)) * span // 86400)
+            order = np.argsort(ts, kind="stable")
+            idx, ts = idx[order], ts[order]
+            hours = (ts - day_start) // 3600
+            lens = np.clip(rng.lognormal(3.6, 0.9, m), 1, 2000).astype(np.int64)
+            reply = rng.random(m) < 0.3
+            chan = rng.choice(len(CHANNELS), size=m, p=self.channel_weights)
+            mids = next_mid + np.arange(m, dtype=np.int64)
+            next_mid += m
+
+            packed = np.empty(m, dtype=MSG_DTYPE)
+            packed["uid"] = self.uids[idx]
+            packed["ts"] = ts
+            packed["len"] = lens
+            packed["flags"] = np.where(reply, MSG_FLAG_REPLY, 0)
+            w.pipe.set(K_EVB("msg", gid, d), packed.tobytes())
+            await w.tick()
+
+            for i in range(m):
+                uid = int(self.uids[idx[i]])
+                member = json.dumps({"mid": str(mids[i]), "len": int(lens[i]), "reply": bool(reply[i])})
+                w.pipe.zadd(f"events:msg:{gid}:{uid}", {member: int(ts[i])})
+                await w.tick()
+
+            # Per user-day rollups
+            users_today, inv = np.unique(idx, return_inverse=True)
+            msg_count = np.bincount(inv)
+            char_count = np.bincount(inv, weights=lens).astype(np.int64)
+            reply_count = np.bincount(inv, weights=reply).astype(np.int64)
+            hour_matrix = np.zeros((len(users_today), 24), dtype=np.int64)
+            np.add.at(hour_matrix, (inv, hours), 1)
+            kw_hits = rng.poisson(self.kw_rates[users_today] * msg_count[:, None])
+
+            daily_key = f"stats:user_daily:{gid}:{d}"
+            w.pipe.zadd(daily_key, {str(int(self.uids[u])): int(c) for u, c in zip(users_today, msg_count)})
+            hll_members = [str(int(self.uids[u])) for u in users_today]
+            for start in range(0, len(hll_members), 1000):
+                w.pipe.pfadd(f"hll:dau:{gid}:{d}", *hll_members[start:start + 1000])
+            w.pipe.hset(f"stats:hourly:{gid}:{d}",
+                        mapping={str(h): int(c) for h, c in enumerate(np.bincount(hours, minlength=24)) if c})
+            w.pipe.zadd(K_GUILD_DAYS(gid), {d: int(d)})
+            for c, total in enumerate(np.bincount(chan, minlength=len(CHANNELS))):
+                if total:
+                    w.pipe.set(f"stats:channel:{gid}:{CID_BASE + c}:{d}", int(total))
+                    channel_total[c] += int(total)
+            await w.tick(4 + len(CHANNELS))
+
+            for row, u in enumerate(users_today):
+                uid = int(self.uids[u])
+                day_key = f"pat:day:{gid}:{uid}:{d}"
+                fields = {
+                    "msg_count": int(msg_count[row]),
+                    "char_count": int(char_count[row]),
+                    "word_count": int(char_count[row] // 6) + 1,
+                }
+                if reply_count[row]:
+                    fields["reply_count"] = int(reply_count[row])
+                for g, hits in zip(groups, kw_hits[row]):
+                    if hits:
+                        fields[f"kw:{g}"] = int(hits)
+                for h in np.flatnonzero(hour_matrix[row]):
+                    fields[f"h:{h}"] = int(hour_matrix[row, h])
+                w.pipe.hset(day_key, mapping=fields)
+                await w.tick()
+
+            # Messages grouped by user, in time order within each user
+            by_user = np.argsort(idx, kind="stable")
+            new = users_today[first_ts[users_today] == 0]
+            first_rows = by_user[np.searchsorted(idx, new, sorter=by_user)]
+            first_ts[new] = ts[first_rows]
+            first_mid[new] = mids[first_rows]
+            first_cid[new] = CID_BASE + chan[first_rows]
+            last_rows = by_user[np.searchsorted(idx, users_today, side="right", sorter=by_user) - 1]
+            self._last_ts[users_today] = ts[last_rows]
+            user_msgs[users_today] += msg_count
+
+            # Replies go to the author of a random message of the same day
+            partners = idx[rng.integers(0, m, int(reply.sum()))]
+            for a, b in zip(idx[reply], partners):
+                if a != b:
+                    reply_pairs[(min(a, b), max(a, b))] += 1
+            # Unanswered questions are kept for 24 h
+            asked = np.flatnonzero((ts >= now_ts - 86400) & (rng.random(m) < 0.15))
+            for i in asked:
+                w.pipe.set(f"pat:question:{gid}:{int(self.uids[idx[i]])}:{mids[i]}", int(ts[i]),
+                           ex=max(1, int(ts[i]) + 86400 - now_ts))
+            await w.tick(len(asked))
+
+            weekday = datetime.strptime(d, "%Y%m%d").weekday()
+            for h, c in enumerate(np.bincount(hours, minlength=24)):
+                if c:
+                    heatmap[f"{weekday}_{h}"] += int(c)
+            buckets = np.select([lens <= 10, lens <= 50, lens <= 100, lens <= 200], [5, 30, 75, 150], 250)
+            msglen.update({int(b): int(c) for b, c in zip(*np.unique(buckets, return_counts=True))})
+            counts["messages"] += m
+
+            # ── Voice sessions (score and packed ts = session end) ──
+            talkers = np.flatnonzero((self.tier > 0) & (rng.random(n) < 0.12))
+            duration = np.clip(rng.lognormal(7.0, 1.0, len(talkers)), 60, 4 * 3600).astype(np.int64)
+            end = np.minimum(day_start + rng.integers(0, span, len(talkers)) + duration, now_ts)
+            packed = np.empty(len(talkers), dtype=VOICE_DTYPE)
+            packed["uid"] = self.uids[talkers]
+            packed["ts"] = end
+            packed["duration"] = duration
+            w.pipe.set(K_EVB("voice", gid, d), packed[np.argsort(end)].tobytes())
+            for u, dur, e in zip(talkers, duration, end):
+                member = json.dumps({"duration": int(dur), "start": int(e - dur)})
+                w.pipe.zadd(f"events:voice:{gid}:{int(self.uids[u])}", {member: int(e)})
+            await w.tick(1 + len(talkers))
+            voice_total[talkers] += duration
+            counts["voice_sessions"] += len(talkers)
+
+            # ── Moderator actions ──
+            a = rng.poisson(1 + n / 2000)
+            actors = rng.choice(self.mods, size=a)
+            names = rng.choice(list(ACTION_WEIGHTS), size=a, p=np.array(list(ACTION_WEIGHTS.values())))
+            when = np.sort(day_start + rng.integers(0, span, a))
+            packed = np.empty(a, dtype=ACTION_DTYPE)
+            packed["uid"] = self.uids[actors]
+            packed["ts"] = when
+            packed["type"] = [ACTION_TYPES.index(t) for t in names]
+            w.pipe.set(K_EVB("action", gid, d), packed.tobytes())
+            for u, t, at in zip(actors, names, when):
+                w.pipe.zadd(f"events:action:{gid}:{int(self.uids[u])}", {json.dumps({"type": str(t)}): int(at)})
+            await w.tick(1 + a)
+            counts["actions"] += a
+
+        # ── Guild-wide totals ──
+        posted = np.flatnonzero(user_msgs)
+        w.pipe.zadd(f"levels:xp:{gid}", {str(int(self.uids[u])): int(user_msgs[u] * 20) for u in posted})
+        talked = np.flatnonzero(voice_total)
+        if len(talked):
+            w.pipe.zadd(f"stats:voice_duration:{gid}", {str(int(self.uids[u])): int(voice_total[u]) for u in talked})
+        w.pipe.hset(f"stats:heatmap:{gid}", mapping=dict(heatmap))
+        w.pipe.zadd(f"stats:msglen:{gid}", {str(b): c for b, c in msglen.items()})
+        w.pipe.set(f"stats:total_msgs:{gid}", counts["messages"])
+        w.pipe.hset(K_GUILD_META(gid), "total_msgs", counts["messages"])
+        w.pipe.zadd(f"stats:channel_total:{gid}", {str(CID_BASE + c): t for c, t in channel_total.items()})
+        for c, name in enumerate(CHANNELS):
+            w.pipe.hset(f"channel:info:{CID_BASE + c}", mapping={"name": name})
+        w.pipe.hset(f"stats:commands:{gid}",
+                    mapping={cmd: int(c) for cmd, c in zip(COMMANDS, rng.zipf(1.6, len(COMMANDS)) * (n // 50 + 1))})
+        w.pipe.zadd(f"stats:emojis:{gid}", {e: int(c) for e, c in zip(EMOJIS, rng.zipf(1.5, len(EMOJIS)) * (n // 20 + 1))})
+        w.pipe.set(f"presence:total:{gid}", n)
+        w.pipe.set(f"stats:total_members:{gid}", n)
+        w.pipe.set(f"stats:mod_count:{gid}", len(self.mods))
+        w.pipe.set(f"stats:mod_actions_30d:{gid}", counts["actions"])
+        w.pipe.set(f"guild:verification_level:{gid}", 2)
+        w.pipe.set(f"guild:explicit_filter:{gid}", 2)
+        w.pipe.set(f"guild:mfa_level:{gid}", 1)
+        # Seeded so get_cached_roles never falls back to the Discord API
+        w.pipe.hset(f"guild:roles:{gid}", mapping={str(gid): "@everyone",
+                                                   **{str(RID_BASE + i): name for i, name in enumerate(ROLES)}})
+        await w.tick(17 + len(CHANNELS))
+
+        for (a, b), c in reply_pairs.items():
+            w.pipe.set(f"pat:reply_pair:{gid}:{int(self.uids[a])}:{int(self.uids[b])}", c, ex=30 * 86400)
+            await w.tick()
+        counts["reply_pairs"] = len(reply_pairs)
+
+        # ── Per-user info and pattern state ──
+        for u in range(n):
+            uid = int(self.uids[u])
+            w.pipe.hset(f"user:info:{uid}", mapping={"name": f"user{u:06d}", "avatar": "",
+                                                     "joined_at": datetime.fromtimestamp(int(self.joined[u]), timezone.utc).isoformat()})
+            w.pipe.set(f"pat:user_join:{gid}:{uid}", int(self.joined[u]))
+            if user_msgs[u]:
+                w.pipe.set(f"pat:last_act:{gid}:{uid}", int(self._last_ts[u]))
+                w.pipe.zadd(f"pat:active:{gid}", {str(uid): int(self._last_ts[u])})
+                w.pipe.hset(f"pat:first_msg:{gid}:{uid}", mapping={
+                    "msg_id": str(int(first_mid[u])), "timestamp": str(int(first_ts[u])),
+                    "channel_id": str(int(first_cid[u]))})
+            await w.tick(5)
+        await w.flush()
+
+        counts["days_finalized"] = await finalize_days(r, rb, gid, days)
+        await rebuild_leaderboards(r, rb, gid)
+        counts["users_posting"] = len(posted)
+        counts["commands_written"] = w.commands
+        return dict(counts)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--gid", type=int, default=BENCH_GID)
+    parser.add_argument("--redis-url", required=True)
+    parser.add_argument("--flush", action="store_true", help="FLUSHDB the target database first")
+    args = parser.parse_args()
+
+    import redis.asyncio as aioredis
+    r = aioredis.from_url(args.redis_url, decode_responses=True)
+    rb = aioredis.from_url(args.redis_url)
+    try:
+        if args.flush:
+            await r.flushdb()
+        elif await r.dbsize():
+            print("Target database is not empty; pick an empty one or pass --flush")
+            return 1
+        started = time.perf_counter()
+        counts = await SyntheticCommunity(args.users, args.days, args.gid, args.seed).populate(r, rb)
+        print(f"{args.users} users x {args.days} days in {time.perf_counter() - started:.1f}s: {counts}")
+    finally:
+        await r.aclose()
+        await rb.aclose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
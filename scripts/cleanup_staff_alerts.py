@@ -16,22 +16,12 @@ for uid in staff_ids:
         if cursor == "0" or cursor == 0:
             break
             
-    # 2. Daily patterns
+    # 2. Daily pattern rollups (message stats, keywords, hours)
     cursor = "0"
     while True:
-        cursor, keys = r.scan(cursor=cursor, match=f"pat:kw:*:{uid}:*", count=500)
+        cursor, keys = r.scan(cursor=cursor, match=f"pat:day:*:{uid}:*", count=500)
         for k in keys:
-            # print(f"Deleting kw: {k}")
-            r.delete(k)
-        if cursor == "0" or cursor == 0:
-            break
-
-    # 3. Message stats
-    cursor = "0"
-    while True:
-        cursor, keys = r.scan(cursor=cursor, match=f"pat:msg:*:{uid}:*", count=500)
-        for k in keys:
-            # print(f"Deleting msg: {k}")
+            # print(f"Deleting day: {k}")
             r.delete(k)
         if cursor == "0" or cursor == 0:
             break
@@ -14,6 +14,15 @@ import argparse
 import sys
 import os
 
+# Add project root (and scripts/ for rebuild_event_buckets) to path for imports
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, "scripts"))
+
+from shared.python.redis_client import get_redis, close_redis
+from shared.python.keys import K_GUILD_DAYS, K_GUILD_META
+from shared.python.guild_meta import note_guild_activity
+
 
 BOT_TOKEN_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'bot_token.py'))
 CONFIG_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config', 'config.py'))
@@ -37,9 +46,6 @@ def get_default_config():
     return token, gid
 
 
-REDIS_URL = "redis://172.22.0.2:6379/0"
-
-
 def day_key(dt: datetime) -> str:
     return dt.strftime("%Y%m%d")
 
@@ -92,15 +98,6 @@ async def backfill_channel_history(bot: discord.Client, channel: discord.TextCha
     msglen_agg = defaultdict(int)  
     
     
-    user_msg_counts = defaultdict(int) 
-    user_avg_len_agg = defaultdict(list) 
-    
-    
-    
-    user_len_sum = defaultdict(int) 
-    
-    
-    
     channel_daily_stats = defaultdict(int) 
     channel_hourly_stats = defaultdict(int) 
     
@@ -149,10 +146,6 @@ async def backfill_channel_history(bot: discord.Client, channel: discord.TextCha
             user_event_buffer[evt_key][evt_data] = msg_dt.timestamp()
 
             
-            user_msg_counts[uid] += 1
-            user_len_sum[uid] += msg_len
-            
-            
             channel_daily_stats[date_str] += 1
             channel_hourly_stats[hour] += 1
 
@@ -176,6 +169,7 @@ async def backfill_channel_history(bot: discord.Client, channel: discord.TextCha
                     k = f"stats:hourly:{gid}:{d_str}"
                     for h, c in hours.items(): pipe.hincrby(k, str(h), c)
                     pipe.expire(k, 60*86400)
+                note_guild_activity(pipe, gid, days=daily_stats, msgs=BATCH_SIZE)
                 daily_stats.clear() 
                 
                 
@@ -217,15 +211,6 @@ async def backfill_channel_history(bot: discord.Client, channel: discord.TextCha
                 channel_hourly_stats.clear()
                      
                 
-                for uid, c in user_msg_counts.items():
-                    pipe.zincrby(f"leaderboard:messages:{gid}", c, uid)
-                    
-                    
-                    avg = int(user_len_sum[uid] / c)
-                    k_len = f"leaderboard:msg_lengths:{gid}:{uid}"
-                    pipe.lpush(k_len, avg)
-                user_msg_counts.clear()
-                user_len_sum.clear()
 
                 await pipe.execute()
                 
@@ -253,6 +238,8 @@ async def backfill_channel_history(bot: discord.Client, channel: discord.TextCha
             k = f"stats:hourly:{gid}:{d_str}"
             for h, c in hours.items(): pipe.hincrby(k, str(h), c)
             pipe.expire(k, 60*86400)
+        leftover = msg_count % BATCH_SIZE
+        note_guild_activity(pipe, gid, days=daily_stats, msgs=leftover)
             
         for d_str, uids in hll_members.items():
             k = f"hll:dau:{gid}:{d_str}"
@@ -265,7 +252,6 @@ async def backfill_channel_history(bot: discord.Client, channel: discord.TextCha
         for b, c in msglen_agg.items():
             pipe.zincrby(f"stats:msglen:{gid}", c, b)
             
-        leftover = msg_count % BATCH_SIZE
         pipe.incrby(f"stats:total_msgs:{gid}", leftover)
         pipe.zincrby(f"stats:channel_total:{gid}", leftover, cid)
         pipe.hset(f"channel:info:{cid}", mapping={"name": channel.name})
@@ -276,11 +262,6 @@ async def backfill_channel_history(bot: discord.Client, channel: discord.TextCha
         for h, c in channel_hourly_stats.items():
             pipe.hincrby(f"stats:channel_hourly:{gid}:{cid}", h, c)
              
-        for uid, c in user_msg_counts.items():
-            pipe.zincrby(f"leaderboard:messages:{gid}", c, uid)
-            avg = int(user_len_sum[uid] / c)
-            pipe.lpush(f"leaderboard:msg_lengths:{gid}:{uid}", avg)
-        
         await pipe.execute()
         print(f"    ✓ Uploaded {msg_count} messages to Redis")
     
@@ -296,9 +277,15 @@ async def reset_stats(r: redis.Redis, gid: int):
         match_patterns = [
             f"stats:hourly:{gid}:*",
             f"hll:dau:{gid}:*",
+            f"stats:sticky:{gid}",
             f"stats:heatmap:{gid}",
             f"stats:msglen:{gid}",
-            f"stats:total_msgs:{gid}"
+            f"stats:total_msgs:{gid}",
+            K_GUILD_DAYS(gid),
+            K_GUILD_META(gid),
+            # Rebuilt from the rollups at the end (shared/python/leaderboards.py)
+            f"leaderboard:*:{gid}",
+            f"leaderboard:*:{gid}:*",
         ]
         
         for pattern in match_patterns:
@@ -327,7 +314,7 @@ async def main(target_guild_id: int, target_token: str):
     intents.members = True 
     
     bot = discord.Client(intents=intents)
-    r = redis.from_url(REDIS_URL, decode_responses=True)
+    r = await get_redis()
     
     @bot.event
     async def on_ready():
@@ -401,20 +388,28 @@ async def main(target_guild_id: int, target_token: str):
         
 
         
+        # Dashboard aggregations read the packed day buckets and their rollups, regenerate
+        # them from the events:* sorted sets written above
+        print("\nRebuilding event buckets and rollups...")
+        from rebuild_event_buckets import rebuild_event_buckets
+        await rebuild_event_buckets(target_guild_id)
+
         await report_progress(r, target_guild_id, "completed", total_messages)
         print("\n" + "=" * 60)
         print(f"✓ FULL Backfill complete!")
         print(f"  Total messages processed: {total_messages:,}")
         print("=" * 60)
         
-        await r.close()
+        await r.aclose()
+        await close_redis()
         await bot.close()
     
     try:
         await bot.start(target_token)
     except Exception as e:
         print(f"\n\nBackfill failed: {e}")
-        await r.close()
+        await r.aclose()
+        await close_redis()
         await bot.close()
 
 
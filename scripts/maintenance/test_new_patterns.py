@@ -12,7 +12,7 @@ sys.path.append(os.path.abspath("/root/discord-bot/services/worker/commands"))
 sys.path.append(os.path.abspath("/root/discord-bot"))
 
 from patterns.detectors import PatternDetectors
-from patterns.common import K_MSG, K_KW, K_EDIT, K_JOIN, K_DIARY, K_QUESTION, K_STAFF_RESPONSE
+from patterns.common import K_DAY, K_JOIN, K_DIARY, K_QUESTION, K_STAFF_RESPONSE
 
 class MockRedis:
     def __init__(self):
@@ -54,6 +54,32 @@ class MockRedis:
         keys = [k for k in self.data.keys() if fnmatch.fnmatch(k, match)]
         return "0", keys
 
+    async def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    async def llen(self, key):
+        return len(self.data.get(key, []))
+
+    def pipeline(self):
+        return MockPipeline(self)
+
+class MockPipeline:
+    """Queues calls and replays them against MockRedis on execute()."""
+    def __init__(self, redis):
+        self._redis = redis
+        self._calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        results = [await getattr(self._redis, n)(*a, **kw) for n, a, kw in self._calls]
+        self._calls = []
+        return results
+
 async def test_detectors():
     r = MockRedis()
     gid = 123
@@ -64,9 +90,8 @@ async def test_detectors():
     
     print("--- Testing 'Hluboké zpovědi' ---")
     # Word count > 800 and analytical style
-    msg_key = K_MSG(gid, uid, today)
-    r.data[msg_key] = {"word_count": "900", "msg_count": "1"}
-    r.data[K_KW(gid, uid, today, "analytical_hits")] = "2"
+    day_key = K_DAY(gid, uid, today)
+    r.data[day_key] = {"word_count": "900", "msg_count": "1", "kw:analytical_hits": "2"}
     
     alerts = await detectors.scan_user(r, gid, uid, datetime.now(timezone.utc), today)
     found = False
@@ -77,7 +102,7 @@ async def test_detectors():
     if not found: print("❌ Pattern 'Hluboké zpovědi' not found")
 
     print("\n--- Testing 'Stud po dumpingu' ---")
-    r.data[f"pat:del_long:{gid}:{uid}:{today}"] = "1"
+    r.data[day_key]["del_long"] = "1"
     alerts = await detectors.scan_user(r, gid, uid, datetime.now(timezone.utc), today)
     found = False
     for a in alerts:
@@ -110,8 +135,7 @@ async def test_detectors():
 
     print("\n--- Testing 'Moderátorský syndrom' ---")
     uid_preachy = 111
-    r.data[K_MSG(gid, uid_preachy, today)] = {"msg_count": "10", "reply_count": "1"}
-    r.data[K_KW(gid, uid_preachy, today, "preachy")] = "5"
+    r.data[K_DAY(gid, uid_preachy, today)] = {"msg_count": "10", "reply_count": "1", "kw:preachy": "5"}
     alerts = await detectors.scan_user(r, gid, uid_preachy, datetime.now(timezone.utc), today)
     found = False
     for a in alerts:
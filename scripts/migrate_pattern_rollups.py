@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Migrate Pattern Rollups
+Folds the legacy one-key-per-counter pattern layout into the compact daily
+rollup hash pat:day:{gid}:{uid}:{date} (see shared/python/pattern_logic.py):
+
+  pat:msg:{gid}:{uid}:{date}           hash   -> word_count, msg_count, ...
+  pat:kw:{gid}:{uid}:{date}:{group}    string -> kw:{group}
+  pat:hour:{gid}:{uid}:{date}          hash   -> h:{hour}
+  pat:del:{gid}:{uid}:{date}           string -> del
+  pat:del_long:{gid}:{uid}:{date}      string -> del_long
+  pat:edit:{gid}:{uid}:{date}          string -> edit
+
+Legacy keys are deleted in the same transaction they are merged in, so the
+script can be interrupted and re-run safely. The rollup inherits the longest
+remaining TTL of its source keys.
+
+Usage:
+  python scripts/migrate_pattern_rollups.py --dry-run
+  python scripts/migrate_pattern_rollups.py [--batch 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import redis
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from shared.python.redis_client import REDIS_URL
+from shared.python.pattern_logic import kw_field, hour_field
+
+# prefix -> (redis type, number of ':' separated parts)
+LEGACY_PREFIXES = {
+    "pat:msg:": ("hash", 5),
+    "pat:kw:": ("string", 6),
+    "pat:hour:": ("hash", 5),
+    "pat:del:": ("string", 5),
+    "pat:del_long:": ("string", 5),
+    "pat:edit:": ("string", 5),
+}
+STRING_FIELDS = {"pat:del:": "del", "pat:del_long:": "del_long", "pat:edit:": "edit"}
+
+
+def K_DAY(gid, uid, date): return f"pat:day:{gid}:{uid}:{date}"
+
+
+def rollup_fields(prefix: str, parts: list, value) -> dict:
+    """Map one legacy key's value to {rollup field: increment}."""
+    if prefix == "pat:msg:":
+        return {f: int(v) for f, v in value.items()}
+    if prefix == "pat:hour:":
+        return {hour_field(int(h)): int(c) for h, c in value.items()}
+    if prefix == "pat:kw:":
+        return {kw_field(parts[5]): int(value)}
+    return {STRING_FIELDS[prefix]: int(value)}
+
+
+def migrate_prefix(r, prefix: str, batch: int, dry_run: bool) -> tuple:
+    rtype, nparts = LEGACY_PREFIXES[prefix]
+    cursor = "0"
+    migrated = 0
+    skipped = 0
+    rollups = set()
+    while True:
+        cursor, keys = r.scan(cursor=cursor, match=f"{prefix}*", count=batch)
+        keys = [k for k in keys if len(k.split(":")) == nparts]
+        if keys:
+            if dry_run:
+                migrated += len(keys)
+                rollups.update(K_DAY(*k.split(":")[2:5]) for k in keys)
+            else:
+                read = r.pipeline(transaction=False)
+                for k in keys:
+                    if rtype == "hash":
+                        read.hgetall(k)
+                    else:
+                        read.get(k)
+                    read.ttl(k)
+                res = read.execute()
+
+                write = r.pipeline(transaction=True)
+                for i, k in enumerate(keys):
+                    value, ttl = res[2 * i], res[2 * i + 1]
+                    if not value:
+                        skipped += 1
+                        continue
+                    parts = k.split(":")
+                    day_key = K_DAY(parts[2], parts[3], parts[4])
+                    try:
+                        fields = rollup_fields(prefix, parts, value)
+                    except (TypeError, ValueError):
+                        skipped += 1
+                        continue
+                    for field, amount in fields.items():
+                        write.hincrby(day_key, field, amount)
+                    if ttl and ttl > 0:
+                        # Keep the longest remaining TTL among merged keys (NX first, then GT)
+                        write.expire(day_key, ttl, nx=True)
+                        write.expire(day_key, ttl, gt=True)
+                    write.delete(k)
+                    rollups.add(day_key)
+                    migrated += 1
+                write.execute()
+        if cursor == 0 or cursor == "0":
+            break
+    return migrated, skipped, len(rollups)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="Only count legacy keys")
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    r = redis.from_url(REDIS_URL, decode_responses=True)
+    mem_before = r.info("memory").get("used_memory_human")
+    keys_before = r.dbsize()
+    started = time.time()
+
+    print(f"--- Pattern rollup migration {'(dry run) ' if args.dry_run else ''}---")
+    total = 0
+    for prefix in LEGACY_PREFIXES:
+        migrated, skipped, rollups = migrate_prefix(r, prefix, args.batch, args.dry_run)
+        total += migrated
+        print(f"{prefix:<16} {migrated:>9} keys -> {rollups:>8} rollups ({skipped} skipped)")
+
+    print(f"Done in {time.time() - started:.1f}s: {total} legacy keys processed.")
+    print(f"Keys: {keys_before} -> {r.dbsize()}, memory: {mem_before} -> {r.info('memory').get('used_memory_human')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,13 @@ import socket
 import ssl
 import time
 import httpx
-import redis.asyncio as redis
 import psutil
 import shutil
 import docker
 import subprocess
 from datetime import datetime
 from shared.python.ai_client import AIClient
+from shared.python.redis_client import configure_redis, get_redis, publish_redis_stats
 
 # Configuration
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
@@ -37,8 +37,10 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+configure_redis(url=REDIS_URL)
+
 async def get_redis_client():
-    return redis.from_url(REDIS_URL, decode_responses=True)
+    return await get_redis()
 
 async def get_last_alert_time(r, key):
     val = await r.get(f"monitor:alert:{key}")
@@ -251,6 +253,7 @@ async def monitor_loop():
             await check_docker(r, local_states, docker_client)
             
             for k, v in local_states.items(): await r.set(f"monitor:status:{k}", v)
+            await publish_redis_stats("monitor")
             await asyncio.sleep(CHECK_INTERVAL)
         except Exception as e:
             logging.error(f"Loop error: {e}")
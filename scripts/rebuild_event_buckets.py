@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Rebuild Event Buckets
+Regenerates the packed per-day event buckets (evb:msg / evb:voice / evb:action,
+see shared/python/event_codec.py) from the per-user events:* sorted sets.
+
+Run once after deploying the packed format, and after any backfill that
+writes events:* directly. Buckets are overwritten and the daily rollups of
+the rebuilt days (agg:events:*, see shared/python/event_rollups.py) are
+finalized again, the leaderboards rebuilt from them
+(shared/python/leaderboards.py) and the guild's dashboard caches
+invalidated, so the script is idempotent; events the Go core appends to
+today's bucket while the rebuild is running are still in the sorted sets
+and come back on the next run.
+
+Usage:
+  python scripts/rebuild_event_buckets.py --guild_id 123 [--days 30]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+import redis.asyncio as aioredis
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from shared.python.redis_client import REDIS_URL
+from shared.python.event_codec import K_EVB, bucket_day, encode_msg, encode_voice, encode_action
+from shared.python.event_rollups import finalize_days
+from shared.python.leaderboards import rebuild_leaderboards
+from shared.python.cache import FAMILIES, bump_cache_version
+
+
+def encode_event(kind: str, uid: int, member: str, score: float) -> bytes:
+    data = json.loads(member)
+    if kind == "msg":
+        return encode_msg(uid, score, data.get("len", 0), bool(data.get("reply")))
+    if kind == "voice":
+        return encode_voice(uid, score, data.get("duration", 0))
+    return encode_action(uid, score, data.get("type", "unknown"))
+
+
+async def rebuild_event_buckets(gid: int, days: int = None) -> dict:
+    """Rebuild all buckets of a guild (only the last `days` days if given). Returns record counts."""
+    r = aioredis.from_url(REDIS_URL, decode_responses=True)
+    rb = aioredis.from_url(REDIS_URL, decode_responses=False)
+    # Whole UTC days only, so a partially read first day never overwrites its bucket
+    min_ts = (int(time.time()) // 86400 - days) * 86400 if days else "-inf"
+    counts = {}
+    rebuilt_days = set()
+    try:
+        for kind in ("msg", "voice", "action"):
+            buckets = defaultdict(list)
+            prefix = f"events:{kind}:{gid}:"
+            async for key in r.scan_iter(f"{prefix}*", count=500):
+                uid = key[len(prefix):]
+                if not uid.isdigit():
+                    continue
+                for member, score in await r.zrangebyscore(key, min_ts, "+inf", withscores=True):
+                    try:
+                        buckets[bucket_day(score)].append((score, encode_event(kind, int(uid), member, score)))
+                    except (ValueError, TypeError):
+                        continue
+
+            pipe = rb.pipeline(transaction=False)
+            for day, records in buckets.items():
+                records.sort(key=lambda rec: rec[0])
+                pipe.set(K_EVB(kind, gid, day), b"".join(rec for _, rec in records))
+            await pipe.execute()
+            counts[kind] = sum(len(v) for v in buckets.values())
+            rebuilt_days.update(buckets)
+            print(f"  {kind:<7} {counts[kind]:>9} events in {len(buckets)} day buckets")
+
+        finalized = await finalize_days(r, rb, gid, sorted(rebuilt_days), overwrite=True)
+        print(f"  rollups {finalized:>9} days finalized")
+        lb_days = await rebuild_leaderboards(r, rb, gid)
+        print(f"  leaderboards rebuilt from {lb_days} days")
+        # Past days changed: drop every dashboard cache of the guild, finalized ranges included
+        await bump_cache_version(r, gid, *FAMILIES)
+    finally:
+        await r.aclose()
+        await rb.aclose()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--guild_id", type=int, required=True)
+    parser.add_argument("--days", type=int, default=None, help="Only rebuild the last N days")
+    args = parser.parse_args()
+
+    print(f"Rebuilding event buckets for guild {args.guild_id}...")
+    asyncio.run(rebuild_event_buckets(args.guild_id, args.days))
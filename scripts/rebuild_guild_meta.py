@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Rebuild Guild Metadata Index
+Bootstraps the indexes that replace KEYS on dashboard request paths
+(see shared/python/guild_meta.py):
+
+  guild:days:{gid}        <- SCAN stats:hourly:{gid}:*
+  guild:meta:{gid}        <- stats:total_msgs:{gid}
+  automod:pending_index   <- SCAN automod:pending:*   (score from remaining TTL)
+  training:users          <- SCAN training:results:*
+
+Writers keep the indexes current afterwards; the script only SCANs, so it
+is safe to run against the live Redis, and idempotent.
+
+Usage:
+  python scripts/rebuild_guild_meta.py [--guild_id 123]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import redis
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from shared.python.redis_client import REDIS_URL
+from shared.python.keys import (
+    K_GUILD_DAYS, K_GUILD_META, K_TOTAL_MSGS, K_AUTOMOD_PENDING_INDEX, K_TRAINING_USERS,
+)
+
+PENDING_TTL = 24 * 3600  # automod:pending:* lifetime set by the Go core
+
+
+def rebuild_guild(r, gid: str) -> tuple:
+    prefix = f"stats:hourly:{gid}:"
+    days = {}
+    for key in r.scan_iter(f"{prefix}*", count=500):
+        d = key[len(prefix):]
+        if d.isdigit() and len(d) == 8:
+            days[d] = int(d)
+
+    pipe = r.pipeline(transaction=True)
+    pipe.delete(K_GUILD_DAYS(gid))
+    if days:
+        pipe.zadd(K_GUILD_DAYS(gid), days)
+    total = int(r.get(K_TOTAL_MSGS(gid)) or 0)
+    pipe.hset(K_GUILD_META(gid), "total_msgs", total)
+    pipe.execute()
+    return len(days), total
+
+
+def rebuild_pending_index(r) -> int:
+    now = time.time()
+    prefix = "automod:pending:"
+    entries = {}
+    for key in r.scan_iter(f"{prefix}*", count=500):
+        ttl = r.ttl(key)
+        if ttl and ttl > 0:
+            entries[key[len(prefix):]] = now - (PENDING_TTL - ttl)
+    if entries:
+        r.zadd(K_AUTOMOD_PENDING_INDEX(), entries)
+    return len(entries)
+
+
+def rebuild_training_users(r) -> int:
+    prefix = "training:results:"
+    users = [key[len(prefix):] for key in r.scan_iter(f"{prefix}*", count=500)]
+    if users:
+        r.sadd(K_TRAINING_USERS(), *users)
+    return len(users)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--guild_id", type=str, help="Only this guild (default: all of bot:guilds)")
+    args = parser.parse_args()
+
+    r = redis.from_url(REDIS_URL, decode_responses=True)
+    guilds = [args.guild_id] if args.guild_id else sorted(g for g in r.smembers("bot:guilds") if g.isdigit())
+
+    print("--- Guild metadata index ---")
+    for gid in guilds:
+        days, total = rebuild_guild(r, gid)
+        print(f"{gid:<20} {days:>5} days {total:>10} msgs")
+    print(f"automod pending index: {rebuild_pending_index(r)} entries")
+    print(f"training users:        {rebuild_training_users(r)} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Redis Call Sites
+Prints the per-call-site Redis counters the services publish every minute
+(redis:callsites:{service}, see shared/python/redis_client.py), busiest
+first, to find which cog or endpoint hammers Redis.
+
+Usage:
+  python scripts/redis_callsites.py [--service worker] [--top 20] [--sort commands|round_trips|total_ms|p95_ms]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from shared.python.redis_client import K_REDIS_STATS, close_redis, get_redis
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--service", action="append", help="worker, dashboard, monitor (default: all)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--sort", default="commands", choices=["commands", "round_trips", "total_ms", "p95_ms", "errors"])
+    args = parser.parse_args()
+
+    r = await get_redis()
+    try:
+        services = args.service or ["worker", "dashboard", "monitor"]
+        for service in services:
+            data = await r.hgetall(K_REDIS_STATS.format(service=service))
+            if not data:
+                print(f"[{service}] no data")
+                continue
+            updated = int(data.pop("_updated", 0))
+            rows = sorted(((site, json.loads(raw)) for site, raw in data.items()),
+                          key=lambda kv: kv[1][args.sort], reverse=True)
+            print(f"[{service}] updated {int(time.time()) - updated}s ago")
+            print(f"  {'call site':<70} {'cmds':>8} {'trips':>8} {'err':>5} {'avg ms':>8} {'p95 ms':>8} {'total ms':>10}")
+            for site, row in rows[:args.top]:
+                print(f"  {site[-70:]:<70} {row['commands']:>8} {row['round_trips']:>8} {row['errors']:>5} "
+                      f"{row['avg_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['total_ms']:>10.0f}")
+            print()
+    finally:
+        await r.aclose()
+        await close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
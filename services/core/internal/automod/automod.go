@@ -5,16 +5,21 @@ import (
 	"fmt"
 	"log/slog"
 	"regexp"
+	"strconv"
 	"strings"
 	"time"
 
 	"github.com/bwmarrin/discordgo"
 	"github.com/nepornucz/discord-bot-core/internal/config"
 	"github.com/nepornucz/discord-bot-core/internal/redis_client"
+	"github.com/redis/go-redis/v9"
 )
 
 var linkRegex = regexp.MustCompile(`(?i)https?://[^\s/$.?#].[^\s]*`)
 
+// Sorted set of pending message IDs (score = queued at), read by the dashboard
+const pendingIndexKey = "automod:pending_index"
+
 type Filter struct {
 	ID              int      `json:"id,omitempty"`
 	Pattern         string   `json:"pattern"`
@@ -223,6 +228,10 @@ func (a *AutoModService) queueForApproval(s *discordgo.Session, m *discordgo.Mes
 	key := fmt.Sprintf("automod:pending:%s", m.ID)
 	if redis_client.Client != nil {
 		redis_client.Client.Set(redis_client.Ctx, key, data, 24*time.Hour)
+		// Index for readers that must not KEYS automod:pending:* (entries past the TTL are trimmed here)
+		now := time.Now()
+		redis_client.Client.ZAdd(redis_client.Ctx, pendingIndexKey, redis.Z{Score: float64(now.Unix()), Member: m.ID})
+		redis_client.Client.ZRemRangeByScore(redis_client.Ctx, pendingIndexKey, "-inf", strconv.FormatInt(now.Add(-24*time.Hour).Unix(), 10))
 	}
 
 	// Determine destination channel (Always use LinkApprovalChannel as requested)
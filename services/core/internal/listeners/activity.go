@@ -1,8 +1,10 @@
 package listeners
 
 import (
+	"encoding/binary"
 	"encoding/json"
 	"fmt"
+	"strconv"
 	"time"
 
 	"github.com/bwmarrin/discordgo"
@@ -39,11 +41,32 @@ func (l *ActivityListener) OnMessage(s *discordgo.Session, m *discordgo.MessageC
 		Member: string(eventData),
 	})
 
+	// Packed record for dashboard aggregations (layout: shared/python/event_codec.py),
+	// and a bump of the guild's message cache version (shared/python/cache.py)
+	bucketKey := fmt.Sprintf("evb:msg:%s:%s", gid, m.Timestamp.UTC().Format("20060102"))
+	pipe := redis_client.Client.Pipeline()
+	pipe.Append(redis_client.Ctx, bucketKey, string(packMsgEvent(uid, m.Timestamp, len(m.Content), m.ReferencedMessage != nil)))
+	pipe.HIncrBy(redis_client.Ctx, fmt.Sprintf("cache_version:%s", gid), "messages", 1)
+	pipe.Exec(redis_client.Ctx)
+
 	stats.TrackUser(uid, gid)
 
 	l.UpdateUserInfo(m.Author, m.Member)
 }
 
+// packMsgEvent encodes uid u64 | ts u32 | len u32 | flags u8, little-endian (17 bytes).
+func packMsgEvent(uid string, ts time.Time, length int, reply bool) []byte {
+	buf := make([]byte, 17)
+	id, _ := strconv.ParseUint(uid, 10, 64)
+	binary.LittleEndian.PutUint64(buf[0:8], id)
+	binary.LittleEndian.PutUint32(buf[8:12], uint32(ts.Unix()))
+	binary.LittleEndian.PutUint32(buf[12:16], uint32(length))
+	if reply {
+		buf[16] = 1
+	}
+	return buf
+}
+
 func (l *ActivityListener) UpdateUserInfo(user *discordgo.User, member *discordgo.Member) {
 	key := fmt.Sprintf("user:info:%s", user.ID)
 	
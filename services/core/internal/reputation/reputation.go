@@ -76,10 +76,17 @@ func (r *ReputationService) GiveRep(fromID, toID, guildID, channelID, reason str
 	pipe.LPush(ctx, eventsKey, eventJSON)
 	pipe.LTrim(ctx, eventsKey, 0, 99) // Keep last 100 events
 	
+	// Giver -> count per receiver: the edges of the reputation graph the
+	// trust recalculation analyzes instead of replaying rep:events
+	pipe.HIncrBy(ctx, fmt.Sprintf("rep:giver_counts:%s", toID), fromID, 1)
+
 	// Leaderboard update
 	lbKey := fmt.Sprintf("rep:leaderboard:%s", guildID)
 	pipe.ZIncrBy(ctx, lbKey, 1, toID)
-	
+
+	// Both ends need a trust recalculation (services/worker/commands/reputation_engine.py)
+	pipe.SAdd(ctx, fmt.Sprintf("rep:dirty:%s", guildID), toID, fromID)
+
 	// Update daily limit
 	pipe.Incr(ctx, limitKey)
 	pipe.Expire(ctx, limitKey, 24*time.Hour)
@@ -5,6 +5,7 @@ import httpx
 import random
 import redis.asyncio as redis
 from shared.python.redis_client import get_redis
+from shared.python.keys import K_TRAINING_USERS, K_TRAINING_RESULTS
 
 # Ollama integration has been removed as it is no longer needed.
 # This file now only contains base templates and simple forum context helper.
@@ -227,9 +228,9 @@ async def fetch_discord_training_history(limit=5):
     try:
         r = await get_redis()
         results = []
-        user_keys = await r.keys("training:results:*")
-        for key in user_keys[:3]:  # Check up to 3 users
-            entries = await r.lrange(key, -limit, -1)
+        user_ids = await r.srandmember(K_TRAINING_USERS(), 3)  # Check up to 3 users
+        for uid in user_ids:
+            entries = await r.lrange(K_TRAINING_RESULTS(uid), -limit, -1)
             for entry in entries:
                 try:
                     data = json.loads(entry)
@@ -1,20 +1,15 @@
 import json
-import subprocess
 import os
 import asyncio
-from shared.python.redis_client import get_redis_client
+from shared.python.redis_client import get_redis
+from shared.python.discourse_db import get_discourse_db
+from shared.python.keys import K_AUTOMOD_PENDING_INDEX, K_TRAINING_USERS, K_TRAINING_RESULTS
 
 async def extract_discourse_knowledge(limit=200):
     """Extract a large batch of forum posts for training data."""
     print(f"Extracting {limit} forum posts...")
-    cmd = [
-        "docker", "exec", "app", "sudo", "-u", "postgres", "psql", "-d", "discourse",
-        "-t", "-c", f"SELECT raw FROM posts WHERE post_type=1 AND length(raw) > 50 ORDER BY created_at DESC LIMIT {limit};"
-    ]
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        posts = [p.strip() for p in result.stdout.split('\n') if p.strip()]
-        return posts
+        return await get_discourse_db().recent_posts(limit, min_length=50)
     except Exception as e:
         print(f"Error extracting Discourse knowledge: {e}")
         return []
@@ -26,9 +21,10 @@ async def extract_discord_knowledge(limit=500):
     knowledge = []
     try:
         # 1. Try Automod historical logs (high density of "scenarios")
-        keys = await r.keys("automod:pending:*")
-        for key in keys[:limit//2]:
-            data = await r.get(key)
+        # Newest first; entries that already expired or were handled come back as None
+        msg_ids = await r.zrevrange(K_AUTOMOD_PENDING_INDEX(), 0, limit//2 - 1)
+        pending = await r.mget([f"automod:pending:{mid}" for mid in msg_ids]) if msg_ids else []
+        for data in pending:
             if data:
                 msg = json.loads(data)
                 content = msg.get("content", "").strip()
@@ -36,9 +32,9 @@ async def extract_discord_knowledge(limit=500):
                     knowledge.append(f"Automod Trigger: {content}")
         
         # 2. Extract real moderator training responses (gold data)
-        training_keys = await r.keys("training:results:*")
-        for key in training_keys[:limit//2]:
-            entries = await r.lrange(key, 0, -1)
+        training_users = list(await r.smembers(K_TRAINING_USERS()))
+        for uid in training_users[:limit//2]:
+            entries = await r.lrange(K_TRAINING_RESULTS(uid), 0, -1)
             for entry in entries:
                 try:
                     data = json.loads(entry)
@@ -33,7 +33,8 @@ import sys
 root_dir = "/app" if os.path.exists("/app") else "/root/discord-bot"
 if root_dir not in sys.path:
     sys.path.append(root_dir)
-from shared.python.redis_client import get_redis_client
+from shared.python.redis_client import get_redis_client, publish_redis_stats, close_redis
+from .profiling import profile_requests, stage, latency_report
 import uuid
 import asyncio
 from services.dashboard.backend.generator_utils import generate_local_scenario, BASE_TEMPLATES
@@ -87,7 +88,8 @@ from .utils import (
     get_voice_leaderboard, get_command_stats, get_traffic_stats, get_channel_distribution,
     get_time_comparisons, get_leaderboard_data,
     get_dashboard_team, add_dashboard_user, remove_dashboard_user, get_dashboard_permissions,
-    get_daily_stats, get_action_weights
+    get_daily_stats, get_action_weights,
+    get_public_landing_stats
 )
 
 
@@ -119,6 +121,7 @@ app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY, session_cookie=SESS
 
 @app.on_event("startup")
 async def startup_event():
+    asyncio.create_task(redis_stats_publisher())
     if APP_MODE == "training":
         # Seed base scenarios if none exist
         import json
@@ -134,11 +137,21 @@ async def startup_event():
             
         # Ollama scenario generation removed.
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    print(f"REQUEST: {request.method} {request.url.path}")
-    response = await call_next(request)
-    return response
+async def redis_stats_publisher():
+    """Publishes per-call-site Redis counters (redis:callsites:dashboard) every minute."""
+    while True:
+        await asyncio.sleep(60)
+        try:
+            await publish_redis_stats("dashboard")
+        except Exception as e:
+            print(f"[Dashboard] Redis stats publish failed: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_redis()
+
+# Logs each request and adds Server-Timing (see profiling.py)
+app.middleware("http")(profile_requests)
 
 @app.get("/dashboard/status", response_class=HTMLResponse)
 @app.get("/status", response_class=HTMLResponse)
@@ -378,22 +391,10 @@ async def landing_about(request: Request):
     
     stats = {"servers": "1", "users": "---", "uptime": "99.9%"}
     try:
-        r = await get_redis_client()
-        bot_guilds = await r.smembers("bot:guilds")
-        
-        total_msgs = 0
-        total_users = 0
-        
-        for gid in bot_guilds:
-            tm = await r.get(f"stats:total_msgs:{gid}") or "0"
-            tu = await r.get(f"presence:total:{gid}") or "0"
-            
-            total_msgs += int(tm)
-            total_users += int(tu)
-            
-        stats["servers"] = len(bot_guilds)
-        stats["users"] = f"{total_users:,}".replace(",", " ")
-        stats["messages"] = f"{total_msgs:,}".replace(",", " ")
+        landing = await get_public_landing_stats()
+        stats["servers"] = landing["servers"]
+        stats["users"] = f"{landing['users']:,}".replace(",", " ")
+        stats["messages"] = f"{landing['messages']:,}".replace(",", " ")
         
     except Exception as e:
         print(f"Error fetching about stats: {e}")
@@ -433,31 +434,11 @@ async def _dashboard_logic(request: Request, start_date: str = None, end_date: s
         
         
         try:
-             r = await get_redis_client()
-             bot_guilds = await r.smembers("bot:guilds")
-             
-             
-             total_msgs = 0
-             total_users = 0
-             max_days = 0
-             
-             for gid in bot_guilds:
-                 if not str(gid).isdigit():
-                     continue
-                 tm = await r.get(f"stats:total_msgs:{gid}") or "0"
-                 tu = await r.get(f"presence:total:{gid}") or "0"
-                 hourly = await r.keys(f"stats:hourly:{gid}:*")
-                 
-                 total_msgs += int(tm)
-                 total_users += int(tu)
-                 max_days = max(max_days, len(hourly))
-             
-             pass
-             
+             landing = await get_public_landing_stats()
              public_stats = {
-                 "messages": f"{total_msgs:,}".replace(",", " "),
-                 "users": f"{total_users:,}".replace(",", " "),
-                 "days": max_days
+                 "messages": f"{landing['messages']:,}".replace(",", " "),
+                 "users": f"{landing['users']:,}".replace(",", " "),
+                 "days": landing["days"]
              }
         except Exception as e:
             print(f"Error fetching dashboard guilds: {e}")
@@ -560,7 +541,8 @@ async def _dashboard_logic(request: Request, start_date: str = None, end_date: s
     
     
     from .utils import get_cached_roles
-    roles = await get_cached_roles(guild_id)
+    with stage("roles"):
+        roles = await get_cached_roles(guild_id)
     roles_list = [(r["id"], r["name"]) for r in roles]
 
 
@@ -569,25 +551,31 @@ async def _dashboard_logic(request: Request, start_date: str = None, end_date: s
 
 
     
-    member_stats = await load_member_stats(guild_id, start_date=start_date, end_date=end_date)
+    with stage("member_stats"):
+        member_stats = await load_member_stats(guild_id, start_date=start_date, end_date=end_date)
     
     
-    activity_stats = await get_activity_stats(guild_id, start_date=start_date, end_date=end_date)
+    with stage("activity_stats"):
+        activity_stats = await get_activity_stats(guild_id, start_date=start_date, end_date=end_date)
     
     
-    deep_stats = await get_deep_stats_redis(guild_id=guild_id, start_date=start_date, end_date=end_date)
+    with stage("deep_stats"):
+        deep_stats = await get_deep_stats_redis(guild_id=guild_id, start_date=start_date, end_date=end_date)
     
     
-    redis_stats = await get_redis_dashboard_stats(guild_id, start_date=start_date, end_date=end_date, role_id=role_id)
+    with stage("redis_stats"):
+        redis_stats = await get_redis_dashboard_stats(guild_id, start_date=start_date, end_date=end_date, role_id=role_id)
     deep_stats.update(redis_stats)
     
     
-    realtime_active = await get_realtime_online_count(guild_id)
+    with stage("realtime"):
+        realtime_active = await get_realtime_online_count(guild_id)
 
 
 
     
-    summary = await get_summary_card_data(guild_id=guild_id)
+    with stage("summary"):
+        summary = await get_summary_card_data(guild_id=guild_id)
     # Ensure member_stats total series aligns with authoritative summary total.
     # Apply an offset so the final point of the reconstructed series matches
     # `summary["discord"]["users"]`. This preserves the trend while fixing
@@ -612,13 +600,14 @@ async def _dashboard_logic(request: Request, start_date: str = None, end_date: s
     current_wau = deep_stats.get("wau_data", [])[-1] if deep_stats.get("wau_data") else 0
     
     
-    summary_stats = await get_summary_card_data(
-        discord_dau=current_dau,
-        discord_mau=current_mau,
-        discord_wau=current_wau,
-        discord_users=current_total, 
-        guild_id=guild_id
-    )
+    with stage("summary_cards"):
+        summary_stats = await get_summary_card_data(
+            discord_dau=current_dau,
+            discord_mau=current_mau,
+            discord_wau=current_wau,
+            discord_users=current_total, 
+            guild_id=guild_id
+        )
     
     
     real_total_members = summary_stats["discord"]["users"]
@@ -679,10 +668,12 @@ async def _dashboard_logic(request: Request, start_date: str = None, end_date: s
         print(f"[DEBUG] error printing member stats debug: {e}")
 
     
-    sidebar_ctx = await get_sidebar_context(request)
+    with stage("sidebar"):
+        sidebar_ctx = await get_sidebar_context(request)
     context.update(sidebar_ctx)
     
-    return templates.TemplateResponse("index.html", context)
+    with stage("render"):
+        return templates.TemplateResponse("index.html", context)
 
 
 
@@ -712,6 +703,11 @@ async def require_admin(request: Request):
     if request.session.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Přístup pouze pro administrátory")
 
+@app.get("/api/admin/latency")
+async def admin_latency(_=Depends(require_admin)):
+    """Rolling per-route latency histogram, the busiest Redis call sites and the result cache counters of this process."""
+    return JSONResponse(latency_report())
+
 async def get_sidebar_context(request: Request) -> Dict[str, Any]:
     """
     Globally inject sidebar data via Flat Variable Resolution.
@@ -1307,16 +1303,19 @@ async def analytics_page(request: Request, start_date: str = None, end_date: str
     widget_order = request.session.get("dashboard_order", DEFAULT_ORDER)
 
     
-    summary = await get_summary_card_data(guild_id=guild_id)
+    with stage("summary"):
+        summary = await get_summary_card_data(guild_id=guild_id)
     has_any_data = summary["discord"]["msgs"] > 0
 
     
     from .utils import get_cached_roles
-    roles = await get_cached_roles(guild_id)
+    with stage("roles"):
+        roles = await get_cached_roles(guild_id)
     roles_list = [(r["id"], r["name"]) for r in roles]
 
     
-    sidebar_ctx = await get_sidebar_context(request)
+    with stage("sidebar"):
+        sidebar_ctx = await get_sidebar_context(request)
     ctx = {
         "request": request,
         "user": user,
@@ -2414,6 +2413,8 @@ async def delete_server_data(request: Request, _=Depends(require_admin)):
         f"stats:*:{guild_id}*",
         f"hll:*:{guild_id}*",
         f"events:*:{guild_id}*",
+        f"evb:*:{guild_id}*",
+        f"agg:*:{guild_id}*",
         f"backfill:*:{guild_id}*",
         f"user:*:{guild_id}*",
         f"daily:*:{guild_id}*",
@@ -5,7 +5,7 @@ import secrets
 import string
 from datetime import datetime, timedelta
 from typing import Tuple  
-import redis.asyncio as redis
+from shared.python.redis_client import get_redis
 import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -33,8 +33,6 @@ except ImportError:
     OTP_RATE_LIMIT = 3
 
 
-REDIS_URL = "redis://172.22.0.2:6379/0"
-
 def validate_email(email: str) -> Tuple[bool, str]:
     """Validate email format only (no domain restriction)."""
     
@@ -61,12 +59,12 @@ def generate_otp() -> str:
 async def store_otp(email: str, otp: str) -> bool:
     """Store OTP in Redis with expiry."""
     try:
-        r = redis.from_url(REDIS_URL, decode_responses=True)
+        r = await get_redis()
         
         await r.setex(f"otp:{email}", OTP_EXPIRY_SECONDS, otp)
         
         await r.setex(f"otp_attempts:{email}", OTP_EXPIRY_SECONDS, "0")
-        await r.close()
+        await r.aclose()
         return True
     except Exception as e:
         print(f"Error storing OTP: {e}")
@@ -75,7 +73,7 @@ async def store_otp(email: str, otp: str) -> bool:
 async def verify_otp(email: str, otp: str) -> Tuple[bool, str]:
     """Verify OTP against stored value."""
     try:
-        r = redis.from_url(REDIS_URL, decode_responses=True)
+        r = await get_redis()
         
         
         print(f"[DEBUG] Verifying OTP for email: '{email}'")
@@ -88,7 +86,7 @@ async def verify_otp(email: str, otp: str) -> Tuple[bool, str]:
         
         if not stored_otp:
             print("[DEBUG] OTP key not found or expired.")
-            await r.close()
+            await r.aclose()
             return False, "OTP expired or not found"
         
         
@@ -96,7 +94,7 @@ async def verify_otp(email: str, otp: str) -> Tuple[bool, str]:
         if attempts >= OTP_MAX_ATTEMPTS:
             await r.delete(f"otp:{email}")
             await r.delete(f"otp_attempts:{email}")
-            await r.close()
+            await r.aclose()
             return False, "Too many failed attempts"
         
         
@@ -104,12 +102,12 @@ async def verify_otp(email: str, otp: str) -> Tuple[bool, str]:
             
             await r.delete(f"otp:{email}")
             await r.delete(f"otp_attempts:{email}")
-            await r.close()
+            await r.aclose()
             return True, "Valid"
         else:
             
             await r.incr(f"otp_attempts:{email}")
-            await r.close()
+            await r.aclose()
             return False, f"Invalid OTP ({OTP_MAX_ATTEMPTS - attempts - 1} attempts remaining)"
     
     except Exception as e:
@@ -119,14 +117,14 @@ async def verify_otp(email: str, otp: str) -> Tuple[bool, str]:
 async def check_rate_limit(email: str) -> Tuple[bool, int]:
     """Check if email has exceeded rate limit. Returns (allowed, remaining_seconds)."""
     try:
-        r = redis.from_url(REDIS_URL, decode_responses=True)
+        r = await get_redis()
         
         rate_key = f"otp_rate:{email}"
         count = await r.get(rate_key)
         
         if count and int(count) >= OTP_RATE_LIMIT:
             ttl = await r.ttl(rate_key)
-            await r.close()
+            await r.aclose()
             return False, ttl
         
         
@@ -135,7 +133,7 @@ async def check_rate_limit(email: str) -> Tuple[bool, int]:
         else:
             await r.setex(rate_key, 600, "1")  
         
-        await r.close()
+        await r.aclose()
         return True, 0
     except Exception as e:
         print(f"Error checking rate limit: {e}")
@@ -0,0 +1,196 @@
+"""
+Request-level profiling for the dashboard.
+
+Every request gets a RequestProfile in a contextvar. It collects:
+
+  * named stages (`with stage("member_stats"): ...`)
+  * Redis commands, round-trips and payload bytes, fed by the
+    instrumented clients of shared.python.redis_client
+  * result cache hits and misses, fed by shared.python.cache
+
+The middleware sends them back as a Server-Timing header (visible in the
+browser's network panel) and adds the request to a rolling per-route
+latency histogram, served to admins at /api/admin/latency.
+
+Histograms are per process and cover the last WINDOW_MINUTES minutes.
+"""
+
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from shared.python.cache import cache_stats, observe_cache
+from shared.python.redis_client import observe_redis, redis_stats
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+WINDOW_MINUTES = 15
+
+
+class RequestProfile:
+    __slots__ = ("started", "stages", "redis_cmds", "redis_trips", "redis_ms",
+                 "bytes_out", "bytes_in", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: List[tuple] = []
+        self.redis_cmds = 0
+        self.redis_trips = 0
+        self.redis_ms = 0.0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def server_timing(self, total_ms: float) -> str:
+        parts = [f"total;dur={total_ms:.1f}"]
+        parts += [f"{name};dur={ms:.1f}" for name, ms in self.stages]
+        parts.append(
+            f'redis;dur={self.redis_ms:.1f};desc="{self.redis_cmds} cmds/{self.redis_trips} trips, '
+            f'{self.bytes_out}B out/{self.bytes_in}B in"'
+        )
+        if self.cache_hits or self.cache_misses:
+            parts.append(f'cache;desc="{self.cache_hits} hit/{self.cache_misses} miss"')
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+def _on_redis(site, commands, elapsed_ms, failed, bytes_out, bytes_in):
+    profile = _current.get()
+    if profile is not None:
+        profile.redis_cmds += commands
+        profile.redis_trips += 1
+        profile.redis_ms += elapsed_ms
+        profile.bytes_out += bytes_out
+        profile.bytes_in += bytes_in
+
+
+observe_redis(_on_redis)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a named part of the current request (no-op outside requests)."""
+    profile = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.stages.append((name, (time.perf_counter() - started) * 1000))
+
+
+def count_cache(hit: bool):
+    profile = _current.get()
+    if profile is not None:
+        if hit:
+            profile.cache_hits += 1
+        else:
+            profile.cache_misses += 1
+
+
+observe_cache(lambda name, outcome: count_cache(outcome != "miss"))
+
+
+# ─── Rolling Per-Route Histogram ─────────────────────────────────────
+
+class _Minute:
+    __slots__ = ("minute", "counts", "total_ms", "redis_cmds", "redis_trips", "cache_hits", "cache_misses", "errors")
+
+    def __init__(self, minute: int):
+        self.minute = minute
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.redis_cmds = 0
+        self.redis_trips = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.errors = 0
+
+
+_routes: Dict[str, deque] = defaultdict(lambda: deque(maxlen=WINDOW_MINUTES))
+
+
+def _observe(route: str, total_ms: float, profile: RequestProfile, status: int):
+    minute = int(time.time() // 60)
+    ring = _routes[route]
+    if not ring or ring[-1].minute != minute:
+        ring.append(_Minute(minute))
+    slot = ring[-1]
+    slot.counts[bisect_left(BUCKETS_MS, total_ms)] += 1
+    slot.total_ms += total_ms
+    slot.redis_cmds += profile.redis_cmds
+    slot.redis_trips += profile.redis_trips
+    slot.cache_hits += profile.cache_hits
+    slot.cache_misses += profile.cache_misses
+    slot.errors += status >= 500
+
+
+def _quantile(counts: List[int], q: float) -> Optional[int]:
+    """Upper bucket bound (ms) holding the q-quantile; None above the last bound."""
+    target = q * sum(counts)
+    running = 0
+    for i, count in enumerate(counts):
+        running += count
+        if running >= target and count:
+            return BUCKETS_MS[i] if i < len(BUCKETS_MS) else None
+    return None
+
+
+def latency_report() -> Dict:
+    """Per route over the rolling window, slowest p95 first."""
+    oldest = int(time.time() // 60) - WINDOW_MINUTES
+    routes = {}
+    for route, ring in _routes.items():
+        slots = [s for s in ring if s.minute > oldest]
+        n = sum(sum(s.counts) for s in slots)
+        if not n:
+            continue
+        counts = [sum(s.counts[i] for s in slots) for i in range(len(BUCKETS_MS) + 1)]
+        hits = sum(s.cache_hits for s in slots)
+        lookups = hits + sum(s.cache_misses for s in slots)
+        routes[route] = {
+            "requests": n,
+            "errors": sum(s.errors for s in slots),
+            "avg_ms": round(sum(s.total_ms for s in slots) / n, 1),
+            "p50_ms": _quantile(counts, 0.50),
+            "p95_ms": _quantile(counts, 0.95),
+            "p99_ms": _quantile(counts, 0.99),
+            "avg_redis_cmds": round(sum(s.redis_cmds for s in slots) / n, 1),
+            "avg_redis_trips": round(sum(s.redis_trips for s in slots) / n, 1),
+            "cache_hit_ratio": round(hits / lookups, 3) if lookups else None,
+            "histogram": {f"le_{b}": c for b, c in zip(BUCKETS_MS, counts)} | {"inf": counts[-1]},
+        }
+    ordered = sorted(routes.items(), key=lambda kv: (kv[1]["p95_ms"] is None, kv[1]["p95_ms"] or 0), reverse=True)
+    return {
+        "window_minutes": WINDOW_MINUTES,
+        "routes": dict(ordered),
+        "redis_call_sites": redis_stats(top=20),
+        "cache": cache_stats(top=20),
+    }
+
+
+async def profile_requests(request, call_next):
+    """HTTP middleware: Server-Timing header and per-route histogram."""
+    if request.url.path.startswith("/static"):
+        return await call_next(request)
+    profile = RequestProfile()
+    token = _current.set(profile)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        response.headers["Server-Timing"] = profile.server_timing(total_ms)
+        return response
+    finally:
+        _current.reset(token)
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        route = request.scope.get("route")
+        _observe(getattr(route, "path", None) or "(unmatched)", total_ms, profile, status)
+        print(f"REQUEST: {request.method} {request.url.path} {status} {total_ms:.0f}ms "
+              f"redis={profile.redis_cmds}/{profile.redis_trips}")
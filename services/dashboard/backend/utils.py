@@ -13,43 +13,16 @@ root_dir = "/app" if os.path.exists("/app") else "/root/discord-bot"
 if root_dir not in sys.path:
     sys.path.append(root_dir)
 
-from shared.python.redis_client import get_redis, REDIS_URL
-from functools import wraps
-import hashlib
-
-def redis_cache(ttl=300):
-    def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            from shared.python.redis_client import get_redis_client
-            r = await get_redis_client()
-            key_parts = [func.__name__]
-            for arg in args:
-                if isinstance(arg, (str, int, float, bool, bytes)):
-                    key_parts.append(str(arg))
-            for k, v in sorted(kwargs.items()):
-                if isinstance(v, (str, int, float, bool, bytes)):
-                    key_parts.append(f"{k}:{v}")
-            raw_key = "_".join(key_parts)
-            key_hash = hashlib.md5(raw_key.encode()).hexdigest()
-            cache_key = f"cache:decorator:{func.__name__}:{key_hash}"
-            
-            cached = await r.get(cache_key)
-            if cached:
-                try:
-                    return json.loads(cached)
-                except Exception:
-                    pass
-            
-            result = await func(*args, **kwargs)
-            if result is not None:
-                try:
-                    await r.setex(cache_key, ttl, json.dumps(result))
-                except Exception as e:
-                    print(f"Failed to cache {func.__name__}: {e}")
-            return result
-        return wrapper
-    return decorator
+from shared.python.redis_client import get_redis, get_redis_binary
+from shared.python.cache import bump_cache_version, cached, get_versioned, is_finalized
+from shared.python.event_rollups import (
+    ACTION_METRICS, day_range, load_day_rollups, sum_rollups, rollup_chat_time, utc_today, weighted_seconds,
+)
+from shared.python.pattern_logic import KEYWORD_GROUPS, parse_day_rollup
+from shared.python.guild_meta import get_guild_meta
+from shared.python.leaderboards import (
+    K_LB, K_LB_DAY, K_LB_LEN, K_LB_LEN_COUNT, K_LB_LEN_SUM, shift_day, window_for_range,
+)
 
 try:
     from config.dashboard_secrets import BOT_TOKEN
@@ -67,56 +40,102 @@ async def get_redis_client() -> redis.Redis:
 def K_DAU(gid: int, d: str) -> str: 
     return f"hll:dau:{gid}:{d}"
 
-def K_KW(gid, uid, date, group):  return f"pat:kw:{gid}:{uid}:{date}:{group}"
-def K_MSG(gid, uid, date):        return f"pat:msg:{gid}:{uid}:{date}"
+def K_STICKY(gid: int) -> str:
+    """Finalized DAU/WAU/MAU per past day: field YYYYMMDD -> "dau,wau,mau"."""
+    return f"stats:sticky:{gid}"
+
+STICKY_TTL = 400 * 86400
+
+async def get_stickiness_series(r, guild_id: int, days: List[datetime]) -> Dict[str, List[int]]:
+    """
+    DAU, WAU (7 days) and MAU (30 days) unique users for each day in `days`.
+    Windows that ended before today can never change and are read from
+    K_STICKY; all remaining PFCOUNTs go out in a single pipeline, so the
+    cost is a constant number of round-trips regardless of range length.
+    """
+    today = datetime.now().strftime("%Y%m%d")
+    d_strs = [d.strftime("%Y%m%d") for d in days]
+    cached = await r.hmget(K_STICKY(guild_id), d_strs) if d_strs else []
+    
+    values = {}
+    missing = []
+    for d, d_str, raw in zip(days, d_strs, cached):
+        if raw and d_str < today:
+            values[d_str] = [int(v) for v in raw.split(",")]
+        else:
+            missing.append((d, d_str))
+    
+    if missing:
+        pipe = r.pipeline(transaction=False)
+        for d, d_str in missing:
+            window = [K_DAU(guild_id, (d - timedelta(days=i)).strftime("%Y%m%d")) for i in range(30)]
+            pipe.pfcount(window[0])
+            pipe.pfcount(*window[:7])
+            pipe.pfcount(*window)
+        results = await pipe.execute()
+        
+        finalized = {}
+        for i, (d, d_str) in enumerate(missing):
+            values[d_str] = results[3 * i:3 * i + 3]
+            if d_str < today:
+                finalized[d_str] = ",".join(str(v) for v in values[d_str])
+        if finalized:
+            pipe = r.pipeline(transaction=False)
+            pipe.hset(K_STICKY(guild_id), mapping=finalized)
+            pipe.expire(K_STICKY(guild_id), STICKY_TTL)
+            await pipe.execute()
+    
+    return {
+        "dau": [values[d][0] for d in d_strs],
+        "wau": [values[d][1] for d in d_strs],
+        "mau": [values[d][2] for d in d_strs],
+    }
+
+def K_DAY(gid, uid, date):        return f"pat:day:{gid}:{uid}:{date}"
 def K_ALERT(gid, uid, pat):       return f"pat:alert_sent:{gid}:{uid}:{pat}"
 def K_JOIN(gid, uid):             return f"pat:user_join:{gid}:{uid}"
-def K_HOUR(gid, uid, date):       return f"pat:hour:{gid}:{uid}:{date}"
 
-async def _get_user_msg_stats_simple(r, gid: int, uid: int, days: int) -> Dict:
+async def _load_day_rollups(r, gid: int, uid: int, days: int) -> List[Dict]:
+    """Parsed pat:day rollups for the last N days (index 0 = today), one HGETALL per day in one pipeline."""
     now = datetime.now()
-    total = {"word_count": 0, "msg_count": 0, "char_count": 0, "avg_words_per_msg": 0}
+    pipe = r.pipeline()
     for i in range(days):
-        date_str = (now - timedelta(days=i)).strftime("%Y%m%d")
-        data = await r.hgetall(K_MSG(gid, uid, date_str))
-        if data:
-            total["word_count"] += int(data.get("word_count", 0))
-            total["msg_count"] += int(data.get("msg_count", 0))
-            total["char_count"] += int(data.get("char_count", 0))
+        pipe.hgetall(K_DAY(gid, uid, (now - timedelta(days=i)).strftime("%Y%m%d")))
+    return [parse_day_rollup(h) for h in await pipe.execute()]
+
+def _get_user_msg_stats_simple(rollups: List[Dict], days: int) -> Dict:
+    total = {"word_count": 0, "msg_count": 0, "char_count": 0, "avg_words_per_msg": 0}
+    for day in rollups[:days]:
+        data = day["msg"]
+        total["word_count"] += data.get("word_count", 0)
+        total["msg_count"] += data.get("msg_count", 0)
+        total["char_count"] += data.get("char_count", 0)
     if total["msg_count"] > 0:
         total["avg_words_per_msg"] = round(total["word_count"] / total["msg_count"], 1)
     return total
 
-async def _get_keyword_count_simple(r, gid: int, uid: int, group: str, days: int) -> int:
-    now = datetime.now()
-    total = 0
-    for i in range(days):
-        date_str = (now - timedelta(days=i)).strftime("%Y%m%d")
-        val = await r.get(K_KW(gid, uid, date_str, group))
-        if val:
-            total += int(val)
-    return total
+def _get_keyword_count_simple(rollups: List[Dict], group: str, days: int) -> int:
+    return sum(day["kw"].get(group, 0) for day in rollups[:days])
 
-async def _days_since_last_activity_simple(r, gid: int, uid: int, max_lookback: int = 365) -> int:
-    now = datetime.now()
-    for i in range(max_lookback):
-        date_str = (now - timedelta(days=i)).strftime("%Y%m%d")
-        data = await r.hgetall(K_MSG(gid, uid, date_str))
-        if data and int(data.get("msg_count", 0)) > 0:
+def _days_since_last_activity_simple(rollups: List[Dict], max_lookback: int = 365) -> int:
+    for i, day in enumerate(rollups[:max_lookback]):
+        if day["msg"].get("msg_count", 0) > 0:
             return i
     return max_lookback
 
-async def _analyze_user_affinity_simple(r, gid: int, uid: int, stats_7d: Dict, stats_30d: Dict, days_inactive: int) -> List[Dict]:
+def _analyze_user_affinity_simple(rollups: List[Dict], stats_7d: Dict, stats_30d: Dict, days_inactive: int) -> List[Dict]:
     now = datetime.now()
     affinities = []
     
+    def msg_count(i: int) -> int:
+        return rollups[i]["msg"].get("msg_count", 0) if i < len(rollups) else 0
+
     # 1. Weekend drop
     if stats_30d["msg_count"] >= 10:
         weekend_msgs, weekday_msgs = 0, 0
         for i in range(28):
             d = now - timedelta(days=i)
-            data = await r.hgetall(K_MSG(gid, uid, d.strftime("%Y%m%d")))
-            c = int(data.get("msg_count", 0)) if data else 0
+            c = msg_count(i)
             if d.weekday() >= 5: weekend_msgs += c
             else: weekday_msgs += c
         if weekday_msgs > 0:
@@ -127,12 +146,10 @@ async def _analyze_user_affinity_simple(r, gid: int, uid: int, stats_7d: Dict, s
     
     # 2. Night owl
     total_hourly, night_msgs = 0, 0
-    for i in range(7):
-        d = (now - timedelta(days=i)).strftime("%Y%m%d")
-        hour_data = await r.hgetall(K_HOUR(gid, uid, d))
-        for h, c in hour_data.items():
-            total_hourly += int(c)
-            if 1 <= int(h) <= 4: night_msgs += int(c)
+    for day in rollups[:7]:
+        for h, c in day["hours"].items():
+            total_hourly += c
+            if 1 <= h <= 4: night_msgs += c
     if total_hourly > 0:
         ratio = night_msgs / total_hourly
         score = max(0, min(100, int((ratio / 0.6) * 100)))
@@ -158,27 +175,20 @@ async def _analyze_user_affinity_simple(r, gid: int, uid: int, stats_7d: Dict, s
     if stats_30d["msg_count"] >= 5:
         consecutive = 0
         for w in range(8):
-            found = False
-            for d in range(w*7, (w+1)*7):
-                dt = (now - timedelta(days=d)).strftime("%Y%m%d")
-                msg_data = await r.hgetall(K_MSG(gid, uid, dt))
-                if msg_data and int(msg_data.get("msg_count", 0)) > 0:
-                    found = True
-                    break
-            if found: consecutive += 1
+            if any(msg_count(d) > 0 for d in range(w*7, (w+1)*7)): consecutive += 1
             else: break
         score = int((consecutive / 8.0) * 100)
         if score > 20:
             affinities.append({"name": "Pravidelný přispěvatel", "score": score, "emoji": "⭐", "hint": "Oceňte vytrvalost komunitním odznakem."})
 
     # 6. Relapse Fatigue
-    kw_rel = await _get_keyword_count_simple(r, gid, uid, "relapse_fatigue", 14)
+    kw_rel = _get_keyword_count_simple(rollups, "relapse_fatigue", 14)
     if kw_rel > 0:
         score = max(0, min(100, int((kw_rel / 4.0) * 100)))
         affinities.append({"name": "Relapsová únava", "score": score, "emoji": "🔁", "hint": "Přesuňte fokus z počítání dnů na small wins."})
     
     # 7. Silent Struggle
-    kw_desp = await _get_keyword_count_simple(r, gid, uid, "despair", 14)
+    kw_desp = _get_keyword_count_simple(rollups, "despair", 14)
     if kw_desp > 0:
         score = max(0, min(100, int(((kw_desp * 20) + (days_inactive * 10)))))
         affinities.append({"name": "Tiché vyhoření", "score": score, "emoji": "🕯️", "hint": "Okamžitý osobní DM, nevyčítejte ticho."})
@@ -306,17 +316,13 @@ async def load_member_stats(guild_id: int, start_date: str = None, end_date: str
     finally:
         pass
 
+@cached(ttl=300, cache_if=lambda stats: bool(stats["dau_labels"]), families=("messages",))
 async def get_activity_stats(guild_id: int, start_date: str = None, end_date: str = None, days: int = 30) -> Dict[str, Any]:
     """
     Základní aktivita: DAU, MAU, Avg DAU - podpora pro časové období.
     """
     r = await get_redis()
-    cache_key = f"stats:activity:{guild_id}:{start_date}:{end_date}:{days}"
     try:
-        cached = await r.get(cache_key)
-        if cached:
-            return json.loads(cached)
-            
         if start_date and end_date:
             start_dt = datetime.strptime(start_date, "%Y-%m-%d")
             end_dt = datetime.strptime(end_date, "%Y-%m-%d")
@@ -358,7 +364,6 @@ async def get_activity_stats(guild_id: int, start_date: str = None, end_date: st
             "avg_dau": round(avg_dau, 1),
             "raw_data": {}
         }
-        await r.setex(cache_key, 300, json.dumps(stats))
         return stats
     except Exception as e:
         print(f"Error parsing activity stats: {e}")
@@ -369,6 +374,7 @@ async def get_activity_stats(guild_id: int, start_date: str = None, end_date: st
     
     
 
+@cached(ttl=300, cache_if=bool, families=("messages", "voice", "actions"))
 async def get_deep_stats_redis(guild_id: int, start_date: str = None, end_date: str = None, role_id: str = "all") -> Dict[str, Any]:
     """
     Get deep statistics for the dashboard, including activity leaderboard and engagement metrics.
@@ -376,16 +382,7 @@ async def get_deep_stats_redis(guild_id: int, start_date: str = None, end_date:
     """
     r = await get_redis()
     
-    
-    cache_key = f"stats:deep:{guild_id}:{start_date}:{end_date}:{role_id}:v5_weighted"
-    
     try:
-        
-        cached = await r.get(cache_key)
-        if cached:
-             return json.loads(cached)
-             
-        
         now = datetime.now()
         if start_date:
             start_dt = datetime.strptime(start_date, "%Y-%m-%d")
@@ -397,113 +394,24 @@ async def get_deep_stats_redis(guild_id: int, start_date: str = None, end_date:
         else:
             end_dt = now
             
-        ts_start = start_dt.timestamp()
-        ts_end = end_dt.timestamp()
-        
-        
         weights = await get_action_weights(r)
         
         
         staff_stats = defaultdict(lambda: {"actions": 0, "voice_time": 0, "weighted": 0.0})
         action_counts = Counter()
         
+        # Sum per-day rollups (past days are finalized once, today comes from its live bucket)
+        rb = await get_redis_binary()
+        days = day_range(start_dt, end_dt)
+        day_rollups = await load_day_rollups(r, rb, guild_id, days)
+        totals = sum_rollups(day_rollups)
         
-        async for key in r.scan_iter(f"events:action:{guild_id}:*"):
-            uid = key.split(":")[-1]
-            
-            
-            events = await r.zrangebyscore(key, ts_start, ts_end)
-            
-            for event_json in events:
-                try:
-                    data = json.loads(event_json)
-                    action_type = data.get("type", "unknown")
-                    
-                    
-                    
-                    metric_map = {
-                        "ban": "bans", "kick": "kicks", "timeout": "timeouts",
-                        "unban": "unbans", "role_update": "role_updates",
-                        "msg_delete": "msg_deleted",
-                        "verification": "verifications"
-                    }
-                    w_key = metric_map.get(action_type, action_type + "s") 
-                    
-                    weight = weights.get(w_key, 0)
-                    
-                    
-                    staff_stats[uid]["actions"] += 1
-                    staff_stats[uid]["weighted"] += float(weight)
-                    
-                    action_counts[action_type] += 1
-                    
-                except (json.JSONDecodeError, KeyError):
-                    continue
-
-        
-        async for key in r.scan_iter(f"events:voice:{guild_id}:*"):
-            uid = key.split(":")[-1]
-            
-            headers = await r.zrangebyscore(key, ts_start, ts_end)
-            for h_json in headers:
-                try:
-                    data = json.loads(h_json)
-                    duration = data.get("duration", 0)
-                    
-                    w = duration * weights.get("voice_time", 1)
-                    staff_stats[uid]["weighted"] += float(w)
-                    staff_stats[uid]["voice_time"] += duration
-                except: continue
+        for uid, row in totals.items():
+            staff_stats[uid]["actions"] += sum(row["a"].values())
+            staff_stats[uid]["voice_time"] += row["v"]
+            staff_stats[uid]["weighted"] += weighted_seconds(row, weights)
+            action_counts.update(row["a"])
 
-        
-        
-        async for key in r.scan_iter(f"events:msg:{guild_id}:*"):
-            uid = key.split(":")[-1]
-            
-            
-            messages = await r.zrangebyscore(key, ts_start, ts_end, withscores=True)
-            
-            last_msg_ts = 0
-            raw_chat_time = 0
-            SESSION_GAP = 300 
-            
-            w_session = weights.get("session_base", 180)
-            w_char = weights.get("char_weight", 1)
-            w_msg = weights.get("msg_weight", 0)
-            w_reply = weights.get("reply_weight", 60)
-            w_chat_multiplier = weights.get("chat_time", 1)
-            
-            msg_count = 0
-            
-            for msg_json, score in messages:
-                try:
-                    msg_data = json.loads(msg_json)
-                    msg_ts = float(score)
-                    
-                    
-                    if last_msg_ts == 0 or (msg_ts - last_msg_ts) > SESSION_GAP:
-                        raw_chat_time += w_session
-                    
-                    last_msg_ts = msg_ts
-                    
-                    
-                    content_add = (msg_data.get("len", 0) * w_char) + w_msg
-                    if msg_data.get("reply"): content_add += w_reply
-                    
-                    raw_chat_time += content_add
-                        
-                    msg_count += 1
-                except: continue
-            
-            if raw_chat_time > 0:
-                weighted_chat = raw_chat_time * w_chat_multiplier
-                staff_stats[uid]["weighted"] += float(weighted_chat)
-                
-                
-                
-                
-
-        
         final_leaderboard = []
         total_time_seconds = 0
         
@@ -580,48 +488,18 @@ async def get_deep_stats_redis(guild_id: int, start_date: str = None, end_date:
         date_list = [d.strftime("%Y-%m-%d") for d in date_list_dt]
 
         # --- Stickiness (DAU/MAU, DAU/WAU) ---
-        wau_data = []
-        mau_data = []
-        dau_wau_ratio = []
-        dau_mau_ratio = []
-        
-        for d in date_list_dt:
-            d_str = d.strftime("%Y%m%d")
-            
-            # WAU (last 7 days)
-            wau_keys = [K_DAU(guild_id, (d - timedelta(days=i)).strftime("%Y%m%d")) for i in range(7)]
-            wau_val = await r.pfcount(*wau_keys)
-            wau_data.append(wau_val)
-            
-            # MAU (last 30 days)
-            mau_keys = [K_DAU(guild_id, (d - timedelta(days=i)).strftime("%Y%m%d")) for i in range(30)]
-            mau_val = await r.pfcount(*mau_keys)
-            mau_data.append(mau_val)
-            
-            # DAU for this day
-            dau_val = await r.pfcount(K_DAU(guild_id, d_str))
-            
-            dau_wau_ratio.append(round((dau_val / max(1, wau_val)) * 100, 1))
-            dau_mau_ratio.append(round((dau_val / max(1, mau_val)) * 100, 1))
+        sticky = await get_stickiness_series(r, guild_id, date_list_dt)
+        wau_data = sticky["wau"]
+        mau_data = sticky["mau"]
+        dau_wau_ratio = [round((dau / max(1, wau)) * 100, 1) for dau, wau in zip(sticky["dau"], wau_data)]
+        dau_mau_ratio = [round((dau / max(1, mau)) * 100, 1) for dau, mau in zip(sticky["dau"], mau_data)]
 
         # --- Weekly Activity (Radar Chart) ---
         # 0=Monday, 6=Sunday
         weekly_counts = [0] * 7
-        total_msgs_count = 0
-        total_len = 0
-        replies_count = 0
-
-        # We can use the message events we already scanned or just scan again for specific period
-        async for key in r.scan_iter(f"events:msg:{guild_id}:*"):
-            messages = await r.zrangebyscore(key, ts_start, ts_end)
-            for msg_json in messages:
-                try:
-                    msg_data = json.loads(msg_json)
-                    total_msgs_count += 1
-                    total_len += msg_data.get("len", 0)
-                    if msg_data.get("reply"):
-                        replies_count += 1
-                except: continue
+        total_msgs_count = sum(row["m"] for row in totals.values())
+        total_len = sum(row["l"] for row in totals.values())
+        replies_count = sum(row["r"] for row in totals.values())
 
         # Weekly dist from heatmap data if available, or just use hourly keys
         # Let's reuse heatmap logic from get_redis_dashboard_stats if possible
@@ -640,13 +518,16 @@ async def get_deep_stats_redis(guild_id: int, start_date: str = None, end_date:
         avg_msg_len = round(total_len / max(1, total_msgs_count), 1)
         reply_ratio = round((replies_count / max(1, total_msgs_count)) * 100, 1)
         
+        # Real per-day weighted hours of the leaderboard users (a session carried over
+        # from the previous day only counts on the day it started)
+        included = {entry["user_id"] for entry in final_leaderboard}
         daily_weighted_series = []
-        if total_hours_period > 0:
-             import random
-             avg = total_hours_period / len(date_list)
-             daily_weighted_series = [round(avg * random.uniform(0.8, 1.2), 2) for _ in date_list]
-        else:
-             daily_weighted_series = [0] * len(date_list)
+        for i, day in enumerate(day_rollups):
+            day_seconds = sum(
+                weighted_seconds(dict(row, s=row.get("s", 0) - (row.get("c", 0) if i > 0 else 0)), weights)
+                for uid, row in day.items() if uid in included
+            )
+            daily_weighted_series.append(round(day_seconds / 3600, 2))
 
         cz_days_short = ["Po", "Út", "St", "Čt", "Pá", "So", "Ne"]
 
@@ -671,7 +552,6 @@ async def get_deep_stats_redis(guild_id: int, start_date: str = None, end_date:
             "leaderboard": final_leaderboard
         }
         
-        await r.setex(cache_key, 300, json.dumps(stats)) 
         return stats
         
     except Exception as e:
@@ -684,24 +564,14 @@ async def get_deep_stats_redis(guild_id: int, start_date: str = None, end_date:
     
 
 
+@cached(ttl=300, families=("messages",))
 async def get_redis_dashboard_stats(guild_id: int, start_date: str = None, end_date: str = None, role_id: str = None) -> Dict[str, Any]:
     """
     Fetch dashboard statistics directly from Redis (Real-time).
     """
     r = await get_redis()
-    cache_key = f"stats:cache:dashboard:{guild_id}:{start_date}:{end_date}:{role_id}:v4"
     
     try:
-        
-        cached = await r.get(cache_key)
-        if cached:
-            return json.loads(cached)
-
-        
-        
-        
-        
-        
         if start_date and end_date:
             start_dt = datetime.strptime(start_date, "%Y-%m-%d")
             end_dt = datetime.strptime(end_date, "%Y-%m-%d")
@@ -818,14 +688,13 @@ async def get_redis_dashboard_stats(guild_id: int, start_date: str = None, end_d
             "is_estimated": False 
         }
         
-        await r.setex(cache_key, 300, json.dumps(stats))
         return stats
         
     finally:
         pass
     
 
-@redis_cache(ttl=300)
+@cached(ttl=300, families=("messages",))
 async def get_summary_card_data(discord_dau=0, discord_mau=0, discord_wau=0, discord_users=0, guild_id: int = 615171377783242769):
     """
     Get summary card data using ONLY real data from Redis (Primary) and database (Fallback).
@@ -945,6 +814,26 @@ async def get_bot_guilds() -> List[str]:
         pass
     
 
+@cached(ttl=60)
+async def get_public_landing_stats() -> Dict[str, int]:
+    """
+    Aggregate numbers for the anonymous landing/about pages, from the guild
+    metadata index (no per-guild KEYS). Cached for 60 seconds.
+    """
+    r = await get_redis()
+    bot_guilds = [g for g in await r.smembers("bot:guilds") if str(g).isdigit()]
+    meta = await get_guild_meta(r, bot_guilds)
+    presence = await r.mget([f"presence:total:{gid}" for gid in bot_guilds]) if bot_guilds else []
+    
+    stats = {
+        "servers": len(bot_guilds),
+        "messages": sum(m["total_msgs"] for m in meta.values()),
+        "users": sum(int(p or 0) for p in presence),
+        "days": max((m["days"] for m in meta.values()), default=0),
+    }
+    return stats
+
+
 async def get_cached_roles(guild_id: int) -> List[Dict[str, str]]:
     """Retrieve roles from Redis cache or fallback to Discord API."""
     r = await get_redis()
@@ -974,10 +863,10 @@ async def get_cached_roles(guild_id: int) -> List[Dict[str, str]]:
         pass
     
 
-@redis_cache(ttl=300)
+@cached(ttl=300, families=("messages",))
 async def get_trend_analysis(guild_id: int) -> Dict[str, Any]:
     """Calculate growth trends and predictions."""
-    r = redis.from_url(REDIS_URL, decode_responses=True)
+    r = await get_redis()
     try:
         
         now = datetime.now()
@@ -1021,9 +910,9 @@ async def get_trend_analysis(guild_id: int) -> Dict[str, Any]:
         print(f"Trend error: {e}")
         return {"growth_7d": 0, "growth_30d": 0, "avg_dau": 0, "prediction": 0}
     finally:
-        pass
+        await r.aclose()
 
-@redis_cache(ttl=300)
+@cached(ttl=300, families=("messages", "voice", "actions"))
 async def get_engagement_score(guild_id: int, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
     """Calculate engagement score based on messages, voice, and retention."""
     r = await get_redis_client()
@@ -1061,18 +950,9 @@ async def get_engagement_score(guild_id: int, start_date: str = None, end_date:
         msg_score = min(100, (msg_participation_rate / 0.25) * 100)
         
         
-        ts_start = start_dt.timestamp()
-        ts_end = end_dt.replace(hour=23, minute=59, second=59).timestamp()
-        
-        total_voice_seconds = 0
-        
-        async for key in r.scan_iter(f"events:voice:{guild_id}:*"):
-            events = await r.zrangebyscore(key, ts_start, ts_end)
-            for evt_json in events:
-                try:
-                    data = json.loads(evt_json)
-                    total_voice_seconds += data.get("duration", 0)
-                except: pass
+        rb = await get_redis_binary()
+        day_rollups = await load_day_rollups(r, rb, guild_id, day_range(start_dt, end_dt))
+        total_voice_seconds = sum(row.get("v", 0) for day in day_rollups for row in day.values())
         
         
         hours_per_dau = (total_voice_seconds / days_diff / 3600) / max(1, avg_dau)
@@ -1344,7 +1224,7 @@ def generate_security_insights(metrics: Dict[str, Any]):
     return [i["text"] for i in insights]
 
 
-@redis_cache(ttl=300)
+@cached(ttl=300, families=("messages", "actions"))
 async def get_security_score(guild_id: int, days: int = 7) -> Dict[str, Any]:
     """
     Calculate security score based on multiple factors:
@@ -1405,7 +1285,6 @@ async def get_security_score(guild_id: int, days: int = 7) -> Dict[str, Any]:
         
         
         now = datetime.now()
-        start_ts = (now - timedelta(days=days)).timestamp()
         
         
         dau_sum = 0
@@ -1422,34 +1301,18 @@ async def get_security_score(guild_id: int, days: int = 7) -> Dict[str, Any]:
         
         
         
-        total_msgs = 0
-        total_replies = 0
-        async for key in r.scan_iter(f"events:msg:{guild_id}:*"):
-            
-            
-            events = await r.zrangebyscore(key, start_ts, "+inf")
-            for evt_json in events:
-                try:
-                    data = json.loads(evt_json)
-                    total_msgs += 1
-                    if data.get("reply"): total_replies += 1
-                except: pass
+        # Same `days` calendar days as the DAU average above, summed from daily rollups
+        rb = await get_redis_binary()
+        day_rollups = await load_day_rollups(r, rb, guild_id, day_range(now - timedelta(days=days - 1), now))
+        totals = sum_rollups(day_rollups)
+        total_msgs = sum(row["m"] for row in totals.values())
+        total_replies = sum(row["r"] for row in totals.values())
         
         measured_reply_ratio = (total_replies / max(1, total_msgs)) * 100
         reply_score = min(30, (measured_reply_ratio / 20) * 30) 
         
         
-        total_voice_seconds = 0
-        async for key in r.scan_iter(f"events:voice:{guild_id}:*"):
-            events = await r.zrangebyscore(key, start_ts, "+inf")
-            for evt_json in events:
-                try:
-                    data = json.loads(evt_json)
-                    total_voice_seconds += data.get("duration", 0)
-                except: pass
-                
-        
-        
+        total_voice_seconds = sum(row["v"] for row in totals.values())
         
         hours_per_dau = (total_voice_seconds / days / 3600) / max(1, avg_dau)
         
@@ -1624,7 +1487,7 @@ async def get_security_score(guild_id: int, days: int = 7) -> Dict[str, Any]:
 
 
 
-@redis_cache(ttl=300)
+@cached(ttl=300, families=("messages", "voice"))
 async def get_insights(guild_id: int) -> List[Dict[str, str]]:
     """Generate smart insights based on stats."""
     insights = []
@@ -1680,7 +1543,7 @@ async def get_insights(guild_id: int) -> List[Dict[str, str]]:
          
     return insights
 
-@redis_cache(ttl=300)
+@cached(ttl=300, families=("messages",))
 async def get_time_comparisons(guild_id: int, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
     """Calculate WoW and MoM DAU changes relative to end_date."""
     
@@ -1728,7 +1591,7 @@ async def get_time_comparisons(guild_id: int, start_date: str = None, end_date:
         }
     }
 
-@redis_cache(ttl=300)
+@cached(ttl=300, families=("voice",))
 async def get_voice_leaderboard(guild_id: int, limit: int = 10, start_date: str = None, end_date: str = None, role_id: str = "all") -> List[Dict[str, Any]]:
     """Fetch top users by voice duration - currently all-time fallback."""
     
@@ -1740,7 +1603,7 @@ async def get_voice_leaderboard(guild_id: int, limit: int = 10, start_date: str
         print(f"Voice stats error: {e}")
         return []
 
-@redis_cache(ttl=300)
+@cached(ttl=300)
 async def get_command_stats(guild_id: int, limit: int = 10, start_date: str = None, end_date: str = None, role_id: str = "all") -> List[Dict[str, Any]]:
     """Fetch top used commands."""
     r = await get_redis()
@@ -1752,59 +1615,68 @@ async def get_command_stats(guild_id: int, limit: int = 10, start_date: str = No
         print(f"Command stats error: {e}")
         return []
 
-@redis_cache(ttl=300)
+@cached(ttl=300)
 async def get_traffic_stats(guild_id: int, days: int = 30, start_date: str = None, end_date: str = None, role_id: str = "all") -> Dict[str, Any]:
     """Fetch Joins vs Leaves for traffic chart."""
     return await load_member_stats(guild_id, start_date=start_date, end_date=end_date) 
 
-@redis_cache(ttl=300)
+@cached(ttl=300, families=("messages",))
 async def get_leaderboard_data(guild_id: int, limit: int = 15, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
-    """Fetch user leaderboard with optional date filtering."""
+    """
+    Fetch user leaderboard with optional date filtering. All time and the
+    rolling 7/30/90-day ranges are read from the boards the worker maintains
+    (shared/python/leaderboards.py); other ranges are summed from the rollups.
+    """
     r = await get_redis()
     try:
+        window = None
         if start_date and end_date:
             start_dt = datetime.strptime(start_date, "%Y-%m-%d")
             end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-            
-            
-            if (end_dt - start_dt).days > 365:
-                top_users = await r.zrevrange(f"leaderboard:messages:{guild_id}", 0, limit - 1, withscores=True)
-            else:
-                
-                daily_keys = []
-                curr = start_dt
-                while curr <= end_dt:
-                    daily_keys.append(f"stats:user_daily:{guild_id}:{curr.strftime('%Y%m%d')}")
-                    curr += timedelta(days=1)
-                
-                
-                existing_keys = []
-                for k in daily_keys:
-                    if await r.exists(k): existing_keys.append(k)
-                
-                if not existing_keys:
-                    
-                    top_users = await r.zrevrange(f"leaderboard:messages:{guild_id}", 0, limit - 1, withscores=True)
-                else:
-                    temp_key = f"tmp:leaderboard:{guild_id}:{start_date}:{end_date}"
-                    await r.zunionstore(temp_key, existing_keys)
-                    await r.expire(temp_key, 60)
-                    top_users = await r.zrevrange(temp_key, 0, limit - 1, withscores=True)
+            if (end_dt - start_dt).days <= 365:
+                window = window_for_range(start_date, end_date)
+                top_users = None
+                if window:
+                    pipe = r.pipeline()
+                    pipe.get(K_LB_DAY(guild_id))
+                    pipe.zrevrange(K_LB(guild_id, window), 0, limit - 1, withscores=True)
+                    through, top_users = await pipe.execute()
+                    if through != shift_day(utc_today(), -1):
+                        top_users = None  # Not advanced past midnight yet
+                if top_users is None:
+                    rows = await _range_leaderboard(r, guild_id, limit, start_dt, end_dt)
+                    if rows is not None:
+                        return {"leaderboard": rows}
+                    window = None
+
+        if window is None:
+            top_users = await r.zrevrange(K_LB(guild_id), 0, limit - 1, withscores=True)
+        uids = [u for u, _ in top_users]
+
+        # Profiles and length sums of the whole page in one round-trip
+        pipe = r.pipeline()
+        for uid in uids:
+            pipe.hgetall(f"user:info:{uid}")
+        if uids and window:
+            pipe.hmget(K_LB_LEN(guild_id, window), uids)
+        elif uids:
+            pipe.hmget(K_LB_LEN_SUM(guild_id), uids)
+            pipe.hmget(K_LB_LEN_COUNT(guild_id), uids)
+        results = await pipe.execute()
+        infos = results[:len(uids)]
+        if window:
+            len_sums = results[len(uids)] if uids else []
+            len_counts = [score for _, score in top_users]
         else:
-            top_users = await r.zrevrange(f"leaderboard:messages:{guild_id}", 0, limit - 1, withscores=True)
+            len_sums, len_counts = (results[len(uids)], results[len(uids) + 1]) if uids else ([], [])
 
         leaderboard = []
-        for user_id_str, msg_count in top_users:
-            uid = int(float(user_id_str))
-            user_info = await r.hgetall(f"user:info:{uid}") or {}
-            name = user_info.get("name", f"User {uid}")
-            
-            lengths = await r.lrange(f"leaderboard:msg_lengths:{guild_id}:{uid}", 0, -1)
-            avg_len = sum(int(l) for l in lengths) / len(lengths) if lengths else 0
-            
+        for uid, (_, msg_count), user_info, len_sum, len_count in zip(uids, top_users, infos, len_sums, len_counts):
+            user_info = user_info or {}
+            avg_len = int(len_sum) / float(len_count) if len_sum and len_count else 0
             leaderboard.append({
-                "user_id": uid, "name": name,
-                "avatar": user_info.get("avatar"), 
+                "user_id": int(uid), "name": user_info.get("name", f"User {uid}"),
+                "avatar": user_info.get("avatar"),
                 "total_messages": int(msg_count),
                 "avg_message_length": round(avg_len, 1)
             })
@@ -1813,7 +1685,27 @@ async def get_leaderboard_data(guild_id: int, limit: int = 15, start_date: str =
         print(f"Leaderboard data error: {e}")
         return {"leaderboard": [], "error": str(e)}
 
-@redis_cache(ttl=300)
+
+async def _range_leaderboard(r, guild_id: int, limit: int, start_dt: datetime, end_dt: datetime):
+    """Leaderboard of an arbitrary range from the daily rollups; None if the range has no activity."""
+    rb = await get_redis_binary()
+    totals = sum_rollups(await load_day_rollups(r, rb, guild_id, day_range(start_dt, end_dt)))
+    top = sorted(((uid, row) for uid, row in totals.items() if row["m"]), key=lambda item: -item[1]["m"])[:limit]
+    if not top:
+        return None
+
+    pipe = r.pipeline()
+    for uid, _ in top:
+        pipe.hgetall(f"user:info:{uid}")
+    infos = await pipe.execute()
+    return [{
+        "user_id": int(uid), "name": (info or {}).get("name", f"User {uid}"),
+        "avatar": (info or {}).get("avatar"),
+        "total_messages": row["m"],
+        "avg_message_length": round(row["l"] / row["m"], 1),
+    } for (uid, row), info in zip(top, infos)]
+
+@cached(ttl=300, families=("messages",))
 async def get_channel_distribution(guild_id: int, start_date: str = None, end_date: str = None, days: int = 30) -> List[Dict[str, Any]]:
     """Fetch message distribution by channel, optionally filtered by date/days."""
     r = await get_redis()
@@ -1877,7 +1769,7 @@ async def get_channel_distribution(guild_id: int, start_date: str = None, end_da
         print(f"Channel dist error: {e}")
         return []
 
-@redis_cache(ttl=300)
+@cached(ttl=300, families=())
 async def get_dashboard_team(guild_id: int) -> List[Dict[str, Any]]:
     """
     Get all users with explicit dashboard access for a guild.
@@ -1958,7 +1850,8 @@ async def add_dashboard_user(guild_id: int, user_id: str, user_data: Dict[str, s
         
         if user_data:
              await r.hset(f"user:info:{user_id}", mapping=user_data)
-             
+        
+        await bump_cache_version(r, guild_id, "config")
         return True
     except Exception as e:
         print(f"Error adding dashboard user: {e}")
@@ -1974,6 +1867,7 @@ async def remove_dashboard_user(guild_id: int, user_id: str):
     try:
         await r.srem(f"dashboard:team:{guild_id}", user_id)
         await r.delete(f"dashboard:perms:{guild_id}:{user_id}")
+        await bump_cache_version(r, guild_id, "config")
         return True
     except Exception as e:
         print(f"Error removing dashboard user: {e}")
@@ -2006,99 +1900,42 @@ async def get_action_weights(r: redis.Redis) -> dict:
 
 async def get_daily_stats(r: redis.Redis, gid: int, uid: int, day: datetime.date) -> dict:
     """
-    Get daily stats for a user on a specific day.
-    Uses cached value if version matches, otherwise recalculates from raw events.
+    Get daily stats for a user on a specific day, from the day's activity rollup.
+    A finished day is cached until the weights change, today until new activity.
     """
-    from datetime import datetime as dt
-    import json
-    from collections import defaultdict
-    
     day_str = day.strftime("%Y-%m-%d")
-    cache_key = f"stats:day:{day_str}:{gid}:{uid}"
-    
-    
-    cached_version = await r.hget(cache_key, "_version")
-    current_version = await r.get("config:weights_version") or "0"
-    
-    if cached_version == current_version:
-        
-        stats = await r.hgetall(cache_key)
-        
-        return {k: float(v) if k != "_version" else v for k, v in stats.items()}
-    
-    
+    return await get_versioned("get_daily_stats", f"get_daily_stats:{gid}:{uid}:{day_str}",
+                               lambda: _compute_daily_stats(r, gid, uid, day), gid,
+                               ("messages", "voice", "actions"), finalized=is_finalized(day_str))
+
+
+async def _compute_daily_stats(r: redis.Redis, gid: int, uid: int, day: datetime.date) -> dict:
     weights = await get_action_weights(r)
     
     
-    from datetime import time as dt_time
-    day_start = dt.combine(day, dt_time(0, 0, 0)).timestamp()
-    day_end = dt.combine(day, dt_time(23, 59, 59)).timestamp()
-    
     stats = defaultdict(float)
     
-    
-    msg_key = f"events:msg:{gid}:{uid}"
-    messages = await r.zrangebyscore(msg_key, day_start, day_end, withscores=True)
-    
-    last_msg_ts = 0
-    raw_chat_time = 0
-    SESSION_GAP = 300 
-    
-    for msg_json, score in messages:
-        msg_data = json.loads(msg_json)
-        msg_ts = float(score)
-        
-        
-        if last_msg_ts == 0 or (msg_ts - last_msg_ts) > SESSION_GAP:
-            raw_chat_time += weights.get("session_base", 180)
-        
-        last_msg_ts = msg_ts
-        
-        
-        raw_chat_time += msg_data.get("len", 0) * weights.get("char_weight", 1)
-        raw_chat_time += weights.get("msg_weight", 0)
-        if msg_data.get("reply"):
-            raw_chat_time += weights.get("reply_weight", 60)
+    # Guild day rollup, narrowed to this user
+    rb = await get_redis_binary()
+    day_rollup = (await load_day_rollups(r, rb, gid, [day.strftime("%Y%m%d")]))[0]
+    row = day_rollup.get(str(uid), {})
             
-    stats["messages"] += len(messages)
-    stats["chat_time"] = raw_chat_time * weights.get("chat_time", 1)
-    
-    
-    voice_key = f"events:voice:{gid}:{uid}"
-    voice_sessions = await r.zrangebyscore(voice_key, day_start, day_end)
-    
-    for vs_json in voice_sessions:
-        vs_data = json.loads(vs_json)
-        stats["voice_time"] += vs_data["duration"] * weights.get("voice_time", 1)
+    stats["messages"] += row.get("m", 0)
+    stats["chat_time"] = rollup_chat_time(row, weights) * weights.get("chat_time", 1)
     
+    if row.get("v"):
+        stats["voice_time"] += float(row["v"]) * weights.get("voice_time", 1)
     
-    action_key = f"events:action:{gid}:{uid}"
-    actions = await r.zrangebyscore(action_key, day_start, day_end)
-    
-    for action_json in actions:
-        action_data = json.loads(action_json)
-        action_type = action_data["type"]
-        
-        
-        metric_map = {
-            "ban": "bans", "kick": "kicks", "timeout": "timeouts",
-            "unban": "unbans", "role_update": "role_updates",
-            "msg_delete": "msg_deleted"
-        }
-        
-        metric = metric_map.get(action_type, action_type + "s")
-        stats[metric] += 1
-    
-    
-    cache_data = dict(stats)
-    cache_data["_version"] = current_version
-    await r.hset(cache_key, mapping={k: str(v) for k, v in cache_data.items()})
+    for action_type, count in row.get("a", {}).items():
+        metric = ACTION_METRICS.get(action_type, action_type + "s")
+        stats[metric] += count
     
     return dict(stats)
 
 
 # --- Pattern Detection Helpers ---
 
+@cached(ttl=300, families=("patterns",))
 async def get_user_pattern_insights(guild_ids: List[int], user_id: int, days: int = 30) -> Dict[str, Any]:
     """
     Summarize pattern-related signals (keywords, word counts) for a user across multiple sources.
@@ -2108,47 +1945,41 @@ async def get_user_pattern_insights(guild_ids: List[int], user_id: int, days: in
         guild_ids = [guild_ids]
         
     r = await get_redis()
-    now = datetime.now()
     gid = guild_ids[0] # Primary guild for detailed logic
     
-    # 1. Base Stats (Existing logic)
+    # 1. Base Stats: one pipelined HGETALL per day and guild
     keyword_hits = defaultdict(int)
     total_msgs = 0
     total_words = 0
-    
-    from shared.pattern_logic import KEYWORD_GROUPS
-    groups = list(KEYWORD_GROUPS.keys())
+    primary_rollups = []
     
     for g in guild_ids:
-        for i in range(days):
-            date_str = (now - timedelta(days=i)).strftime("%Y%m%d")
-            pipe = r.pipeline()
-            for group in groups:
-                pipe.get(f"pat:kw:{g}:{user_id}:{date_str}:{group}")
-            counts = await pipe.execute()
-            for idx, count in enumerate(counts):
-                if count:
-                    keyword_hits[groups[idx]] += int(count)
-            msg_stats = await r.hgetall(f"pat:msg:{g}:{user_id}:{date_str}")
-            if msg_stats:
-                total_msgs += int(msg_stats.get("msg_count", 0))
-                total_words += int(msg_stats.get("word_count", 0))
+        lookback = max(days, 180) if g == gid else days
+        rollups = await _load_day_rollups(r, g, user_id, lookback)
+        if g == gid:
+            primary_rollups = rollups
+        for day in rollups[:days]:
+            for group, count in day["kw"].items():
+                if group in KEYWORD_GROUPS:
+                    keyword_hits[group] += count
+            total_msgs += day["msg"].get("msg_count", 0)
+            total_words += day["msg"].get("word_count", 0)
 
     # 2. Enhanced Diagnostic Logic (Ported from patterns.py)
-    stats_7d = await _get_user_msg_stats_simple(r, gid, user_id, 7)
-    stats_30d = await _get_user_msg_stats_simple(r, gid, user_id, 30)
+    stats_7d = _get_user_msg_stats_simple(primary_rollups, 7)
+    stats_30d = _get_user_msg_stats_simple(primary_rollups, 30)
     
     intensities = {
-        "🔴 Relapsy": await _get_keyword_count_simple(r, gid, user_id, "relapse_word", 7),
-        "🔁 Únava": await _get_keyword_count_simple(r, gid, user_id, "relapse_fatigue", 7),
-        "🆘 Beznaděj": await _get_keyword_count_simple(r, gid, user_id, "despair", 7),
-        "🧱 Stagnace": await _get_keyword_count_simple(r, gid, user_id, "wall_keywords", 7),
-        "🌸 Euforie": await _get_keyword_count_simple(r, gid, user_id, "euphoria", 7),
-        "🤝 Pomoc": await _get_keyword_count_simple(r, gid, user_id, "help_others", 7),
+        "🔴 Relapsy": _get_keyword_count_simple(primary_rollups, "relapse_word", 7),
+        "🔁 Únava": _get_keyword_count_simple(primary_rollups, "relapse_fatigue", 7),
+        "🆘 Beznaděj": _get_keyword_count_simple(primary_rollups, "despair", 7),
+        "🧱 Stagnace": _get_keyword_count_simple(primary_rollups, "wall_keywords", 7),
+        "🌸 Euforie": _get_keyword_count_simple(primary_rollups, "euphoria", 7),
+        "🤝 Pomoc": _get_keyword_count_simple(primary_rollups, "help_others", 7),
     }
     
-    days_inactive = await _days_since_last_activity_simple(r, gid, user_id, 180)
-    affinities = await _analyze_user_affinity_simple(r, gid, user_id, stats_7d, stats_30d, days_inactive)
+    days_inactive = _days_since_last_activity_simple(primary_rollups, 180)
+    affinities = _analyze_user_affinity_simple(primary_rollups, stats_7d, stats_30d, days_inactive)
     
     advice = "Uživatel se zdá být v normě. Doporučujeme standardní podporu a udržování kontaktu."
     if affinities:
@@ -2198,76 +2029,73 @@ async def get_user_pattern_insights(guild_ids: List[int], user_id: int, days: in
         "days_inactive": days_inactive
     }
 
-async def get_recent_pattern_alerts(guild_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+@cached(ttl=300, stale=21600, families=("patterns",))
+async def _scan_pattern_alerts(guild_id: int, label: str) -> List[Dict[str, Any]]:
     """
-    Get the most recent pattern alerts across all sources (Discord and Discourse).
-    Uses caching to improve dashboard load times.
+    Sent pattern alerts of one guild (pat:alert_sent:*), cached in that
+    guild's namespace. Fresh for 5 minutes; for up to 6 hours after that the
+    previous list is served while the keys are scanned again in the background.
     """
     r = await get_redis()
-    
-    cache_key = f"cache:pattern_alerts:{guild_id}:{limit}"
-    
-    try:
-        cached = await r.get(cache_key)
-        if cached:
-             return json.loads(cached)
-    except Exception as e:
-        print(f"Error reading pattern alerts cache: {e}")
-    
     alerts = []
+    cursor = "0"
+    match_pat = f"pat:alert_sent:{guild_id}:*:*"
+
+    while True:
+        cursor, keys = await r.scan(cursor=cursor, match=match_pat, count=500)
+        for k in keys:
+            parts = k.split(":")
+            if len(parts) >= 5:
+                uid = parts[3]
+                pat_name = parts[4]
+                ts_val = await r.get(k)
+
+                if ts_val:
+                    try:
+                        ts_int = int(float(ts_val))
+                        if ts_int < 1000000:
+                            ts_int = int(time.time()) - 3600
+                    except (ValueError, TypeError):
+                        ts_int = int(time.time())
+
+                    alerts.append({
+                        "user_id": uid,
+                        "pattern": pat_name,
+                        "timestamp": ts_int,
+                        "source": label
+                    })
+
+        if cursor == "0" or cursor == 0:
+            break
+    return alerts
+
+
+async def get_recent_pattern_alerts(guild_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Get the most recent pattern alerts across all sources (Discord and Discourse).
+    Each source is cached under its own guild (999 for Discourse), so an alert
+    in either one refreshes its part.
+    """
     # Sources to scan: Main Guild (Discord) and 999 (Discourse)
-    sources = [
-        {"gid": guild_id, "label": "Discord"},
-        {"gid": 999, "label": "Discourse"}
-    ]
-    
-    for src in sources:
-        cursor = "0"
-        match_pat = f"pat:alert_sent:{src['gid']}:*:*"
-        
-        while True:
-            cursor, keys = await r.scan(cursor=cursor, match=match_pat, count=500)
-            for k in keys:
-                parts = k.split(":")
-                if len(parts) >= 5:
-                    uid = parts[3]
-                    pat_name = parts[4]
-                    ts_val = await r.get(k)
-                    
-                    if ts_val:
-                        try:
-                            ts_int = int(float(ts_val))
-                            if ts_int < 1000000:
-                                ts_int = int(time.time()) - 3600
-                        except (ValueError, TypeError):
-                            ts_int = int(time.time())
-
-                        alerts.append({
-                            "user_id": uid,
-                            "pattern": pat_name,
-                            "timestamp": ts_int,
-                            "source": src['label']
-                        })
-            
-            if cursor == "0" or cursor == 0:
-                break
-            
+    alerts = await _scan_pattern_alerts(guild_id, "Discord") + await _scan_pattern_alerts(999, "Discourse")
+
     # Sort by timestamp
     alerts.sort(key=lambda x: x["timestamp"], reverse=True)
-    
+    alerts = alerts[:limit]
+
     # Enrich with user info
+    r = await get_redis()
+    pipe = r.pipeline(transaction=False)
+    for a in alerts:
+        pipe.hgetall(f"user:info:{a['user_id']}")
+    infos = await pipe.execute() if alerts else []
+
     enriched = []
-    for a in alerts[:limit]:
-        u_info = await r.hgetall(f"user:info:{a['user_id']}") or {}
+    for a, u_info in zip(alerts, infos):
+        u_info = u_info or {}
         a["username"] = u_info.get("name") or u_info.get("username") or f"Uživatel {a['user_id']}"
         a["avatar"] = u_info.get("avatar")
         a["date_human"] = datetime.fromtimestamp(a["timestamp"]).strftime("%d.%m. %H:%M")
         enriched.append(a)
-        
-    try:
-        # Cache for 6 hours
-        await r.setex(cache_key, 21600, json.dumps(enriched))
-    except Exception as e:
-         print(f"Error caching pattern alerts: {e}")
-         
+
     return enriched
@@ -1,17 +1,52 @@
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 import redis.asyncio as redis
+import json
 from shared.python.config import config
-from shared.python.redis_client import get_redis_client
-from datetime import datetime
+from shared.python.redis_client import get_redis_client, get_redis_binary
+from shared.python.cache import bump_cache_version
+from shared.python.keys import K_EVENTS_VOICE
+from shared.python.event_codec import K_EVB, bucket_day, encode_voice
+from shared.python.event_rollups import finalize_days
+from shared.python.leaderboards import advance_leaderboards
+from datetime import datetime, timedelta, timezone
 import time
 
+# Past days the compactor makes sure are finalized (covers a missed midnight run)
+COMPACT_LOOKBACK_DAYS = 3
+
 class AnalyticsTrackingCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.voice_join_times = {}
+        self.compact_rollups.start()
+
+    def cog_unload(self):
+        self.compact_rollups.cancel()
+
+    @tasks.loop(hours=1)
+    async def compact_rollups(self):
+        """Finalize the per-day activity rollups (agg:events:*) of the last few past days and fold them into the leaderboards."""
+        r = await get_redis_client()
+        rb = await get_redis_binary()
+        today = datetime.now(timezone.utc).date()
+        days = [(today - timedelta(days=i)).strftime("%Y%m%d") for i in range(COMPACT_LOOKBACK_DAYS, 0, -1)]
+        try:
+            for guild in self.bot.guilds:
+                try:
+                    await finalize_days(r, rb, guild.id, days)
+                    await advance_leaderboards(r, rb, guild.id)
+                except Exception as e:
+                    print(f"Error compacting rollups for guild {guild.id}: {e}")
+        finally:
+            await r.aclose()
+            await rb.aclose()
+
+    @compact_rollups.before_loop
+    async def before_compact_rollups(self):
+        await self.bot.wait_until_ready()
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
@@ -38,12 +73,19 @@ class AnalyticsTrackingCog(commands.Cog):
             duration = int(now - start_time)
             if duration > 0:
                 r = await get_redis_client()
+                rb = await get_redis_binary()
                 try:
                     await r.zincrby(f"stats:voice_duration:{guild_id}", duration, str(user_id))
+                    # Session event (recorded at its end) for the dashboard rollups
+                    member = json.dumps({"duration": duration, "start": int(start_time)})
+                    await r.zadd(K_EVENTS_VOICE(guild_id, user_id), {member: now})
+                    await rb.append(K_EVB("voice", guild_id, bucket_day(now)), encode_voice(user_id, now, duration))
+                    await bump_cache_version(r, guild_id, "voice")
                 except Exception as e:
                     print(f"Error recording voice time: {e}")
                 finally:
                     await r.aclose()
+                    await rb.aclose()
 
     @commands.Cog.listener()
     async def on_app_command_completion(self, interaction: discord.Interaction, command: app_commands.Command):
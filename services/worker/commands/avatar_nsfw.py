@@ -1,15 +1,11 @@
 import discord
 from discord.ext import commands
-import onnxruntime as ort
-import numpy as np
-from PIL import Image
 import aiohttp
-import io
-import hashlib
 import asyncio
 import os
 from shared.python.config import config
 from shared.python.redis_client import get_redis_client
+from shared.python.nsfw_scan import NSFWScorer, NSFWScoreCache, load_session, model_version, preprocess, scan_images
 
 class WarnUserModal(discord.ui.Modal, title="⚠️ Upozornit uživatele"):
     def __init__(self, user: discord.User):
@@ -89,24 +85,16 @@ class AvatarNSFW(commands.Cog):
         print(f"[NSFW] Načítám model z: {model_path}")
         
         try:
-            # Optimize CPU usage by limiting threads
-            opts = ort.SessionOptions()
-            opts.intra_op_num_threads = 1
-            opts.inter_op_num_threads = 1
-            
-            self.session = ort.InferenceSession(
-                model_path,
-                sess_options=opts,
-                providers=["CPUExecutionProvider"]
-            )
+            self.session = load_session(model_path)
             self.input_name = self.session.get_inputs()[0].name
-            print(f"[NSFW] Model úspěšně načten. Vstup: {self.input_name} (Threads: 1)")
+            print(f"[NSFW] Model úspěšně načten. Vstup: {self.input_name} (Threads: {self.session.get_session_options().intra_op_num_threads})")
         except Exception as e:
             print(f"[NSFW] CHYBA při načítání modelu: {e}")
             self.session = None
+        self.scorer = NSFWScorer(self.session)
 
-        self.cache = {}
-        self.cache_limit = 500
+        # Persistent score cache keyed by avatar hash + model version (survives restarts)
+        self.score_cache = NSFWScoreCache(get_redis_client, model_version(model_path)) if self.session else None
         self.http = None
         self.scan_task = None
 
@@ -120,6 +108,7 @@ class AvatarNSFW(commands.Cog):
             await self.http.close()
         if self.scan_task:
             self.scan_task.cancel()
+        self.scorer.close()
 
     def format_nsfw_score(self, score: float) -> str:
         """Returns a human-readable representation of the NSFW score."""
@@ -147,21 +136,9 @@ class AvatarNSFW(commands.Cog):
             return 0.0, "Žádný avatar"
 
         try:
-            url = user.display_avatar.replace(size=256).url
-            img_bytes = await self.download_image(url)
-            if not img_bytes:
-                return 0.0, "Nelze stáhnout"
-
-            img_hash = hashlib.md5(img_bytes).hexdigest()
-
-            if img_hash in self.cache:
-                scores = self.cache[img_hash]
-            else:
-                arr = self.preprocess(img_bytes)
-                if arr is None:
-                    return 0.0, "Chyba při zpracování"
-                scores = self.predict(arr)
-                self.update_cache(img_hash, scores)
+            url, avatar_key, scores, error = await self.score_avatar(user)
+            if scores is None:
+                return 0.0, error
 
             score = scores[1]
             return score, self.format_nsfw_score(score)
@@ -178,25 +155,19 @@ class AvatarNSFW(commands.Cog):
         
         print(f"[NSFW] Začínám úvodní sken všech členů...")
         
-        count = 0
-        total_scanned = 0
+        members = []
         for guild in self.bot.guilds:
             print(f"[NSFW] Skenuji guildu {guild.name} ({guild.id}), očekávaný počet členů: {guild.member_count}")
             try:
                 # Fetch all members to ensure we have the full list in large guilds
                 async for member in guild.fetch_members(limit=None):
-                    total_scanned += 1
-                    if total_scanned % 10 == 0:
-                        print(f"[NSFW] Progress: Prohledáno {total_scanned} členů, zkontrolováno {count} avatarů...")
-                    
                     if member.display_avatar:
-                        await self.check_avatar(member)
-                        count += 1
-                        await asyncio.sleep(0.3)
+                        members.append(member)
             except Exception as e:
                 print(f"[NSFW] Chyba při stahování členů pro {guild.name}: {e}")
         
-        print(f"[NSFW] Úvodní sken dokončen. Celkem prohledáno {total_scanned} členů, zkontrolováno {count} avatarů.")
+        stats = await self.scan_members(members)
+        print(f"[NSFW] Úvodní sken dokončen: {stats.summary()}")
 
     async def download_image(self, url):
         if not self.http:
@@ -210,45 +181,60 @@ class AvatarNSFW(commands.Cog):
             print(f"[NSFW] Chyba při stahování obrázku {url}: {e}")
             return None
 
-    def preprocess(self, img_bytes):
-        try:
-            img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-            img = img.resize((224, 224))
-
-            # Model expects BGR [0, 255] with mean subtraction (Caffe-style)
-            arr = np.asarray(img, dtype=np.float32)
-            
-            # RGB -> BGR
-            arr = arr[:, :, ::-1]
-            
-            # Mean subtraction (Caffe-style: B=104, G=117, R=123)
-            mean = np.array([104, 117, 123], dtype=np.float32)
-            arr = (arr - mean).astype(np.float32)
-            
-            arr = np.expand_dims(arr, axis=0)
-            return arr
-        except Exception as e:
-            print(f"[NSFW] Chyba při preprocessingu: {e}")
-            return None
-
-    def predict(self, arr):
-        if not self.session:
-            return [0.0, 0.0]
-        try:
-            # Force float32 cast right before inference
-            arr = np.asarray(arr, dtype=np.float32)
-            out = self.session.run(None, {self.input_name: arr})
-            # Return full array [sfw, nsfw]
-            return [float(x) for x in out[0][0]]
-        except Exception as e:
-            print(f"[NSFW] Chyba při predikci: {e}")
-            return [0.0, 0.0]
-
-    def update_cache(self, key, value):
-        if len(self.cache) >= self.cache_limit:
-            # Odstraníme nejstarší
-            self.cache.pop(next(iter(self.cache)))
-        self.cache[key] = value
+    async def score_avatar(self, user) -> tuple:
+        """
+        (url, avatar_key, [sfw, nsfw], error) for a user's avatar. Cached avatars skip
+        download and inference; otherwise decoding and inference run off the event loop.
+        """
+        avatar = user.display_avatar
+        url = avatar.replace(size=256).url
+        if self.score_cache:
+            scores = await self.score_cache.get(avatar.key)
+            if scores is not None:
+                return url, avatar.key, scores, None
+
+        img_bytes = await self.download_image(url)
+        if not img_bytes:
+            return url, avatar.key, None, "Nelze stáhnout"
+        loop = asyncio.get_running_loop()
+        arr = await loop.run_in_executor(None, preprocess, img_bytes)
+        scores = (await self.scorer.predict([arr]))[0] if arr is not None else None
+        if scores is None:
+            return url, avatar.key, None, "Chyba při zpracování"
+
+        if self.score_cache:
+            await self.score_cache.put(avatar.key, scores)
+        return url, avatar.key, scores, None
+
+    async def scan_members(self, members, progress_channel=None):
+        """Batched scan of many members: concurrent downloads, pooled preprocessing, micro-batched inference."""
+        async def cache_get(member):
+            return await self.score_cache.get(member.display_avatar.key)
+
+        async def cache_put(member, scores):
+            await self.score_cache.put(member.display_avatar.key, scores)
+
+        async def on_result(result):
+            if result.scores is not None:
+                await self.report_avatar(result.item, result.url, result.item.display_avatar.key, result.scores)
+
+        async def on_progress(stats):
+            print(f"[NSFW] Progress: {stats.summary()}")
+            if progress_channel and stats.done < stats.total:
+                await progress_channel.send(f"⏳ {stats.summary()}")
+
+        items = [(m, m.display_avatar.replace(size=256).url) for m in members]
+        stats = await scan_images(
+            items, self.download_image, self.scorer,
+            on_result=on_result,
+            cache_get=cache_get if self.score_cache else None,
+            cache_put=cache_put if self.score_cache else None,
+            on_progress=on_progress, progress_every=500,
+        )
+        if self.score_cache:
+            totals = await self.score_cache.flush_stats()
+            print(f"[NSFW] Cache skóre (model {self.score_cache.version}): celkem {totals.get('hits', 0)} zásahů, {totals.get('misses', 0)} minutí")
+        return stats
 
     async def check_avatar(self, user, trigger="manual"):
         """
@@ -259,22 +245,18 @@ class AvatarNSFW(commands.Cog):
             return
 
         try:
-            url = user.display_avatar.replace(size=256).url
-            img_bytes = await self.download_image(url)
-            if not img_bytes:
+            url, avatar_key, scores, error = await self.score_avatar(user)
+            if scores is None:
                 return
+        except Exception as e:
+            print(f"[NSFW] Chyba při kontrole avataru {user}: {e}")
+            return
 
-            img_hash = hashlib.md5(img_bytes).hexdigest()
-
-            if img_hash in self.cache:
-                scores = self.cache[img_hash]
-            else:
-                arr = self.preprocess(img_bytes)
-                if arr is None:
-                    return
-                scores = self.predict(arr)
-                self.update_cache(img_hash, scores)
+        await self.report_avatar(user, url, avatar_key, scores, trigger)
 
+    async def report_avatar(self, user, url, avatar_key, scores, trigger="manual"):
+        """Alerts/logs for an already scored avatar (see check_avatar for triggers)."""
+        try:
             # Debug log to console
             print(f"[NSFW] {trigger.upper()} check: User {user} ({user.id}) | Scores: {scores}")
 
@@ -285,12 +267,12 @@ class AvatarNSFW(commands.Cog):
 
             # IDEMPOTENCY CHECK: Prevent duplicate alerts for the same avatar change
             r = await get_redis_client()
-            lock_key = f"nsfw:scanned:{user.id}:{img_hash}"
+            lock_key = f"nsfw:scanned:{user.id}:{avatar_key}"
             is_duplicate = not await r.set(lock_key, "1", ex=3600, nx=True)
             await r.aclose()
             
             if is_duplicate:
-                print(f"[NSFW] Skipping duplicate alert for {user} (hash {img_hash})")
+                print(f"[NSFW] Skipping duplicate alert for {user} (avatar {avatar_key})")
                 return
 
             # JOIN TRIGGER: Update mod log in "čekárna" and log to "logu čekárny"
@@ -442,23 +424,15 @@ class AvatarNSFW(commands.Cog):
                  await channel.send(f"❌ Uživatel {user.display_name} nemá profilovku.")
 
     async def run_full_scan(self, channel, limit: int = None):
-        count = 0
-        for guild in self.bot.guilds:
-            for member in guild.members:
-                if limit and count >= limit:
-                    break
-                
-                if member.avatar or member.display_avatar:
-                    await self.check_avatar(member)
-                    count += 1
-                    await asyncio.sleep(0.3)
-            
-            if limit and count >= limit:
-                break
+        members = [m for guild in self.bot.guilds for m in guild.members if m.avatar or m.display_avatar]
+        if limit:
+            members = members[:limit]
+        
+        stats = await self.scan_members(members, progress_channel=channel)
+        print(f"[NSFW] Ruční sken dokončen: {stats.summary()}")
         
         if channel:
-            await channel.send(f"✅ Sken dokončen. Zkontrolováno {count} avatarů.")
-            await asyncio.sleep(0.5) # Extra breath after full scan
+            await channel.send(f"✅ Sken dokončen. Zkontrolováno {stats.done} avatarů ({stats.rate:.1f}/s, z cache {stats.cached}).")
 
 async def setup(bot):
     await bot.add_cog(AvatarNSFW(bot))
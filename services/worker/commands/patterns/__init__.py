@@ -1,4 +1,5 @@
 import time
+import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
 from typing import List, Dict, Set
@@ -10,7 +11,7 @@ from discord.ext import commands
 from shared.python.config import config
 from shared.python.redis_client import get_redis_client
 
-from .common import K_LAST_SCAN, K_FIRST, is_staff
+from .common import K_LAST_SCAN, K_FIRST, K_AI_CACHE_STATS, is_staff
 from .signals import PatternSignals
 from .detectors import PatternDetectors
 from .scanner import PatternScanner
@@ -50,6 +51,9 @@ class PatternDetectorCog(commands.Cog):
 
     def cog_unload(self):
         self.scanner.cog_unload()
+        self.alerts.cog_unload()
+        self.signals.cog_unload()
+        asyncio.create_task(self.sentiment.llm.close())
 
     # Slash Command Group
     pattern_group = app_commands.Group(name="patterns", description="Detekce vzorců chování")
@@ -113,6 +117,23 @@ class PatternDetectorCog(commands.Cog):
             embed = discord.Embed(title="⚙️ Pattern Engine", color=0x2ECC71)
             embed.add_field(name="📊 Stav", value="✅ Běží", inline=True)
             embed.add_field(name="🕐 Poslední scan", value=last_val, inline=True)
+
+            llm = self.sentiment.llm.metrics()
+            pre = self.sentiment.prefilter_stats
+            total_msgs = sum(pre.values())
+            cache = await r.hgetall(K_AI_CACHE_STATS())
+            embed.add_field(
+                name="🤖 Lokální AI",
+                value=(
+                    f"Fronta: `{llm['queue_depth']}/{llm['queue_max']}` (sentiment `{llm['sentiment_queued']}`)\n"
+                    f"Návrhy p95: `{llm['draft_wait_p95_ms'] + llm['draft_run_p95_ms']:.0f} ms`\n"
+                    f"Sentiment zahozeno: `{llm['sentiment_expired'] + llm['sentiment_rejected'] + llm['sentiment_evicted']}`\n"
+                    f"Sentiment bez LLM: `{total_msgs - pre['llm']}/{total_msgs}`\n"
+                    f"Cache odpovědí: `{cache.get('hits', 0)}` zásahů, `{cache.get('misses', 0)}` generování, "
+                    f"`{cache.get('coalesced', 0)}` sloučeno"
+                ),
+                inline=False,
+            )
             await itx.followup.send(embed=embed, ephemeral=True)
         finally:
             await r.aclose()
@@ -5,9 +5,15 @@ import json
 import base64
 import re
 import asyncio
-from typing import List, Optional, Dict
+import hashlib
+from typing import Awaitable, Callable, List, Optional, Dict
 from datetime import datetime
 
+from shared.python.llm_scheduler import Priority, get_llm_scheduler
+from shared.python.pattern_logic import CLINICAL_KEYWORDS
+from shared.python.redis_client import get_redis_client
+from .common import K_AI_CACHE, K_AI_CACHE_STATS
+
 logger = logging.getLogger("PatternDetector")
 
 # Expanded Czech/Slovak non-informative words
@@ -15,17 +21,69 @@ STOP_WORDS = {
     "vlastně", "nicméně", "současně", "potom", "takže", "prostě", "jakože", "abych", "pokud", "protože", "jenže", "aspoň", "právě", "celkem", "docela", "trochu", "hodně", "příliš", "možná", "určitě", "stále", "ještě", "však", "nebo", "také", "tady", "tam", "zase", "opět", "víceméně", "vlastne", "nicmene", "soucasne", "lebo", "prečo", "proč", "kvůli", "kvôli", "kvoli", "právě", "prave", "hneď", "hned", "vtedy", "tehdy", "tento", "tamto", "lepšie", "lepší", "zatiaľ", "zatím", "úplně", "úplne", "posledné", "poslední", "velmi", "veľmi", "taky", "také", "jako", "jenom", "iba", "teraz", "terazky", "vždy", "nikdy", "často", "skoro", "téměř", "také", "opět", "znovu", "předtím", "potom", "zatímco", "mezitím", "najednou", "náhle", "stále", "opravdu", "skutečně", "skutočne", "vlastne", "naopak", "podobně", "podobne", "chtěl", "budu", "mám", "jsem", "jsme", "bolo", "bylo", "jsou", "budou", "chci", "chtějí", "přišel", "dělat", "robit", "musím", "můžu", "môžem", "vím", "viem", "vidím", "vypadá", "stalo", "začal", "začala", "končí", "může", "môže", "mají", "majú", "mali", "bol", "byl", "bude", "uživatel", "příspěvek", "vlákno", "fórum", "děkuji", "díky", "dobrý", "den", "ahoj", "zdravím", "taky", "super", "paráda", "ahojte", "všichni", "všetci", "něco", "niečo", "všechno", "všetko", "verím", "verim", "píšem", "pisem", "týždeň", "tyzden", "týždne", "tyzdne", "kalendári", "kalendari", "včera", "vcera", "dneska", "zítra", "zitra", "zastavme", "myslím", "myslim", "možná", "mozna", "skôr", "skor", "potom", "prípad", "pripad", "ideme", "idem", "ideš", "ide", "budeme", "budem", "budeš", "budú", "robenie", "robil", "robila", "začal", "začala", "skončil", "skončila", "povedal", "povedala", "povedali", "povedat", "rozhodol", "rozhodla", "rozhodli", "mali", "mali", "mal", "mala", "mali", "tuto", "toto", "tenhle", "tento", "tadyto", "tamto", "všude", "všade", "nějak", "nejak", "niekto", "někdo", "vlastní", "vlastni", "jinak", "inak", "stejně", "rovnako", "konečně", "konečne", "vůbec", "vôbec", "trochu", "trochu", "snad", "hádam", "aspoň", "aspoň", "celkom", "celkem", "docela", "celkom", "možno", "možná", "snad", "vlastně", "opravdu", "skutečně", "skutočne", "vlastne", "naopak", "podobně", "podobne", "však", "ale", "alebo", "bych", "abych", "když", "keď", "však", "nech", "aj", "ešte", "este", "fakt", "môžeš", "mužeš", "muzes", "mozes", "keby", "když", "ked", "kdy", "kde", "ako", "akože", "akoze", "ani", "neviem", "nevím", "uvidím", "uvidíme", "vidieme", "uvidime", "viete", "vím", "viem", "viete", "vieš", "víš", "dnes", "včera", "zajtra", "zítra", "teraz", "teď", "potom", "pak", "skôr", "skor", "práve", "právě", "stále", "stále", "už", "ešte", "este", "vždy", "nikdy", "často", "občas", "niekdy", "někdy", "nejak", "nějak", "niečo", "něco", "všetko", "všechno", "každý", "všetci", "všichni", "veľa", "hodně", "málo", "trochu", "skoro", "takmer", "téměř", "možno", "asi", "snáď", "snad", "určite", "určitě", "naozaj", "opravdu", "skutočne", "skutečně", "vlastne", "vlastně", "fakt", "naopak", "pritom", "přitom", "napriek", "přes", "medzi", "mezi", "proti", "kvôli", "kvůli"
 }
 
-# Clinically significant keywords to BOOST in analysis
-CLINICAL_KEYWORDS = {
-    "relaps", "recidiva", "selhání", "selhani", "sexting", "grindr", "tinder", "badoo", "seznamka", "porno", "pornoherečka", "poker", "hazard", "sázení", "sazeni", 
-    "alkohol", "drogy", "pervitin", "tráva", "marihuana", "koks", "kokain", "chuť", "chut", "bažení", "bazeni", "pokušení", "pokuseni", "pokušenie", "krize", "kriza", 
-    "deprese", "úzkost", "uzkost", "strach", "samota", "nuda", "únava", "unava", "hněv", "hnev", "vzteky", "vztek", "stydím", "stud", "vina", "zklamání", "zklamani",
-    "deník", "denik", "plán", "plan", "metodika", "survival", "terapie", "terapeut", "pomoc", "abstinence", "střízlivost", "strizlivost", "čistý", "cisty", "vztah", "partner", "manžel", "manželka"
-}
+
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(24 * 3600)))
+SUMMARY_MODEL = "smollm2:135m"
+DRAFT_MODEL = "llama3.2:1b"
 
 class AIService:
-    # Global semaphore for local AI calls (shared across all instances)
-    _local_llm_semaphore = asyncio.Semaphore(1)
+    # Generations in flight, by cache digest; identical concurrent requests share one
+    _inflight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    async def _cached(provider: str, model: str, prompt: str, call: Callable[[], Awaitable[str]]) -> str:
+        """
+        Answer from the response cache (keyed by provider, model and prompt) or run `call`
+        once for all concurrent identical requests. Failures raise and are not cached.
+        """
+        digest = hashlib.sha256(f"{provider}\0{model}\0{prompt}".encode()).hexdigest()[:32]
+        task = AIService._inflight.get(digest)
+        if task:
+            r = await get_redis_client()
+            try:
+                await AIService._count(r, "coalesced")
+            finally:
+                await r.aclose()
+        else:
+            # Own task, so a caller giving up (e.g. an expired interaction) does not cancel the others
+            task = AIService._inflight[digest] = asyncio.create_task(AIService._lookup_or_generate(digest, call))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    async def _lookup_or_generate(digest: str, call: Callable[[], Awaitable[str]]) -> str:
+        r = None
+        try:
+            r = await get_redis_client()
+            try:
+                cached = await r.get(K_AI_CACHE(digest))
+            except Exception as e:
+                # The cache only saves work; without Redis the model still answers
+                logger.warning(f"AI cache read failed, generating without it: {e}")
+                return await call()
+            if cached is not None:
+                await AIService._count(r, "hits")
+                return cached
+
+            await AIService._count(r, "misses")
+            result = await call()
+            if result:
+                try:
+                    await r.set(K_AI_CACHE(digest), result, ex=AI_CACHE_TTL)
+                except Exception as e:
+                    logger.warning(f"AI cache write failed: {e}")
+            return result
+        finally:
+            AIService._inflight.pop(digest, None)
+            if r is not None:
+                await r.aclose()
+
+    @staticmethod
+    async def _count(r, counter: str):
+        """Bump a cache statistic on the caller's client; a failure only loses the count."""
+        try:
+            await r.hincrby(K_AI_CACHE_STATS(), counter, 1)
+        except Exception as e:
+            logger.warning(f"AI cache stats update failed: {e}")
 
     @staticmethod
     async def summarize_posts(posts: List[str], ctx: Optional[Dict] = None) -> Optional[str]:
@@ -63,7 +121,9 @@ class AIService:
             "Zaměř se na emoční stav, témata a rizika. Piš přímo v češtině.\n\n"
             f"Příspěvky:\n{context_text}"
         )
-        try:
+        model = "claude-3-haiku-20240307"
+
+        async def request():
             async with httpx.AsyncClient(timeout=30.0) as client:
                 response = await client.post(
                     "https://api.anthropic.com/v1/messages",
@@ -73,13 +133,16 @@ class AIService:
                         "content-type": "application/json",
                     },
                     json={
-                        "model": "claude-3-haiku-20240307",
+                        "model": model,
                         "max_tokens": 300,
                         "messages": [{"role": "user", "content": prompt}]
                     }
                 )
                 response.raise_for_status()
                 return response.json()["content"][0]["text"].strip()
+
+        try:
+            return await AIService._cached("anthropic", model, prompt, request)
         except Exception as e:
             logger.error(f"Anthropic AI failed: {e}")
             return "Chyba při komunikaci s Anthropic."
@@ -92,52 +155,55 @@ class AIService:
             "Piš přímo v češtině, stručně k jádru věci.\n\n"
             f"Příspěvky:\n{context_text}"
         )
-        try:
+        model = "gpt-4o-mini"
+
+        async def request():
             async with httpx.AsyncClient(timeout=30.0) as client:
                 response = await client.post(
                     "https://api.openai.com/v1/chat/completions",
                     headers={"Authorization": f"Bearer {api_key}"},
                     json={
-                        "model": "gpt-4o-mini",
+                        "model": model,
                         "messages": [{"role": "user", "content": prompt}],
                         "max_tokens": 200
                     }
                 )
                 response.raise_for_status()
                 return response.json()["choices"][0]["message"]["content"].strip()
+
+        try:
+            return await AIService._cached("openai", model, prompt, request)
         except Exception as e:
             logger.error(f"OpenAI failed: {e}")
             return "Chyba při komunikaci s OpenAI."
 
     @staticmethod
     async def _summarize_ollama(posts: List[str]) -> Optional[str]:
-        ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
         # Use smaller model for simple summaries to save resources
-        ollama_model = "smollm2:135m" 
         context_text = "\n---\n".join(posts)[:4000]
         prompt = (
             "Instrukce: Shrň stručně (max 350 znaků) v češtině tyto příspěvky uživatele fóra NePornu.\n\n"
             f"Příspěvky:\n{context_text}"
         )
         try:
-            async with AIService._local_llm_semaphore:
-                async with httpx.AsyncClient(timeout=120.0) as client:
-                    response = await client.post(
-                        f"{ollama_host}/api/generate",
-                        json={"model": ollama_model, "prompt": prompt, "stream": False}
-                    )
-                    response.raise_for_status()
-                    return response.json()["response"].strip()
+            return await AIService._cached(
+                "ollama", SUMMARY_MODEL, prompt,
+                lambda: get_llm_scheduler().generate(SUMMARY_MODEL, prompt, Priority.SUMMARY),
+            )
         except Exception as e:
             logger.error(f"Ollama summary failed: {e}")
             return "Chyba při komunikaci s lokálním AI modelem."
 
     @staticmethod
-    async def generate_mentor_draft(text_sample: str, patterns: List[str]) -> Optional[str]:
-        """Generates a suggested mentor message draft using local LLM."""
-        ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+    async def generate_mentor_draft(text_sample: str, patterns: List[str],
+                                    priority: Priority = Priority.DRAFT) -> Optional[str]:
+        """
+        Generates a suggested mentor message draft using local LLM.
+        Moderator button presses run at DRAFT priority; background precomputation passes SUMMARY.
+        """
+        llm = get_llm_scheduler()
         # Use llama3.2:1b for extreme speed and efficiency on CPU
-        ollama_model = "llama3.2:1b"
+        llm.keep_warm(DRAFT_MODEL)
         
         pats_str = ", ".join(patterns)
         prompt = (
@@ -150,22 +216,13 @@ class AIService:
         )
         
         try:
-            async with AIService._local_llm_semaphore:
-                async with httpx.AsyncClient(timeout=120.0) as client:
-                    response = await client.post(
-                        f"{ollama_host}/api/generate",
-                        json={
-                            "model": ollama_model, 
-                            "prompt": prompt, 
-                            "stream": False,
-                            "options": {
-                                "temperature": 0.7,
-                                "num_predict": 150  # Limit tokens for speed
-                            }
-                        }
-                    )
-                    response.raise_for_status()
-                    return response.json()["response"].strip()
+            return await AIService._cached("ollama", DRAFT_MODEL, prompt, lambda: llm.generate(
+                DRAFT_MODEL, prompt, priority,
+                options={
+                    "temperature": 0.7,
+                    "num_predict": 150  # Limit tokens for speed
+                },
+            ))
         except Exception as e:
             logger.error(f"Ollama draft generation failed: {e}")
             return None
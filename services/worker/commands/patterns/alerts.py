@@ -7,9 +7,13 @@ from datetime import datetime, timezone
 import re
 from typing import List, Optional
 import discord
+from discord.ext import tasks
 from shared.python.config import config
 from shared.python.redis_client import get_redis_client
-from .common import K_ALERT, K_MUTE, K_MSG, K_THREAD, K_THREAD_UID, K_FOLLOWUP, K_NOTES, PatternAlert, is_staff
+from shared.python.cache import note_cache_write
+from shared.python.discourse_db import get_discourse_db
+from shared.python.discourse_publisher import DiscoursePublishQueue, create_publisher, drain
+from .common import K_ALERT, K_MUTE, K_THREAD, K_THREAD_UID, K_FOLLOWUP, K_NOTES, PatternAlert, is_staff
 
 logger = logging.getLogger("PatternDetector")
 
@@ -291,11 +295,21 @@ class DiagnosticResultView(discord.ui.View):
         else:
             await itx.followup.send("❌ Nepodařilo se vytvořit vlákno. Zkontrolujte logy.", ephemeral=True)
 
+DISCOURSE_DRAIN_SECONDS = 20
+
 class PatternAlerts:
     def __init__(self, bot, guild_id):
         self.bot = bot
         self._guild_id = guild_id
         self._alert_channel = None
+        # Discourse cards are queued in Redis and published in batches off the scan path
+        self.discourse_queue = DiscoursePublishQueue(get_redis_client)
+        self.discourse_publisher = create_publisher()
+        self.publish_discourse_queue.start()
+
+    def cog_unload(self):
+        self.publish_discourse_queue.cancel()
+        asyncio.create_task(self.discourse_publisher.close())
 
     async def get_alert_channel(self) -> discord.TextChannel:
         if self._alert_channel:
@@ -322,7 +336,10 @@ class PatternAlerts:
             cooldown_hours = 3 * 24 # 3 days
             
         ttl = cooldown_hours * 3600
-        await r.set(key, str(int(time.time())), ex=ttl)
+        pipe = r.pipeline()
+        pipe.set(key, str(int(time.time())), ex=ttl)
+        note_cache_write(pipe, gid, "patterns")
+        await pipe.execute()
 
     async def send_batched_alerts(self, user_id: int, alerts: List[PatternAlert], gid: int = None):
         if not alerts:
@@ -424,22 +441,24 @@ class PatternAlerts:
     async def send_discourse_alert(self, user_id: int, alerts: List[PatternAlert]):
         if not alerts: return
         
-        from .common import K_DISCOURSE_TOPIC
-        r = await get_redis_client()
-        existing_topic_id = await r.get(K_DISCOURSE_TOPIC(user_id))
-        
         # 1. Get Discourse Username
-        import subprocess
-        cmd = f'docker exec app sudo -u postgres psql -d discourse -t -A -c "SELECT username FROM users WHERE id = {user_id}"'
-        res = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        username = res.stdout.strip() or f"User_{user_id}"
+        try:
+            username = await get_discourse_db().username(user_id)
+        except Exception as e:
+            logger.error(f"Discourse username lookup failed for {user_id}: {e}")
+            username = None
+        username = username or f"User_{user_id}"
         
         # 2. Get Diagnostic Context
         from .detectors import PatternDetectors
         det = PatternDetectors(self._guild_id)
         now = datetime.now(timezone.utc)
         today = now.strftime("%Y%m%d")
-        ctx = await det.get_diagnostic_context(r, 999, user_id, now, today)
+        r = await get_redis_client()
+        try:
+            ctx = await det.get_diagnostic_context(r, 999, user_id, now, today)
+        finally:
+            await r.aclose()
 
         # 3. Build Rich Markdown
         pattern_summaries = ", ".join([f"{a.emoji} {a.pattern_name}" for a in alerts])
@@ -491,52 +510,40 @@ class PatternAlerts:
         
         content += f"[Profil na fóru](/u/{username})"
         
-        # 4. Create or Reply via Rails Runner
-        import base64
-        title_b64 = base64.b64encode(title.encode('utf-8')).decode('ascii')
-        content_b64 = base64.b64encode(content.encode('utf-8')).decode('ascii')
-        target_topic_id = existing_topic_id or 0
-        
-        ruby_script = f"""
-        require 'base64'
-        title = Base64.decode64('{title_b64}').force_encoding('UTF-8')
-        raw = Base64.decode64('{content_b64}').force_encoding('UTF-8')
-        topic_id = {target_topic_id}
-        
-        if topic_id > 0 && Topic.exists?(topic_id)
-          creator = PostCreator.new(Discourse.system_user, topic_id: topic_id, raw: raw, skip_validations: true)
-          post = creator.create
-          puts 'SUCCESS_REPLY:' + topic_id.to_s if post
-        else
-          # Double check by title if Redis is missing the key
-          existing = Topic.where(category_id: 11, title: title).first
-          if existing
-             creator = PostCreator.new(Discourse.system_user, topic_id: existing.id, raw: raw, skip_validations: true)
-             post = creator.create
-             puts 'SUCCESS_REPLY:' + existing.id.to_s if post
-          else
-             creator = PostCreator.new(Discourse.system_user, title: title, raw: raw, category: 11, tags: ['novy'], skip_validations: true)
-             post = creator.create
-             puts 'SUCCESS_NEW:' + post.topic_id.to_s if post
-          end
-        end
-        """
-        
-        cmd = ["docker", "exec", "-u", "discourse", "-w", "/var/www/discourse", "app", "bundle", "exec", "rails", "runner", ruby_script]
+        # 4. Queue for the Discourse publisher (drained by publish_discourse_queue)
+        await self.discourse_queue.enqueue(user_id, title, content)
+        logger.info(f"Discourse alert for {username} queued")
+
+    @tasks.loop(seconds=DISCOURSE_DRAIN_SECONDS)
+    async def publish_discourse_queue(self):
+        """Publishes queued Discourse alert cards in batches (create topic or reply)."""
+        from .common import K_DISCOURSE_TOPIC
+        r = await get_redis_client()
+
+        async def lookup_topics(uids):
+            values = await r.mget([K_DISCOURSE_TOPIC(uid) for uid in uids])
+            return {uid: int(v) for uid, v in zip(uids, values) if v}
+
         try:
-            res = subprocess.run(cmd, capture_output=True, text=True)
-            if "SUCCESS" in res.stdout:
-                id_match = re.search(r'SUCCESS_(NEW|REPLY):(\d+)', res.stdout)
-                if id_match:
-                    new_id = id_match.group(2)
-                    await r.set(K_DISCOURSE_TOPIC(user_id), new_id, ex=365 * 86400)
-                    logger.info(f"Discourse alert {id_match.group(1)} for {username} (Topic ID: {new_id})")
-            else:
-                logger.error(f"Failed to create/reply Discourse alert: {res.stdout} {res.stderr}")
+            counts = await drain(self.discourse_queue, self.discourse_publisher, lookup_topics=lookup_topics)
+            if counts["topics"]:
+                pipe = r.pipeline(transaction=False)
+                for uid, topic_id in counts["topics"].items():
+                    pipe.set(K_DISCOURSE_TOPIC(uid), topic_id, ex=365 * 86400)
+                await pipe.execute()
+            if counts["published"] or counts["retried"] or counts["failed"]:
+                logger.info(
+                    f"Discourse publisher: {counts['published']} published ({counts['created']} new topics), "
+                    f"{counts['retried']} retried, {counts['failed']} failed"
+                )
         except Exception as e:
-            logger.error(f"Error calling rails runner: {e}")
+            logger.error(f"Discourse publisher error: {e}")
         finally:
-            await r.close()
+            await r.aclose()
+
+    @publish_discourse_queue.before_loop
+    async def _before_publisher(self):
+        await self.bot.wait_until_ready()
 
     async def send_alert(self, alert: PatternAlert, gid: int = None):
         await self.send_batched_alerts(alert.user_id, [alert], gid=gid)
@@ -631,11 +638,12 @@ class PatternAlerts:
 
     async def precompute_ai_draft(self, user_id: int, alerts: List[PatternAlert]):
         """Runs in background to pre-generate an AI draft for the user."""
-        from .ai_service import AIService
+        from .ai_service import AIService, Priority
         from .common import K_AI_DRAFT
         
         pats = [f"{a.pattern_name}: {a.description}" for a in alerts]
-        draft = await AIService.generate_mentor_draft("(Automatický předvýpočet)", pats)
+        # Nobody is waiting for this one, so it yields to button presses
+        draft = await AIService.generate_mentor_draft("(Automatický předvýpočet)", pats, priority=Priority.SUMMARY)
         if draft:
             r = await get_redis_client()
             try:
@@ -5,6 +5,7 @@ import logging
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from shared.python.config import config
+from shared.python.pattern_logic import PAT_TTL  # 2 years, shared with the Discourse signals
 
 logger = logging.getLogger("PatternDetector")
 
@@ -26,10 +27,7 @@ class PatternAlert:
         return {"critical": "🔴 KRITICKÉ", "warning": "🟡 VAROVÁNÍ", "info": "🟢 INFO"}[self.risk_level]
 
 # ─── Redis Helper Keys ───────────────────────────────────────────────
-def K_KW(gid, uid, date, group):  return f"pat:kw:{gid}:{uid}:{date}:{group}"
-def K_MSG(gid, uid, date):        return f"pat:msg:{gid}:{uid}:{date}"
-def K_DEL(gid, uid, date):        return f"pat:del:{gid}:{uid}:{date}"
-def K_EDIT(gid, uid, date):       return f"pat:edit:{gid}:{uid}:{date}"
+def K_DAY(gid, uid, date):        return f"pat:day:{gid}:{uid}:{date}"  # daily rollup hash, see pattern_logic
 def K_DIARY(gid, uid):            return f"pat:diary_unanswered:{gid}:{uid}"
 def K_REPLY(gid, a, b):           return f"pat:reply_pair:{gid}:{min(a,b)}:{max(a,b)}"
 def K_FIRST(gid, uid):            return f"pat:first_msg:{gid}:{uid}"
@@ -46,11 +44,15 @@ def K_THREAD_UID(tid):           return f"pat:thread_uid:{tid}"
 def K_STATUS(gid, uid):          return f"pat:status:{gid}:{uid}"
 def K_FOLLOWUP(gid, uid):        return f"pat:followup:{gid}:{uid}"
 def K_LAST_ACTIVITY(gid, uid):   return f"pat:last_act:{gid}:{uid}"
+def K_ACTIVE(gid):               return f"pat:active:{gid}"  # ZSET uid -> last activity ts
+def K_ACTIVE_READY(gid):         return f"pat:active_index:{gid}"  # set once pat:active was bootstrapped
 def K_DISCOURSE_TOPIC(uid):      return f"pat:discourse_topic:{uid}"
 def K_SENTIMENT(gid, uid, date): return f"pat:sentiment:{gid}:{uid}:{date}"
 def K_AI_DRAFT(gid, uid):       return f"pat:ai_draft:{gid}:{uid}"
+def K_AI_CACHE(digest):         return f"ai:cache:{digest}"  # response by sha256(provider, model, prompt)
+def K_AI_CACHE_STATS():         return "ai:cache_stats"  # hits, misses, coalesced
 
-PAT_TTL = 730 * 86400  # 2 years
+ACTIVE_INDEX_RETENTION = 30 * 86400  # pat:active entries older than this are trimmed by the scanner
 
 def is_staff(member) -> bool:
     """Check if a member is a staff/worker (Admin, Mod, Mentor, etc.)."""
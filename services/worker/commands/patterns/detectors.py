@@ -4,9 +4,11 @@ import logging
 from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Set, Optional
 import discord
-from .common import PatternAlert, K_MSG, K_KW, K_EDIT, K_JOIN, K_DIARY, K_QUESTION, K_STAFF_RESPONSE, K_FIRST, K_MUTE, K_LAST_ACTIVITY, K_SENTIMENT, K_AI_DRAFT, K_THREAD, K_THREAD_UID
+from .common import PatternAlert, K_DAY, K_JOIN, K_QUESTION, K_MUTE, K_LAST_ACTIVITY, K_SENTIMENT, K_AI_DRAFT, K_THREAD, K_THREAD_UID
+from .snapshot import SignalSnapshot, load_signal_snapshot
+from shared.python.pattern_logic import kw_field
+from shared.python.discourse_db import get_discourse_db
 
-import subprocess
 from .ai_service import AIService
 logger = logging.getLogger("PatternDetector")
 
@@ -22,8 +24,8 @@ class PatternDetectors:
 
         for i in range(days):
             d = (now - timedelta(days=i)).strftime("%Y%m%d")
-            data = await r.hgetall(K_MSG(gid, uid, d))
-            if data:
+            data = await r.hgetall(K_DAY(gid, uid, d))
+            if data.get("msg_count"):
                 mc = int(data.get("msg_count", 0))
                 total["word_count"] += int(data.get("word_count", 0))
                 total["msg_count"] += mc
@@ -61,7 +63,7 @@ class PatternDetectors:
         total = 0
         for i in range(days):
             d = (now - timedelta(days=i)).strftime("%Y%m%d")
-            val = await r.get(K_KW(gid, uid, d, group))
+            val = await r.hget(K_DAY(gid, uid, d), kw_field(group))
             if val:
                 total += int(val)
         return total
@@ -84,14 +86,8 @@ class PatternDetectors:
 
     async def fetch_recent_discourse_posts(self, uid: int, limit: int = 10) -> List[str]:
         """Fetch last N posts for a user from Discourse database."""
-        cmd = f'docker exec app sudo -u postgres psql -d discourse -t -A -c "SELECT raw FROM posts WHERE user_id = {uid} AND post_number > 0 ORDER BY created_at DESC LIMIT {limit};"'
         try:
-            res = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            if res.returncode == 0:
-                posts = [p.strip() for p in res.stdout.split("\n") if p.strip()]
-                return posts
-            else:
-                logger.error(f"Failed to fetch Discourse posts: {res.stderr}")
+            return await get_discourse_db().user_posts(uid, limit)
         except Exception as e:
             logger.error(f"Error fetching Discourse posts: {e}")
         return []
@@ -104,15 +100,18 @@ class PatternDetectors:
         return None
 
     async def get_all_time_stats(self, r, gid: int, uid: int) -> Dict:
-        # Scan all pat:msg:gid:uid:* keys
+        # Scan all pat:day:gid:uid:* rollups
         total_msgs = 0
         cursor = "0"
-        match = f"pat:msg:{gid}:{uid}:*"
+        match = f"pat:day:{gid}:{uid}:*"
         while True:
             cursor, keys = await r.scan(cursor=cursor, match=match, count=1000)
-            for k in keys:
-                data = await r.hgetall(k)
-                total_msgs += int(data.get("msg_count", 0))
+            if keys:
+                pipe = r.pipeline()
+                for k in keys:
+                    pipe.hget(k, "msg_count")
+                for mc in await pipe.execute():
+                    total_msgs += int(mc or 0)
             if cursor == 0 or cursor == "0": break
         return {"total_msgs": total_msgs}
 
@@ -123,22 +122,26 @@ class PatternDetectors:
             return json.loads(data)
         return []
 
-    async def scan_user(self, r, gid: int, uid: int, now: datetime, today: str) -> List[PatternAlert]:
+    async def scan_user(self, r, gid: int, uid: int, now: datetime, today: str,
+                        snap: Optional[SignalSnapshot] = None) -> List[PatternAlert]:
         alerts = []
-        stats_7d = await self.get_user_msg_stats(r, gid, uid, 7)
-        stats_14d = await self.get_user_msg_stats(r, gid, uid, 14)
-        stats_30d = await self.get_user_msg_stats(r, gid, uid, 30)
-        days_inactive = await self.days_since_last_activity(r, gid, uid, 180)
-        join_days = await self.get_join_days(r, gid, uid)
+        # One pipelined fetch of every per-day signal; detectors below run in memory
+        if snap is None:
+            snap = await load_signal_snapshot(r, gid, uid, now)
+        stats_7d = snap.msg_stats(7)
+        stats_14d = snap.msg_stats(14)
+        stats_30d = snap.msg_stats(30)
+        days_inactive = snap.days_since_last_activity(180)
+        join_days = snap.join_days()
         
         # --- Time-based context for UI ---
         last_msg_date = (now - timedelta(days=days_inactive)).strftime("%d.%m.%Y") if days_inactive < 180 else "Nikdy"
-        first_msg_ts = await r.hgetall(K_FIRST(gid, uid))
-        first_msg_date = datetime.fromtimestamp(int(first_msg_ts["timestamp"])).strftime("%d.%m.%Y") if first_msg_ts else "Neznámo"
+        first_msg_ts = snap.first_msg
+        first_msg_date = datetime.fromtimestamp(int(first_msg_ts["timestamp"])).strftime("%d.%m.%Y") if first_msg_ts.get("timestamp") else "Neznámo"
 
         # ── 1. Jednorázovka (RELAXED for demonstration) ──
         if stats_30d["msg_count"] >= 1 and 1 <= days_inactive <= 60:
-            total_90 = (await self.get_user_msg_stats(r, gid, uid, 90))["msg_count"]
+            total_90 = snap.msg_stats(90)["msg_count"]
             if total_90 >= 1:
                 alerts.append(PatternAlert(
                     pattern_name="Jednorázovka", user_id=uid, risk_level="info",
@@ -147,8 +150,8 @@ class PatternDetectors:
                 ))
 
         # ── 2. Falešný vrchol (Růžový obláček) ──
-        euphoria_kw_7d = await self.get_keyword_count(r, gid, uid, "euphoria", 7)
-        methodology_kw_7d = await self.get_keyword_count(r, gid, uid, "methodology", 7)
+        euphoria_kw_7d = snap.keyword_count("euphoria", 7)
+        methodology_kw_7d = snap.keyword_count("methodology", 7)
         if (euphoria_kw_7d >= 4 and methodology_kw_7d == 0) or (join_days and 75 <= join_days <= 95 and euphoria_kw_7d >= 3):
             alerts.append(PatternAlert(
                 pattern_name="Falešný vrchol", user_id=uid, risk_level="warning",
@@ -157,7 +160,7 @@ class PatternDetectors:
             ))
 
         # ── 3. Relapsová únava ──
-        relapse_kw_7d = await self.get_keyword_count(r, gid, uid, "relapse_fatigue", 7)
+        relapse_kw_7d = snap.keyword_count("relapse_fatigue", 7)
         if relapse_kw_7d >= 3:
             alerts.append(PatternAlert(
                 pattern_name="Relapsová únava", user_id=uid, risk_level="critical",
@@ -166,14 +169,7 @@ class PatternDetectors:
             ))
 
         # ── 4. Noční sova (Biorytmus) ──
-        night_msgs, total_msgs_hourly = 0, 0
-        for i in range(7):
-            d = (now - timedelta(days=i)).strftime("%Y%m%d")
-            hour_data = await r.hgetall(f"pat:hour:{gid}:{uid}:{d}")
-            for h, c in hour_data.items():
-                h_int = int(h)
-                total_msgs_hourly += int(c)
-                if 1 <= h_int <= 4: night_msgs += int(c)
+        night_msgs, total_msgs_hourly = snap.night_ratio(7)
         if total_msgs_hourly >= 8 and night_msgs / total_msgs_hourly >= 0.4:
             alerts.append(PatternAlert(
                 pattern_name="Noční sova", user_id=uid, risk_level="warning",
@@ -212,7 +208,7 @@ class PatternDetectors:
                     ))
 
         # ── 7. Emoční dumping ──
-        absolutisms_kw_7d = await self.get_keyword_count(r, gid, uid, "absolutisms", 7)
+        absolutisms_kw_7d = snap.keyword_count("absolutisms", 7)
         if absolutisms_kw_7d >= 8 and stats_7d["msg_count"] > 3:
             alerts.append(PatternAlert(
                 pattern_name="Emoční dumping", user_id=uid, risk_level="critical",
@@ -221,7 +217,7 @@ class PatternDetectors:
             ))
 
         # ── 8. Tiché vyhoření ──
-        despair_kw = await self.get_keyword_count(r, gid, uid, "despair", 14)
+        despair_kw = snap.keyword_count("despair", 14)
         if despair_kw >= 2 and days_inactive >= 2 and stats_30d["msg_count"] > 5:
             alerts.append(PatternAlert(
                 pattern_name="Tiché vyhoření", user_id=uid, risk_level="critical",
@@ -231,8 +227,7 @@ class PatternDetectors:
 
         # ── 8b. Náhlé zmizení ──
         if days_inactive >= 3 and days_inactive <= 7:
-            stats_before = await self.get_user_msg_stats(r, gid, uid, 14)
-            msgs_prev_week = sum(stats_before["daily_counts"][7:])
+            msgs_prev_week = sum(stats_14d["daily_counts"][7:])
             if msgs_prev_week >= 5 and stats_7d["msg_count"] == 0:
                 alerts.append(PatternAlert(
                     pattern_name="Náhlé zmizení", user_id=uid, risk_level="warning",
@@ -241,7 +236,7 @@ class PatternDetectors:
                 ))
 
         # ── 9. Zdi odvykání ──
-        wall_kw_7d = await self.get_keyword_count(r, gid, uid, "wall_keywords", 7)
+        wall_kw_7d = snap.keyword_count("wall_keywords", 7)
         if wall_kw_7d >= 4 and stats_7d["avg_words_per_msg"] < 8:
             alerts.append(PatternAlert(
                 pattern_name="Zdi odvykání", user_id=uid, risk_level="warning",
@@ -250,8 +245,8 @@ class PatternDetectors:
             ))
 
         # ── 10. Osobní investice (Edity) ──
-        edit_count_7d = await r.get(f"pat:edit:{gid}:{uid}:{today}") or 0
-        if int(edit_count_7d) >= 3:
+        edit_count_7d = snap.edits_today
+        if edit_count_7d >= 3:
             alerts.append(PatternAlert(
                 pattern_name="Osobní investice", user_id=uid, risk_level="info",
                 description="Uživatel intenzivně edituje své příspěvky. Projev vysoké kognitivní investice.",
@@ -267,11 +262,11 @@ class PatternDetectors:
             ))
 
         # ── 12. Poslední monolog ──
-        diary_entries = await r.lrange(K_DIARY(gid, uid), 0, -1)
-        if len(diary_entries) >= 3:
+        diary_unanswered = snap.diary_unanswered
+        if diary_unanswered >= 3:
             alerts.append(PatternAlert(
                 pattern_name="Poslední monolog", user_id=uid, risk_level="critical",
-                description=f"{len(diary_entries)} příspěvků v deníku bez odpovědi. Hrozí pocit ignorace.",
+                description=f"{diary_unanswered} příspěvků v deníku bez odpovědi. Hrozí pocit ignorace.",
                 recommended_action="Mentor MUSÍ reagovat na každý druhý nepokrytý post.", emoji="📢"
             ))
 
@@ -290,8 +285,8 @@ class PatternDetectors:
             if cursor == 0 or cursor == "0": break
 
         # ── 14. Nadšený pomocník ──
-        help_kw_7d = await self.get_keyword_count(r, gid, uid, "help_others", 7)
-        personal_kw_7d = await self.get_keyword_count(r, gid, uid, "methodology", 7)
+        help_kw_7d = snap.keyword_count("help_others", 7)
+        personal_kw_7d = methodology_kw_7d
         if help_kw_7d >= 10:
             risk = "info"
             if personal_kw_7d < 2: risk = "warning"
@@ -345,12 +340,11 @@ class PatternDetectors:
 
         # ── 21. Aktivní pozorovatel ──
         if stats_7d["msg_count"] == 1:
-            first_data = await r.hgetall(K_FIRST(gid, uid))
-            if first_data:
+            first_data = snap.first_msg
+            if first_data.get("timestamp"):
                  first_ts = int(first_data["timestamp"])
-                 join_ts_str = await r.get(K_JOIN(gid, uid))
-                 if join_ts_str:
-                     silent_time = first_ts - int(join_ts_str)
+                 if snap.join_ts is not None:
+                     silent_time = first_ts - snap.join_ts
                      if silent_time > 30 * 86400:
                          alerts.append(PatternAlert(
                             pattern_name="Aktivní pozorovatel", user_id=uid, risk_level="info",
@@ -359,8 +353,8 @@ class PatternDetectors:
                         ))
 
         # ── 22. Autoritativní přijetí ──
-        staff_resp_time = await r.get(K_STAFF_RESPONSE(gid, uid))
-        if staff_resp_time and int(staff_resp_time) < 2 * 3600:
+        staff_resp_time = snap.staff_response
+        if staff_resp_time is not None and staff_resp_time < 2 * 3600:
             alerts.append(PatternAlert(
                 pattern_name="Autoritativní přijetí", user_id=uid, risk_level="info",
                 description="Rychlá reakce mentora na první post (<2h). Zvyšuje retenci o 70%.",
@@ -368,8 +362,8 @@ class PatternDetectors:
             ))
 
         # ── 25. Stud po dumpingu ──
-        long_del_7d = await r.get(f"pat:del_long:{gid}:{uid}:{today}")
-        if long_del_7d and int(long_del_7d) >= 1:
+        long_del_7d = snap.long_deletes_today
+        if long_del_7d >= 1:
             alerts.append(PatternAlert(
                 pattern_name="Stud po dumpingu", user_id=uid, risk_level="warning",
                 description="Smazání dlouhého příspěvku krátce po odeslání. Pocit studu.",
@@ -377,7 +371,7 @@ class PatternDetectors:
             ))
 
         # ── 26. Moderátorský syndrom ──
-        preachy_kw_7d = await self.get_keyword_count(r, gid, uid, "preachy", 7)
+        preachy_kw_7d = snap.keyword_count("preachy", 7)
         out_in_ratio = stats_7d["msg_count"] / (stats_7d["reply_count"] or 1)
         if preachy_kw_7d >= 3 and out_in_ratio > 4:
             alerts.append(PatternAlert(
@@ -387,7 +381,7 @@ class PatternDetectors:
             ))
 
         # ── 27. Komunitní lepidlo ──
-        mention_count = await self.get_keyword_count(r, gid, uid, "interaction", 7)
+        mention_count = snap.keyword_count("interaction", 7)
         reply_count = stats_7d["reply_count"]
         social_ratio = (reply_count + mention_count) / max(stats_7d["msg_count"], 1)
         if (mention_count >= 10 or social_ratio > 0.6) and stats_7d["msg_count"] >= 10:
@@ -398,7 +392,7 @@ class PatternDetectors:
             ))
 
         # ── 28. Survival Metoda ──
-        survival_kw_7d = await self.get_keyword_count(r, gid, uid, "survival", 7)
+        survival_kw_7d = snap.keyword_count("survival", 7)
         if survival_kw_7d >= 3:
             alerts.append(PatternAlert(
                 pattern_name="Survival Metoda", user_id=uid, risk_level="info",
@@ -408,7 +402,7 @@ class PatternDetectors:
 
         # ── 29. Absence krizového plánu ──
         if join_days and join_days > 14 and stats_7d["msg_count"] > 5:
-            plan_kw_30d = await self.get_keyword_count(r, gid, uid, "methodology", 30)
+            plan_kw_30d = snap.keyword_count("methodology", 30)
             if plan_kw_30d == 0:
                 alerts.append(PatternAlert(
                     pattern_name="Absence plánu", user_id=uid, risk_level="warning",
@@ -418,11 +412,15 @@ class PatternDetectors:
 
         return alerts
 
-    async def analyze_user_affinity(self, r, gid: int, uid: int, now: datetime, today: str, stats_7d: Dict, stats_30d: Dict, days_inactive: int) -> List[Dict]:
+    async def analyze_user_affinity(self, r, gid: int, uid: int, now: datetime, today: str, stats_7d: Dict, stats_30d: Dict, days_inactive: int,
+                                    snap: Optional[SignalSnapshot] = None, alerts: Optional[List[PatternAlert]] = None) -> List[Dict]:
         affinities = []
+        if snap is None:
+            snap = await load_signal_snapshot(r, gid, uid, now)
         
         # 0. Active Alerts - Force 100% fulfillment
-        alerts = await self.scan_user(r, gid, uid, now, today)
+        if alerts is None:
+            alerts = await self.scan_user(r, gid, uid, now, today, snap=snap)
         active_names = {a.pattern_name for a in alerts}
         for a in alerts:
              affinities.append({
@@ -432,13 +430,7 @@ class PatternDetectors:
             })
 
         # 1. Nocturnal Activity %
-        total_hourly, night_msgs = 0, 0
-        for i in range(7):
-            d = (now - timedelta(days=i)).strftime("%Y%m%d")
-            hour_data = await r.hgetall(f"pat:hour:{gid}:{uid}:{d}")
-            for h, c in hour_data.items():
-                total_hourly += int(c)
-                if 1 <= int(h) <= 4: night_msgs += int(c)
+        night_msgs, total_hourly = snap.night_ratio(7)
         
         if "Noční sova" not in active_names:
             score = 0
@@ -456,7 +448,7 @@ class PatternDetectors:
         
         # 2. Relapse Fatigue %
         if "Relapsová únava" not in active_names:
-            relapse_fatigue_kw = await self.get_keyword_count(r, gid, uid, "relapse_fatigue", 7)
+            relapse_fatigue_kw = snap.keyword_count("relapse_fatigue", 7)
             score = min(100, int((relapse_fatigue_kw / 3) * 100))
             if score > 0 or stats_7d["msg_count"] > 0:
                 affinities.append({
@@ -467,7 +459,7 @@ class PatternDetectors:
 
         # 3. Emoční dumping %
         if "Emoční dumping" not in active_names:
-            absolutisms_kw = await self.get_keyword_count(r, gid, uid, "absolutisms", 7)
+            absolutisms_kw = snap.keyword_count("absolutisms", 7)
             score = min(100, int((absolutisms_kw / 8) * 100))
             if score > 0 or stats_7d["msg_count"] > 0:
                 affinities.append({
@@ -478,7 +470,7 @@ class PatternDetectors:
 
         # 4. Help Others
         if "Pomocník" not in active_names:
-            help_others = await self.get_keyword_count(r, gid, uid, "help_others", 7)
+            help_others = snap.keyword_count("help_others", 7)
             score = min(100, int((help_others / 10) * 100))
             if score > 0:
                 affinities.append({
@@ -489,7 +481,7 @@ class PatternDetectors:
             
         # 5. Euphoria
         if "Růžový obláček" not in active_names:
-            euphoria_kw = await self.get_keyword_count(r, gid, uid, "euphoria", 7)
+            euphoria_kw = snap.keyword_count("euphoria", 7)
             score = min(100, int((euphoria_kw / 4) * 100))
             if score > 0:
                 affinities.append({
@@ -504,10 +496,14 @@ class PatternDetectors:
     async def scan_group_patterns(self, r, gid: int, now: datetime, today: str, user_ids: Set[int]) -> List[PatternAlert]:
         alerts = []
         relapse_uids = []
-        for uid in user_ids:
-            relapse_kw = await self.get_keyword_count(r, gid, uid, "relapse_word", 1) 
-            if relapse_kw > 0:
-                relapse_uids.append(uid)
+        uids = list(user_ids)
+        if uids:
+            # One pipelined HGET per user instead of sequential round-trips
+            pipe = r.pipeline()
+            for uid in uids:
+                pipe.hget(K_DAY(gid, uid, today), kw_field("relapse_word"))
+            vals = await pipe.execute()
+            relapse_uids = [uid for uid, v in zip(uids, vals) if v and int(v) > 0]
         
         if len(relapse_uids) >= 3:
             for uid in relapse_uids:
@@ -520,20 +516,21 @@ class PatternDetectors:
 
     async def get_diagnostic_context(self, r, gid: int, uid: int, now: datetime, today: str) -> Dict:
         """Centralized diagnostic data collection for both Discord and Discourse."""
-        alerts = await self.scan_user(r, gid, uid, now, today)
-        stats_7d = await self.get_user_msg_stats(r, gid, uid, 7)
-        stats_30d = await self.get_user_msg_stats(r, gid, uid, 30)
-        sentiment_7d = await self.get_user_sentiment_stats(r, gid, uid, 7)
-        days_inactive = await self.days_since_last_activity(r, gid, uid, 365)
-        affinities = await self.analyze_user_affinity(r, gid, uid, now, today, stats_7d, stats_30d, days_inactive)
+        snap = await load_signal_snapshot(r, gid, uid, now, activity_days=365)
+        alerts = await self.scan_user(r, gid, uid, now, today, snap=snap)
+        stats_7d = snap.msg_stats(7)
+        stats_30d = snap.msg_stats(30)
+        sentiment_7d = snap.sentiment_stats(7)
+        days_inactive = snap.days_since_last_activity(365)
+        affinities = await self.analyze_user_affinity(r, gid, uid, now, today, stats_7d, stats_30d, days_inactive, snap=snap, alerts=alerts)
         all_time = await self.get_all_time_stats(r, gid, uid)
         notes = await self.get_klient_notes(r, gid, uid)
         
         # Inactivity/Timing dates
         last_date = (now - timedelta(days=days_inactive)).strftime("%d.%m.%Y") if days_inactive < 365 else "Nikdy"
-        first_msg_ts = await r.hgetall(K_FIRST(gid, uid))
-        first_date = datetime.fromtimestamp(int(first_msg_ts["timestamp"])).strftime("%d.%m.%Y") if first_msg_ts else "Neznámo"
-        join_days = await self.get_join_days(r, gid, uid)
+        first_msg_ts = snap.first_msg
+        first_date = datetime.fromtimestamp(int(first_msg_ts["timestamp"])).strftime("%d.%m.%Y") if first_msg_ts.get("timestamp") else "Neznámo"
+        join_days = snap.join_days()
 
         # Urgency Logic
         urgency_text = "⚪ **Nízká** (Informační)"
@@ -4,7 +4,7 @@ import asyncio
 from datetime import datetime, timezone
 import discord
 from discord.ext import tasks
-from .common import K_LAST_SCAN, K_LAST_ACTIVITY, K_MSG, K_SENTIMENT
+from .common import K_LAST_SCAN, K_ACTIVE, K_ACTIVE_READY, K_SENTIMENT, ACTIVE_INDEX_RETENTION
 from shared.python.config import config
 
 logger = logging.getLogger("PatternDetector")
@@ -53,33 +53,23 @@ class PatternScanner:
                 if is_staff(member):
                     staff_ids.add(member.id)
         
-        # 2. Collect all known user IDs
-        user_ids = set()
-        cursor = "0"
-        while True:
-            cursor, keys = await r.scan(cursor=cursor, match=f"pat:msg:{gid}:*", count=500)
-            for k in keys:
-                parts = k.split(":")
-                if len(parts) >= 4:
-                    user_ids.add(int(parts[3]))
-            if cursor == 0 or cursor == "0":
-                break
-
+        # 2. Collect users active in the last 48h from the activity index
         now = datetime.now(timezone.utc)
         today = now.strftime("%Y%m%d")
+        now_ts = int(now.timestamp())
+        cutoff_ts = now_ts - (48 * 3600)
+
+        if not await r.exists(K_ACTIVE_READY(gid)):
+            await self.rebuild_active_index(r, gid, now_ts)
+        await r.zremrangebyscore(K_ACTIVE(gid), "-inf", now_ts - ACTIVE_INDEX_RETENTION)
+        user_ids = {int(uid) for uid in await r.zrangebyscore(K_ACTIVE(gid), cutoff_ts, "+inf")}
 
-        # 3. Scan each user (with activity filter and pacing)
-        cutoff_ts = int(time.time()) - (48 * 3600)  # Only users active in last 48h
+        # 3. Scan each active user (with pacing)
         scanned_count = 0
         skipped_count = 0
         
         for uid in user_ids:
             if uid in staff_ids:
-                continue
-                
-            # Activity filter to save resources
-            last_act = await r.get(K_LAST_ACTIVITY(gid, uid))
-            if not last_act or int(last_act) < cutoff_ts:
                 skipped_count += 1
                 continue
                 
@@ -95,7 +85,7 @@ class PatternScanner:
                 logger.error(f"Error scanning user {uid}: {e}")
 
         if scanned_count > 0 or skipped_count > 0:
-            logger.info(f"Scan stats for gid {gid}: {scanned_count} scanned, {skipped_count} skipped (inactive)")
+            logger.info(f"Scan stats for gid {gid}: {scanned_count} scanned, {skipped_count} skipped (staff)")
 
         # 4. Group patterns
         try:
@@ -133,6 +123,33 @@ class PatternScanner:
         if sent_count > 0:
             logger.info(f"Pattern scan: {len(user_ids)} users, {sent_count} alerts sent")
 
+    async def rebuild_active_index(self, r, gid: int, now_ts: int):
+        """
+        One-off bootstrap of pat:active:{gid} from pat:last_act:* keys, for
+        deployments that predate the index. Only activity within
+        ACTIVE_INDEX_RETENTION is indexed; pat:active_index:{gid} marks the
+        guild as done, so a guild that has gone quiet is not rescanned.
+        """
+        min_ts = now_ts - ACTIVE_INDEX_RETENTION
+        cursor = "0"
+        rebuilt = 0
+        while True:
+            cursor, keys = await r.scan(cursor=cursor, match=f"pat:last_act:{gid}:*", count=500)
+            if keys:
+                values = await r.mget(keys)
+                mapping = {}
+                for k, v in zip(keys, values):
+                    if v and int(v) > min_ts:
+                        mapping[k.split(":")[-1]] = int(v)
+                if mapping:
+                    await r.zadd(K_ACTIVE(gid), mapping, gt=True)
+                    rebuilt += len(mapping)
+            if cursor == 0 or cursor == "0":
+                break
+        await r.set(K_ACTIVE_READY(gid), now_ts)
+        if rebuilt:
+            logger.info(f"Rebuilt active-user index for gid {gid}: {rebuilt} users")
+
     async def check_followups(self):
         r = await self._get_redis()
         try:
@@ -1,24 +1,34 @@
 import asyncio
 import json
+from collections import Counter
 import logging
-import httpx
 import os
 import discord
 from discord.ext import commands
 from shared.python.redis_client import get_redis_client
+from shared.python.llm_scheduler import LLMJobDropped, get_llm_scheduler
+from shared.python.sentiment_batch import SentimentBatcher, has_crisis_cues
+from shared.python.sentiment_prefilter import prefilter
 from .common import K_SENTIMENT, get_today, is_staff, PAT_TTL
 
 logger = logging.getLogger("SentimentEngine")
 
+SENTIMENT_MAX_AGE = float(os.getenv("SENTIMENT_MAX_AGE", "120"))  # seconds before a queued job is stale
+
 class SentimentEngine(commands.Cog):
     def __init__(self, bot, guild_id):
         self.bot = bot
         self._guild_id = guild_id
-        # Semaphore to ensure we don't slam the CPU with multiple local LLM calls
-        self._llm_semaphore = asyncio.Semaphore(1)
-        self.ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+        # Shared with AIService: one queue per process, sentiment has the lowest priority
+        self.llm = get_llm_scheduler()
         # Use Llama 3.2 (3B) for better accuracy
         self.model = "llama3.2:3b"
+        self.llm.keep_warm(self.model)
+        # Messages are classified in numbered batches; crisis cues skip the batch window
+        self.batcher = SentimentBatcher(self.llm, self.model, max_age=SENTIMENT_MAX_AGE)
+        # Messages labeled by the lexical pre-classifier ("NEUTRAL"/"POSITIVE") vs sent to the model ("llm")
+        self.prefilter_stats = Counter()
+        self._tasks = set()  # background saves and analyses, referenced until they finish
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -37,54 +47,52 @@ class SentimentEngine(commands.Cog):
             logger.debug(f"Skipping sentiment for overly long message: {len(text)} chars")
             return
 
-        # Trigger analysis in background so we don't block other listeners
-        asyncio.create_task(self.analyze_sentiment(message))
+        # Crisis wording always reaches the model first; allowlisted chit-chat is labeled locally
+        crisis = has_crisis_cues(text)
+        label = None if crisis else prefilter(text)
+        self.prefilter_stats[label or "llm"] += 1
+        if label:
+            self._spawn(self._save_sentiment(message.guild.id, message.author.id, label), message.id)
+            return
+
+        # Queue the message; a full queue drops it instead of growing the backlog
+        try:
+            if crisis:
+                job = self.batcher.classify_now(text)
+            else:
+                job = self.batcher.submit(text)
+        except LLMJobDropped:
+            logger.debug(f"Sentiment queue full, skipping message {message.id}")
+            return
+        self._spawn(self.analyze_sentiment(message, job), message.id)
+
+    def _spawn(self, coro, message_id: int):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
 
-    async def analyze_sentiment(self, message: discord.Message):
-        async with self._llm_semaphore:
-            try:
-                logger.info(f"Analyzing sentiment for user {message.author.id}...")
-                sentiment = await self._call_ollama(message.content)
-                if sentiment:
-                    logger.info(f"Sentiment detected: {sentiment} for user {message.author.id}")
-                    await self._save_sentiment(message.guild.id, message.author.id, sentiment)
-                    if sentiment == "URGENT":
-                        await self._handle_crisis(message)
-            except Exception as e:
-                logger.error(f"Sentiment analysis failed for message {message.id}: {e}")
+        def done(t: asyncio.Task):
+            self._tasks.discard(t)
+            if not t.cancelled() and t.exception() is not None:
+                logger.error(f"Saving sentiment for message {message_id} failed: {t.exception()}")
 
-    async def _call_ollama(self, text: str) -> str:
-        prompt = (
-            "Analyze the sentiment of this message from a user in a recovery community. "
-            "Respond with EXACTLY one of these words: POSITIVE, NEUTRAL, NEGATIVE, or URGENT.\n\n"
-            f"Message: {text[:500]}"
-        )
-        
+        task.add_done_callback(done)
+
+    async def analyze_sentiment(self, message: discord.Message, job: asyncio.Future):
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    f"{self.ollama_host}/api/generate",
-                    json={
-                        "model": self.model,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "temperature": 0.1,
-                            "num_predict": 5
-                        }
-                    }
-                )
-                response.raise_for_status()
-                result = response.json().get("response", "").strip().upper()
-                
-                # Clean up response in case it returned more text
-                for word in ["POSITIVE", "NEUTRAL", "NEGATIVE", "URGENT"]:
-                    if word in result:
-                        return word
-                return "NEUTRAL"
+            sentiment = await job
+        except LLMJobDropped as e:
+            logger.debug(f"Sentiment for message {message.id} dropped ({e.reason})")
+            return
         except Exception as e:
             logger.debug(f"Ollama sentiment call failed: {e}")
-            return None
+            return
+        try:
+            logger.info(f"Sentiment detected: {sentiment} for user {message.author.id}")
+            await self._save_sentiment(message.guild.id, message.author.id, sentiment)
+            if sentiment == "URGENT":
+                await self._handle_crisis(message)
+        except Exception as e:
+            logger.error(f"Sentiment analysis failed for message {message.id}: {e}")
 
     async def _save_sentiment(self, gid: int, uid: int, sentiment: str):
         r = await get_redis_client()
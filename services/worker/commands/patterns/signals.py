@@ -2,17 +2,41 @@ import json
 import logging
 from datetime import datetime, timezone
 import discord
-from discord.ext import commands
-from .common import K_MSG, K_KW, K_FIRST, K_REPLY, K_DIARY, K_QUESTION, K_JOIN, K_STAFF_RESPONSE, K_MSG_LEN, K_LAST_ACTIVITY, PAT_TTL, get_today, is_staff, is_diary_channel
-from shared.python.pattern_logic import KEYWORD_GROUPS, count_keywords, count_words, is_analytical_style
+from discord.ext import commands, tasks
+from .common import K_DAY, K_FIRST, K_REPLY, K_DIARY, K_QUESTION, K_JOIN, K_STAFF_RESPONSE, K_MSG_LEN, PAT_TTL, get_today, is_staff, is_diary_channel
+from shared.python.pattern_logic import queue_message_signals, queue_text_signals
+from shared.python.discourse_db import get_discourse_db
+from shared.python.discourse_ingest import DiscourseIngester
+from shared.python.cache import note_cache_write
 
 logger = logging.getLogger("PatternDetector")
 
+DISCOURSE_INGEST_SECONDS = 60
+
 class PatternSignals(commands.Cog):
     def __init__(self, bot, guild_id, redis_getter):
         self.bot = bot
         self._guild_id = guild_id
         self._get_redis = redis_getter
+        self.discourse = DiscourseIngester(get_discourse_db(), redis_getter)
+        self.ingest_discourse.start()
+
+    def cog_unload(self):
+        self.ingest_discourse.cancel()
+
+    @tasks.loop(seconds=DISCOURSE_INGEST_SECONDS)
+    async def ingest_discourse(self):
+        """Discourse posts newer than the watermark -> signals of the synthetic guild 999."""
+        try:
+            counts = await self.discourse.run_once()
+            if counts["posts"]:
+                logger.info(f"Discourse ingest: {counts['posts']} posts, watermark {counts['watermark']}")
+        except Exception as e:
+            logger.error(f"Discourse ingest error: {e}")
+
+    @ingest_discourse.before_loop
+    async def _before_ingest(self):
+        await self.bot.wait_until_ready()
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -27,7 +51,6 @@ class PatternSignals(commands.Cog):
             uid = message.author.id
             today = get_today()
             text = message.content or ""
-            wc = count_words(text)
             is_reply = message.reference is not None
             mentions = len(message.mentions)
             author_is_staff = isinstance(message.author, discord.Member) and is_staff(message.author)
@@ -52,46 +75,23 @@ class PatternSignals(commands.Cog):
                     return
 
             pipe = r.pipeline()
-
-            # --- Aggregate message stats (Skip staff for some metrics) ---
-            if not author_is_staff:
-                msg_key = K_MSG(gid, uid, today)
-                pipe.hincrby(msg_key, "word_count", wc)
-                pipe.hincrby(msg_key, "msg_count", 1)
-                pipe.hincrby(msg_key, "char_count", len(text))
-                if is_reply:
-                    pipe.hincrby(msg_key, "reply_count", 1)
-                if mentions > 0:
-                    pipe.hincrby(msg_key, "mention_count", mentions)
-                pipe.expire(msg_key, PAT_TTL)
-                # Track last activity for follow-ups
-                pipe.set(K_LAST_ACTIVITY(gid, uid), str(int(message.created_at.timestamp())), ex=PAT_TTL)
-
-            # --- Keyword scanning & Analytical style ---
-            if len(text) > 3:
-                for group in KEYWORD_GROUPS:
-                    hits = count_keywords(text, group)
-                    if hits > 0:
-                        kw_key = K_KW(gid, uid, today, group)
-                        pipe.incrby(kw_key, hits)
-                        pipe.expire(kw_key, PAT_TTL)
-                
-                if is_analytical_style(text):
-                    pipe.incr(K_KW(gid, uid, today, "analytical_hits"))
-                    pipe.expire(K_KW(gid, uid, today, "analytical_hits"), PAT_TTL)
+            day_key = K_DAY(gid, uid, today)
+
+            # --- Message stats, keywords, activity index, first message & join date ---
+            if author_is_staff:
+                queue_text_signals(pipe, day_key, text, message.created_at.hour)
+            else:
+                joined_at = message.author.joined_at if isinstance(message.author, discord.Member) else None
+                queue_message_signals(
+                    pipe, gid, uid, text, today, int(message.created_at.timestamp()), message.created_at.hour,
+                    is_reply=is_reply, mentions=mentions, msg_id=message.id, channel_id=message.channel.id,
+                    joined_ts=int(joined_at.timestamp()) if joined_at else None,
+                )
 
             # --- Message length caching (for deletion tracking) ---
             mlen_key = K_MSG_LEN(gid, message.id)
             pipe.set(mlen_key, str(len(text)), ex=3600) # Only cache for 1 hour
 
-            # --- First message tracking ---
-            if not author_is_staff:
-                first_key = K_FIRST(gid, uid)
-                pipe.hsetnx(first_key, "msg_id", str(message.id))
-                pipe.hsetnx(first_key, "timestamp", str(int(message.created_at.timestamp())))
-                pipe.hsetnx(first_key, "channel_id", str(message.channel.id))
-                pipe.expire(first_key, PAT_TTL)
-
             # --- Staff Response Tracking ---
             if author_is_staff and is_reply and message.reference.message_id:
                 try:
@@ -150,17 +150,7 @@ class PatternSignals(commands.Cog):
                 q_key = K_QUESTION(gid, uid, message.id)
                 pipe.set(q_key, str(int(message.created_at.timestamp())), ex=24 * 3600)
 
-            # --- Join date tracking ---
-            if isinstance(message.author, discord.Member) and message.author.joined_at and not author_is_staff:
-                join_key = K_JOIN(gid, uid)
-                pipe.setnx(join_key, str(int(message.author.joined_at.timestamp())))
-                pipe.expire(join_key, PAT_TTL)
-
-            # --- Hour tracking ---
-            hour = message.created_at.hour
-            hour_key = f"pat:hour:{gid}:{uid}:{today}"
-            pipe.hincrby(hour_key, str(hour), 1)
-            pipe.expire(hour_key, PAT_TTL)
+            note_cache_write(pipe, gid, "patterns")
 
             await pipe.execute()
         except Exception as e:
@@ -179,16 +169,14 @@ class PatternSignals(commands.Cog):
             gid, uid, today = message.guild.id, message.author.id, get_today()
             
             # Record standard deletion
-            key = f"pat:del:{gid}:{uid}:{today}"
-            await r.incr(key)
-            await r.expire(key, PAT_TTL)
+            day_key = K_DAY(gid, uid, today)
+            await r.hincrby(day_key, "del", 1)
             
             # Check if it was a LONG message (for Post-dumping Shame)
             mlen_val = await r.get(K_MSG_LEN(gid, message.id))
             if mlen_val and int(mlen_val) > 500: # Over 500 chars 
-                long_del_key = f"pat:del_long:{gid}:{uid}:{today}"
-                await r.incr(long_del_key)
-                await r.expire(long_del_key, PAT_TTL)
+                await r.hincrby(day_key, "del_long", 1)
+            await r.expire(day_key, PAT_TTL)
                 
             await r.aclose()
         except Exception as e:
@@ -207,8 +195,8 @@ class PatternSignals(commands.Cog):
             return
         try:
             r = await self._get_redis()
-            key = f"pat:edit:{payload.guild_id}:{uid}:{get_today()}"
-            await r.incr(key)
+            key = K_DAY(payload.guild_id, uid, get_today())
+            await r.hincrby(key, "edit", 1)
             await r.expire(key, PAT_TTL)
             await r.aclose()
         except Exception as e:
@@ -0,0 +1,152 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from .common import K_DAY, K_SENTIMENT, K_JOIN, K_FIRST, K_DIARY, K_STAFF_RESPONSE
+from shared.python.pattern_logic import parse_day_rollup
+
+logger = logging.getLogger("PatternDetector")
+
+# ─── Snapshot windows (days, index 0 = today) ────────────────────────
+DAY_WINDOW = 90        # pat:day  – widest msg-stats window used by detectors
+KW_WINDOW = 30         # widest keyword window ("Absence plánu")
+HOUR_WINDOW = 7        # night-owl ratio
+SENTIMENT_WINDOW = 7   # pat:sentiment
+ACTIVITY_WINDOW = 180  # stats:user_daily – days since last activity
+
+SENTIMENT_LABELS = ("POSITIVE", "NEUTRAL", "NEGATIVE", "URGENT")
+
+
+class SignalSnapshot:
+    """
+    In-memory copy of every per-day pattern signal of one user.
+    Built by `load_signal_snapshot` in a single pipelined round-trip; all
+    accessors are synchronous and mirror the old per-day Redis helpers.
+    """
+
+    def __init__(self, gid: int, uid: int, now: datetime, dates: List[str]):
+        self.gid = gid
+        self.uid = uid
+        self.now = now
+        self.dates = dates
+        self.msg: List[Dict[str, int]] = []
+        self.kw: List[Dict[str, int]] = []
+        self.hours: List[Dict[int, int]] = []
+        self.sentiment: List[Dict[str, int]] = []
+        self.daily_totals: List[int] = []
+        self.join_ts: Optional[int] = None
+        self.first_msg: Dict[str, str] = {}
+        self.diary_unanswered = 0
+        self.staff_response: Optional[int] = None
+        self.edits_today = 0
+        self.long_deletes_today = 0
+
+    def msg_stats(self, days: int) -> Dict:
+        """Same shape as PatternDetectors.get_user_msg_stats."""
+        total = {"word_count": 0, "msg_count": 0, "char_count": 0,
+                 "reply_count": 0, "mention_count": 0, "days_active": 0}
+        daily_counts = []
+        for data in self.msg[:days]:
+            mc = data.get("msg_count", 0)
+            total["word_count"] += data.get("word_count", 0)
+            total["msg_count"] += mc
+            total["char_count"] += data.get("char_count", 0)
+            total["reply_count"] += data.get("reply_count", 0)
+            total["mention_count"] += data.get("mention_count", 0)
+            if mc > 0:
+                total["days_active"] += 1
+            daily_counts.append(mc)
+        # Window wider than the snapshot: pad with empty days
+        daily_counts.extend([0] * (days - len(daily_counts)))
+
+        total["daily_counts"] = daily_counts
+        total["avg_words_per_msg"] = (
+            total["word_count"] / total["msg_count"]
+            if total["msg_count"] > 0 else 0
+        )
+        return total
+
+    def keyword_count(self, group: str, days: int) -> int:
+        return sum(day.get(group, 0) for day in self.kw[:days])
+
+    def sentiment_stats(self, days: int) -> Dict[str, int]:
+        totals = {s: 0 for s in SENTIMENT_LABELS}
+        for day in self.sentiment[:days]:
+            for s, c in day.items():
+                if s in totals:
+                    totals[s] += c
+        return totals
+
+    def night_ratio(self, days: int = HOUR_WINDOW) -> Tuple[int, int]:
+        """Returns (night messages 01-04, total messages) from hour buckets."""
+        night, total = 0, 0
+        for day in self.hours[:days]:
+            for h, c in day.items():
+                total += c
+                if 1 <= h <= 4:
+                    night += c
+        return night, total
+
+    def days_since_last_activity(self, max_lookback: int = ACTIVITY_WINDOW) -> int:
+        for i, count in enumerate(self.daily_totals[:max_lookback]):
+            if count > 0:
+                return i
+        return max_lookback
+
+    def join_days(self) -> Optional[int]:
+        if self.join_ts is None:
+            return None
+        return (int(self.now.timestamp()) - self.join_ts) // 86400
+
+
+def _int_map(data: Dict) -> Dict[str, int]:
+    out = {}
+    for k, v in (data or {}).items():
+        try:
+            out[k] = int(v)
+        except (TypeError, ValueError):
+            continue
+    return out
+
+
+async def load_signal_snapshot(r, gid: int, uid: int, now: Optional[datetime] = None,
+                               activity_days: int = ACTIVITY_WINDOW) -> SignalSnapshot:
+    """Fetch all per-day signals of a user for the widest detector window in one pipeline."""
+    now = now or datetime.now(timezone.utc)
+    span = max(DAY_WINDOW, SENTIMENT_WINDOW, activity_days)
+    dates = [(now - timedelta(days=i)).strftime("%Y%m%d") for i in range(span)]
+    snap = SignalSnapshot(gid, uid, now, dates)
+
+    pipe = r.pipeline()
+    for d in dates[:DAY_WINDOW]:
+        pipe.hgetall(K_DAY(gid, uid, d))
+    for d in dates[:SENTIMENT_WINDOW]:
+        pipe.hgetall(K_SENTIMENT(gid, uid, d))
+    for d in dates[:activity_days]:
+        pipe.zscore(f"stats:user_daily:{gid}:{d}", str(uid))
+    pipe.get(K_JOIN(gid, uid))
+    pipe.hgetall(K_FIRST(gid, uid))
+    pipe.llen(K_DIARY(gid, uid))
+    pipe.get(K_STAFF_RESPONSE(gid, uid))
+    res = await pipe.execute()
+
+    pos = 0
+    days = [parse_day_rollup(h) for h in res[pos:pos + DAY_WINDOW]]
+    pos += DAY_WINDOW
+    snap.msg = [d["msg"] for d in days]
+    snap.kw = [d["kw"] for d in days[:KW_WINDOW]]
+    snap.hours = [d["hours"] for d in days[:HOUR_WINDOW]]
+    snap.edits_today = days[0]["edit"]
+    snap.long_deletes_today = days[0]["del_long"]
+
+    snap.sentiment = [_int_map(h) for h in res[pos:pos + SENTIMENT_WINDOW]]
+    pos += SENTIMENT_WINDOW
+
+    snap.daily_totals = [int(s) if s else 0 for s in res[pos:pos + activity_days]]
+    pos += activity_days
+
+    join_ts, first_msg, diary_len, staff_resp = res[pos:pos + 4]
+    snap.join_ts = int(join_ts) if join_ts else None
+    snap.first_msg = first_msg or {}
+    snap.diary_unanswered = int(diary_len or 0)
+    snap.staff_response = int(staff_resp) if staff_resp else None
+    return snap
@@ -4,14 +4,32 @@ import json
 import time
 import math
 import logging
+from typing import Dict, List, Optional, Set
 from shared.python.redis_client import get_redis_client
+from shared.python.reputation_graph import RepGraph, analyze, load_graph
 from shared.python.config import config
 
 logger = logging.getLogger("ReputationEngine")
 
+# Written by the Go core on every /rep give (services/core/internal/reputation)
+def K_TOTAL(uid):             return f"rep:total:{uid}"
+def K_GIVERS(uid):            return f"rep:givers:{uid}"
+def K_GIVER_COUNTS(uid):      return f"rep:giver_counts:{uid}"   # hash giver -> count
+def K_EVENTS(uid):            return f"rep:events:{uid}"
+def K_DIRTY(gid):             return f"rep:dirty:{gid}"          # users needing a recalculation
+def K_LEADERBOARD(gid):       return f"rep:leaderboard:{gid}"
+def K_TRUST_LEADERBOARD(gid): return f"rep:trust_leaderboard:{gid}"
+def K_PROFILE(uid):           return f"rep:profile:{uid}"
+def K_GRAPH(gid):             return f"rep:graph:{gid}"          # hash uid -> graph signals (JSON)
+def K_INDEX_READY(gid):       return f"rep:giver_index:{gid}"
+
+BATCH_SIZE = 500  # users recalculated per pipelined batch
+
+
 class ReputationEngine(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self._indexed: Set[str] = set()
         self.recalculation_task.start()
 
     def cog_unload(self):
@@ -19,109 +37,187 @@ class ReputationEngine(commands.Cog):
 
     @tasks.loop(minutes=10)
     async def recalculation_task(self):
-        """Periodically recaliculates Trust Scores and identifies abuse patterns across all guilds."""
+        """Recalculates Trust Scores of users whose reputation changed since the last pass."""
         r = await get_redis_client()
         try:
-            # 1. Get all guilds the bot is in
             guild_ids = await r.smembers("bot:guilds")
             for gid in guild_ids:
-                # 2. Identify active users in the reputation system for this guild
-                # We can use the leaderboard ZSET to find relevant users
-                lb_key = f"rep:leaderboard:{gid}"
-                active_users = await r.zrange(lb_key, 0, -1)
-                
-                for uid in active_users:
-                    try:
-                        await self.calculate_user_trust(r, gid, uid)
-                    except Exception as e:
-                        logger.error(f"Error calculating trust for user {uid} in guild {gid}: {e}")
+                try:
+                    await self.ensure_giver_index(r, gid)
+                    updated = await self.recalculate_dirty(r, gid)
+                    if updated:
+                        logger.info(f"Recalculated trust of {updated} users in guild {gid}")
+                except Exception as e:
+                    logger.error(f"Trust recalculation error in guild {gid}: {e}")
         except Exception as e:
             logger.error(f"Reputation recalculation loop error: {e}")
         finally:
             await r.aclose()
 
-    async def calculate_user_trust(self, r, guild_id, user_id):
-        """Calculates a trust score based on unique givers, weighted rep, and donor concentration."""
-        
-        # Keys
-        events_key = f"rep:events:{user_id}"
-        givers_key = f"rep:givers:{user_id}"
-        profile_key = f"rep:profile:{user_id}"
-        
-        # 1. Fetch data
-        # Fetch unique givers count
-        unique_givers_count = await r.scard(givers_key)
-        if unique_givers_count == 0:
+    async def ensure_giver_index(self, r, guild_id):
+        """
+        One-off bootstrap of rep:giver_counts from the rep:events lists, for
+        data written before the Go core maintained them. Marks every user of
+        the guild dirty so the next pass recalculates all of them.
+        """
+        gid = str(guild_id)
+        if gid in self._indexed:
             return
+        if await r.exists(K_INDEX_READY(gid)):
+            self._indexed.add(gid)
+            return
+
+        users = await r.zrange(K_LEADERBOARD(gid), 0, -1)
+        for start in range(0, len(users), BATCH_SIZE):
+            chunk = users[start:start + BATCH_SIZE]
+            pipe = r.pipeline()
+            for uid in chunk:
+                pipe.lrange(K_EVENTS(uid), 0, -1)
+            event_lists = await pipe.execute()
+
+            pipe = r.pipeline()
+            for uid, events_raw in zip(chunk, event_lists):
+                counts: Dict[str, int] = {}
+                for raw in events_raw:
+                    giver_id = json.loads(raw).get("giver_id")
+                    if giver_id:
+                        counts[giver_id] = counts.get(giver_id, 0) + 1
+                pipe.delete(K_GIVER_COUNTS(uid))
+                if counts:
+                    pipe.hset(K_GIVER_COUNTS(uid), mapping=counts)
+            if chunk:
+                pipe.sadd(K_DIRTY(gid), *chunk)
+            await pipe.execute()
+
+        await r.set(K_INDEX_READY(gid), int(time.time()))
+        self._indexed.add(gid)
+        logger.info(f"Built reputation giver index for guild {gid}: {len(users)} users")
+
+    async def recalculate_dirty(self, r, guild_id) -> int:
+        """
+        Drains rep:dirty:{gid} and recalculates those users, everyone they gave
+        reputation to (whose giver weights changed with their total) and
+        everyone whose graph signals changed. A quiet cycle is a single SPOP.
+        """
+        key = K_DIRTY(guild_id)
+        dirty: Set[str] = set()
+        while True:
+            popped = await r.spop(key, BATCH_SIZE)
+            if not popped:
+                break
+            dirty.update(popped)
+        if not dirty:
+            return 0
+        try:
+            return await self.recalculate(r, guild_id, dirty)
+        except Exception:
+            # Keep them for the next cycle
+            await r.sadd(key, *dirty)
+            raise
+
+    async def recalculate(self, r, guild_id, changed: Optional[Set[str]] = None) -> int:
+        """
+        One pass over the guild's reputation graph. With `changed` only the
+        affected users are rescored, otherwise everyone. Returns the number of
+        profiles written.
+        """
+        started = time.perf_counter()
+        graph = await load_graph(r, await r.zrange(K_LEADERBOARD(guild_id), 0, -1))
+        signals = analyze(graph)
+        encoded = {uid: json.dumps(row, sort_keys=True) for uid, row in signals.items()}
+
+        if changed is None:
+            users = set(signals)
+        else:
+            previous = await r.hgetall(K_GRAPH(guild_id))
+            users = set(changed)
+            for uid in changed:
+                users.update(graph.receivers(uid))
+            users.update(uid for uid in encoded.keys() | previous.keys() if encoded.get(uid) != previous.get(uid))
+
+        written = 0
+        user_list = sorted(users)
+        for start in range(0, len(user_list), BATCH_SIZE):
+            written += await self._calculate_batch(r, guild_id, user_list[start:start + BATCH_SIZE], graph, signals)
 
-        # Fetch last 100 events
-        events_raw = await r.lrange(events_key, 0, -1)
-        events = [json.loads(e) for e in events_raw]
-        
-        # 2. Weighted Reputation Calculation
-        total_weighted_rep = 0.0
-        donor_counts = {}
-        
-        for ev in events:
-            giver_id = ev.get("giver_id")
-            if not giver_id: continue
-            
-            # Get giver's reputation for weighting
-            giver_rep_raw = await r.get(f"rep:total:{giver_id}")
-            giver_rep = int(giver_rep_raw) if giver_rep_raw else 0
-            
-            # Weight formula: log10(rep + 10) * base_multiplier
+        pipe = r.pipeline()
+        pipe.delete(K_GRAPH(guild_id))
+        if encoded:
+            pipe.hset(K_GRAPH(guild_id), mapping=encoded)
+        await pipe.execute()
+
+        rings = {(row["ring_size"], row["ring_density"]) for row in signals.values() if row["ring_size"]}
+        logger.info(f"Reputation graph of guild {guild_id}: {len(graph.nodes)} users, {len(graph.src)} edges, "
+                    f"{len(rings)} rings, {written} rescored in {time.perf_counter() - started:.2f}s")
+        return written
+
+    async def _calculate_batch(self, r, guild_id, user_ids: List[str], graph: RepGraph, signals: Dict[str, Dict]) -> int:
+        """Trust score from unique givers, weighted rep, donor concentration and the graph signals, for one batch."""
+        users = [(uid, graph.donors(uid)) for uid in user_ids]
+        users = [(uid, donor_counts) for uid, donor_counts in users if donor_counts]
+        if not users:
+            return 0
+
+        # Unique givers of every user and every giver's total (one MGET), in one round-trip
+        givers = sorted({g for _, donor_counts in users for g in donor_counts})
+        pipe = r.pipeline()
+        for uid, _ in users:
+            pipe.scard(K_GIVERS(uid))
+        pipe.mget([K_TOTAL(g) for g in givers])
+        results = await pipe.execute()
+        giver_totals = {g: int(v) if v else 0 for g, v in zip(givers, results[-1])}
+
+        pipe = r.pipeline()
+        now = int(time.time())
+        for (uid, donor_counts), unique_givers_count in zip(users, results):
+            unique_givers_count = unique_givers_count or len(donor_counts)
+            graph_row = signals.get(uid, {})
+
+            # Weight formula: log10(rep + 10) per received point
             # Someone with 100 rep gives ~2x weight of someone with 0 rep.
-            weight = math.log10(giver_rep + 10)
-            total_weighted_rep += weight
-            
-            # Donor concentration tracking
-            donor_counts[giver_id] = donor_counts.get(giver_id, 0) + 1
-
-        # 3. Abuse Detection
-        # A. Donor Concentration: One person giving too many scores
-        max_from_one = max(donor_counts.values()) if donor_counts else 0
-        concentration_ratio = max_from_one / len(events) if events else 0
-        
-        abuse_score = 0.0
-        if concentration_ratio > 0.4: # More than 40% from one person
-            abuse_score += (concentration_ratio - 0.4) * 5
-            
-        # B. Clique Detection (Reciprocity)
-        # Check if the user also gave rep back to top givers recently
-        top_donors = sorted(donor_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-        for donor_id, count in top_donors:
-            donor_events_key = f"rep:events:{donor_id}"
-            donor_events_raw = await r.lrange(donor_events_key, 0, 50) # check last 50
-            gave_back = any(json.loads(e).get("giver_id") == user_id for e in donor_events_raw)
-            if gave_back and count > 2:
-                abuse_score += 1.0 # Reciprocal giving penalty
-
-        # 4. Final Trust Score Formula
-        # (Total Weighted Rep * log(unique_givers + 1)) / (1 + abuse_score)
-        # log increases trust as more unique people recognize the user.
-        social_multiplier = math.log(unique_givers_count + 1, 2)
-        trust_score = (total_weighted_rep * social_multiplier) / (1 + abuse_score)
-        
-        # 5. Determine Rank
-        rank = "New Member"
-        if trust_score > 50: rank = "Trusted Legend"
-        elif trust_score > 25: rank = "Master Helper"
-        elif trust_score > 10: rank = "Active Helper"
-        elif trust_score > 2: rank = "Contributor"
-
-        # 6. Save to Profile Hash
-        await r.hset(profile_key, mapping={
-            "trust_score": str(round(trust_score, 2)),
-            "abuse_score": str(round(abuse_score, 2)),
-            "rank": rank,
-            "unique_givers": unique_givers_count,
-            "weighted_rep": str(round(total_weighted_rep, 2)),
-            "last_recalc": int(time.time())
-        })
-        
-        # Add to trust leaderboard
-        await r.zadd(f"rep:trust_leaderboard:{guild_id}", {user_id: trust_score})
+            total_weighted_rep = sum(count * math.log10(giver_totals[g] + 10) for g, count in donor_counts.items())
+
+            # 3. Abuse Detection
+            # A. Donor Concentration: One person giving too many scores
+            concentration_ratio = max(donor_counts.values()) / sum(donor_counts.values())
+
+            abuse_score = 0.0
+            if concentration_ratio > 0.4: # More than 40% from one person
+                abuse_score += (concentration_ratio - 0.4) * 5
+
+            # B. Clique Detection (Reciprocity): gave rep back to a top giver
+            abuse_score += 1.0 * graph_row.get("reciprocal_donors", 0) # Reciprocal giving penalty
+
+            # C. Rings of three or more users feeding each other
+            abuse_score += graph_row.get("ring_penalty", 0.0)
+
+            # 4. Final Trust Score Formula
+            # (Total Weighted Rep * log(unique_givers + 1)) / (1 + abuse_score)
+            # log increases trust as more unique people recognize the user.
+            social_multiplier = math.log(unique_givers_count + 1, 2)
+            trust_score = (total_weighted_rep * social_multiplier) / (1 + abuse_score)
+
+            # 5. Determine Rank
+            rank = "New Member"
+            if trust_score > 50: rank = "Trusted Legend"
+            elif trust_score > 25: rank = "Master Helper"
+            elif trust_score > 10: rank = "Active Helper"
+            elif trust_score > 2: rank = "Contributor"
+
+            # 6. Save to Profile Hash and the trust leaderboard
+            pipe.hset(K_PROFILE(uid), mapping={
+                "trust_score": str(round(trust_score, 2)),
+                "abuse_score": str(round(abuse_score, 2)),
+                "rank": rank,
+                "unique_givers": unique_givers_count,
+                "weighted_rep": str(round(total_weighted_rep, 2)),
+                "reciprocity": str(graph_row.get("reciprocity", 0.0)),
+                "ring_size": graph_row.get("ring_size", 0),
+                "last_recalc": now
+            })
+            pipe.zadd(K_TRUST_LEADERBOARD(guild_id), {uid: trust_score})
+        await pipe.execute()
+        return len(users)
 
     @commands.group(name="rep_admin")
     @commands.has_permissions(administrator=True)
@@ -136,11 +232,9 @@ class ReputationEngine(commands.Cog):
         await ctx.send("⏳ Spouštím přepočet reputačních skóre...")
         r = await get_redis_client()
         try:
-            lb_key = f"rep:leaderboard:{ctx.guild.id}"
-            active_users = await r.zrange(lb_key, 0, -1)
-            for uid in active_users:
-                await self.calculate_user_trust(r, ctx.guild.id, uid)
-            await ctx.send(f"✅ Přepočteno {len(active_users)} uživatelů.")
+            await self.ensure_giver_index(r, ctx.guild.id)
+            written = await self.recalculate(r, ctx.guild.id)
+            await ctx.send(f"✅ Přepočteno {written} uživatelů.")
         finally:
             await r.aclose()
 
@@ -37,7 +37,7 @@ import discord
 from discord.ext import commands, tasks
 from shared.python.config import config
 import redis.asyncio as redis
-from shared.python.redis_client import get_redis_client
+from shared.python.redis_client import get_redis_client, publish_redis_stats, close_redis
 
 
 def ts() -> str:
@@ -209,6 +209,14 @@ async def heartbeat_task():
         if r:
             await r.aclose()
 
+@tasks.loop(seconds=60)
+async def redis_stats_task():
+    """Publishes per-call-site Redis counters (redis:callsites:worker)."""
+    try:
+        await publish_redis_stats("worker")
+    except Exception as e:
+        print(f"[{ts()}] [ERROR] Redis stats publish failed: {e}")
+
 @heartbeat_task.before_loop
 async def before_heartbeat_task():
     pass
@@ -233,7 +241,7 @@ async def on_ready():
 
     r = None
     try:
-        r = redis.from_url(config.REDIS_URL, decode_responses=True)
+        r = await get_redis_client()
         idx_key = "bot:guilds:worker"
         await r.delete(idx_key)
         if guilds:
@@ -286,7 +294,7 @@ async def on_guild_join(guild: discord.Guild):
 
     r = None
     try:
-        r = redis.from_url(config.REDIS_URL, decode_responses=True)
+        r = await get_redis_client()
         idx_key = "bot:guilds:worker"
 
         await r.sadd(idx_key, str(guild.id))
@@ -305,7 +313,7 @@ async def on_guild_remove(guild: discord.Guild):
 
     r = None
     try:
-        r = redis.from_url(config.REDIS_URL, decode_responses=True)
+        r = await get_redis_client()
         idx_key = "bot:guilds:worker"
 
         await r.srem(idx_key, str(guild.id))
@@ -354,9 +362,13 @@ async def main():
     await r_lock.aclose()
 
     refresh_instance_lock_task.start()
+    redis_stats_task.start()
     print(ts(), "✅ Instance lock acquired (Worker)")
 
-    await bot.start(token)
+    try:
+        await bot.start(token)
+    finally:
+        await close_redis()
 
 
 if __name__ == "__main__":
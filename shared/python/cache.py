@@ -0,0 +1,523 @@
+"""
+Two-tier result cache for expensive async functions (dashboard aggregations).
+
+  L1  per-process LRU of serialized results, bounded by CACHE_L1_MAX_BYTES
+  L2  Redis, cache:{function}:{arguments}, shared by every process
+
+An entry is fresh for `ttl` seconds. After that it is served stale for up to
+`stale` more seconds while a single background task recomputes it
+(stale-while-revalidate), so a hot key never makes a request wait for the
+recomputation. A key missing from both tiers is computed once: concurrent
+callers in the process await the same task (single-flight), and a short
+Redis lock (SET NX) makes other processes poll for that result instead of
+recomputing it too.
+
+Versioned namespaces: writers count their writes per guild and data family
+in cache_version:{gid} (note_cache_write()). A cached function declares the
+families it reads (@cached(families=...)):
+
+  config      part of the key (with the global config:weights_version), so
+              a settings change is a miss and takes effect immediately
+  messages,   stored with the entry; a newer version makes the entry stale
+  voice,      (served once more while it is refreshed), but not before it
+  actions,    is VERSION_MIN_AGE old, so a busy guild recomputes a key at
+  patterns    most that often
+
+A range that ended before today (UTC, end_date) can only change with config
+and never goes stale by age; its Redis entry just expires after
+IDLE_EXPIRE without reads.
+
+Results are serialized with orjson when it is installed (json otherwise) and
+deserialized on every hit, so callers may mutate what they get back.
+
+cache_stats() returns per-function hits, misses and compute times, and
+observe_cache() hooks every lookup (the dashboard counts them per request).
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import inspect
+import json
+import os
+import struct
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, timezone
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from shared.python.redis_client import get_redis, get_redis_binary
+
+try:
+    import orjson
+
+    def dumps(value) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+    loads = orjson.loads
+except ImportError:
+    def dumps(value) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    loads = json.loads
+
+
+L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", str(64 * 1024 * 1024)))
+LOCK_TTL_MS = 30_000    # a crashed computation blocks other processes at most this long
+LOCK_POLL = 0.05        # seconds between checks while another process computes
+MAX_KEY_LENGTH = 200    # longer argument lists are hashed
+IDLE_EXPIRE = 30 * 86400  # Redis expiry of entries without a ttl, renewed on every L2 read
+
+FAMILIES = ("messages", "voice", "actions", "patterns", "config")
+VERSION_CHECK_INTERVAL = 1.0  # seconds a process reuses the versions it read
+VERSION_MIN_AGE = 10          # seconds before a data write makes an entry stale
+
+# computed-at timestamp and version length in front of every L2 value, then the version
+_HEADER = struct.Struct("<dB")
+
+
+def K_ENTRY(key: str) -> str:         return f"cache:{key}"
+def K_LOCK(key: str) -> str:          return f"cache:lock:{key}"
+def K_CACHE_VERSION(gid) -> str:      return f"cache_version:{gid}"   # hash family -> write count
+K_GLOBAL_CONFIG_VERSION = "config:weights_version"
+
+
+# ─── Metrics ─────────────────────────────────────────────────────────
+
+class _FuncStats:
+    __slots__ = ("l1_hits", "l2_hits", "stale_hits", "joined", "misses", "computes", "errors",
+                 "compute_ms", "max_compute_ms")
+
+    def __init__(self):
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.stale_hits = 0
+        self.joined = 0
+        self.misses = 0
+        self.computes = 0
+        self.errors = 0
+        self.compute_ms = 0.0
+        self.max_compute_ms = 0.0
+
+    def as_dict(self) -> Dict:
+        hits = self.l1_hits + self.l2_hits + self.stale_hits + self.joined
+        lookups = hits + self.misses
+        return {
+            "lookups": lookups,
+            "hit_ratio": round(hits / lookups, 3) if lookups else None,
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "stale_hits": self.stale_hits,
+            "joined": self.joined,
+            "misses": self.misses,
+            "computes": self.computes,
+            "errors": self.errors,
+            "avg_compute_ms": round(self.compute_ms / self.computes, 1) if self.computes else None,
+            "max_compute_ms": round(self.max_compute_ms, 1),
+        }
+
+
+_stats: Dict[str, _FuncStats] = defaultdict(_FuncStats)
+_observers: List[Callable] = []
+
+
+def observe_cache(callback: Callable):
+    """
+    Call callback(name, outcome) on every lookup, in the caller's context.
+    outcome is "l1", "l2", "stale", "joined" (awaited a computation already
+    running) or "miss".
+    """
+    _observers.append(callback)
+
+
+def _observe(name: str, outcome: str):
+    stats = _stats[name]
+    if outcome == "l1":
+        stats.l1_hits += 1
+    elif outcome == "l2":
+        stats.l2_hits += 1
+    elif outcome == "stale":
+        stats.stale_hits += 1
+    elif outcome == "joined":
+        stats.joined += 1
+    else:
+        stats.misses += 1
+    for callback in _observers:
+        callback(name, outcome)
+
+
+def cache_stats(top: Optional[int] = None) -> Dict[str, Dict]:
+    """Per function counters, most lookups first."""
+    rows = sorted(_stats.items(), key=lambda kv: kv[1].as_dict()["lookups"], reverse=True)
+    return {name: s.as_dict() for name, s in rows[:top]}
+
+
+def reset_cache_stats():
+    _stats.clear()
+
+
+# ─── L1 ──────────────────────────────────────────────────────────────
+
+class _LRU:
+    """key -> (computed_at, version, payload), evicted by total payload size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, computed_at: float, version: str, payload: bytes):
+        self.pop(key)
+        if len(payload) > self.max_bytes // 8:
+            return  # one huge result would flush everything else
+        self._entries[key] = (computed_at, version, payload)
+        self.size += len(payload)
+        while self.size > self.max_bytes:
+            _, (_, _, old) = self._entries.popitem(last=False)
+            self.size -= len(old)
+
+    def pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[2])
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+
+_l1 = _LRU(L1_MAX_BYTES)
+_inflight: Dict[str, asyncio.Task] = {}  # key -> running computation
+
+
+def clear_local():
+    """Drop this process's L1 and version memo (benchmarks, tests)."""
+    _l1.clear()
+    _versions.clear()
+
+
+# ─── Lookup ──────────────────────────────────────────────────────────
+
+def _state(entry, ttl: Optional[int], stale: int, version: str) -> Optional[str]:
+    """"fresh", "stale", or None when the entry is too old to serve."""
+    computed_at, entry_version, _ = entry
+    age = time.time() - computed_at
+    if ttl is not None:
+        if age >= ttl + stale:
+            return None
+        if age >= ttl:
+            return "stale"
+    if entry_version != version and age >= VERSION_MIN_AGE:
+        return "stale"
+    return "fresh"
+
+
+def _pack(computed_at: float, version: str, payload: bytes) -> bytes:
+    encoded = version.encode()
+    return _HEADER.pack(computed_at, len(encoded)) + encoded + payload
+
+
+def _unpack(raw: Optional[bytes]):
+    """(computed_at, version, payload) of an L2 value, or None."""
+    if not raw or len(raw) <= _HEADER.size:
+        return None
+    computed_at, length = _HEADER.unpack_from(raw)
+    start = _HEADER.size + length
+    return computed_at, raw[_HEADER.size:start].decode(), raw[start:]
+
+
+async def _read_l2(r, key: str, ttl: Optional[int]):
+    try:
+        if ttl is None:
+            return _unpack(await r.getex(K_ENTRY(key), ex=IDLE_EXPIRE))
+        return _unpack(await r.get(K_ENTRY(key)))
+    except Exception as e:
+        print(f"Cache read failed for {key}: {e}")
+        return None
+
+
+async def _wait_for_other(r, key: str, deadline: float, ttl: Optional[int], stale: int, version: str):
+    """Poll while another process holds the lock; its fresh result, or None to compute here."""
+    while time.time() < deadline:
+        await asyncio.sleep(LOCK_POLL)
+        try:
+            pipe = r.pipeline(transaction=False)
+            pipe.get(K_ENTRY(key))
+            pipe.exists(K_LOCK(key))
+            raw, locked = await pipe.execute()
+        except Exception:
+            return None
+        entry = _unpack(raw)
+        if entry is not None and _state(entry, ttl, stale, version) == "fresh":
+            return entry
+        if not locked:
+            return None
+    return None
+
+
+async def _fill(name: str, key: str, compute: Callable[[], Awaitable], ttl: Optional[int], stale: int,
+                cache_if: Optional[Callable[[Any], bool]], version: str, check_l2: bool):
+    """
+    (value, payload, outcome): the usable L2 entry ("l2"/"stale") when
+    check_l2, otherwise computed here or by another process and stored in
+    both tiers ("miss").
+    """
+    r = await get_redis_binary()
+    try:
+        if check_l2:
+            entry = await _read_l2(r, key, ttl)
+            state = _state(entry, ttl, stale, version) if entry is not None else None
+            if state is not None:
+                _l1.set(key, *entry)
+                return None, entry[2], "l2" if state == "fresh" else "stale"
+
+        locked = True
+        try:
+            locked = bool(await r.set(K_LOCK(key), b"1", nx=True, px=LOCK_TTL_MS))
+        except Exception as e:
+            print(f"Cache lock failed for {key}: {e}")
+        if not locked:
+            entry = await _wait_for_other(r, key, time.time() + LOCK_TTL_MS / 1000, ttl, stale, version)
+            if entry is not None:
+                _l1.set(key, *entry)
+                return None, entry[2], "miss"
+
+        stats = _stats[name]
+        computed_at = time.time()
+        started = time.perf_counter()
+        try:
+            value = await compute()
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            stats.computes += 1
+            stats.compute_ms += elapsed_ms
+            stats.max_compute_ms = max(stats.max_compute_ms, elapsed_ms)
+
+        payload = None
+        if value is not None and (cache_if is None or cache_if(value)):
+            try:
+                payload = dumps(value)
+            except (TypeError, ValueError) as e:
+                print(f"Failed to cache {name}: {e}")
+        try:
+            pipe = r.pipeline(transaction=False)
+            if payload is not None:
+                pipe.set(K_ENTRY(key), _pack(computed_at, version, payload),
+                         ex=IDLE_EXPIRE if ttl is None else ttl + stale)
+                _l1.set(key, computed_at, version, payload)
+            if locked:
+                pipe.delete(K_LOCK(key))
+            await pipe.execute()
+        except Exception as e:
+            print(f"Failed to cache {name}: {e}")
+        return value, payload, "miss"
+    finally:
+        await r.aclose()
+
+
+def _start(name, key, compute, ttl, stale, cache_if, version, background: bool = False) -> asyncio.Task:
+    """
+    Run _fill as its own task, registered in _inflight until done, so a
+    cancelled caller (client disconnect) does not cancel the callers that
+    joined it.
+    """
+    coro = _fill(name, key, compute, ttl, stale, cache_if, version, check_l2=not background)
+    if background:
+        # A fresh context: the refresh must not count against the request that noticed it
+        task = contextvars.Context().run(asyncio.ensure_future, coro)
+    else:
+        task = asyncio.ensure_future(coro)
+    _inflight[key] = task
+
+    def done(t: asyncio.Task):
+        if _inflight.get(key) is t:
+            del _inflight[key]
+        if not t.cancelled() and t.exception() is not None:
+            _stats[name].errors += 1
+            if background:
+                print(f"Background refresh of {name} failed: {t.exception()}")
+
+    task.add_done_callback(done)
+    return task
+
+
+async def get_or_compute(name: str, key: str, compute: Callable[[], Awaitable], ttl: Optional[int] = 300,
+                         stale: Optional[int] = None, cache_if: Optional[Callable[[Any], bool]] = None,
+                         version: str = ""):
+    """
+    Result of `await compute()`, cached under `key`. name groups the metrics
+    (the function name). ttl=None never goes stale by age; stale defaults
+    to ttl. An entry stored with another `version` is stale once it is
+    VERSION_MIN_AGE old. Results that are None or fail cache_if(result) are
+    returned without being cached.
+    """
+    stale = (ttl or 0) if stale is None else stale
+
+    entry = _l1.get(key)
+    state = _state(entry, ttl, stale, version) if entry is not None else None
+    if state is not None:
+        _observe(name, "l1" if state == "fresh" else "stale")
+        if state == "stale" and key not in _inflight:
+            _start(name, key, compute, ttl, stale, cache_if, version, background=True)
+        return loads(entry[2])
+
+    # Concurrent callers share one L2 read and, on a miss, one computation
+    task = _inflight.get(key)
+    if task is not None:
+        _observe(name, "joined")
+        value, payload, _ = await asyncio.shield(task)
+    else:
+        try:
+            value, payload, outcome = await asyncio.shield(
+                _start(name, key, compute, ttl, stale, cache_if, version))
+        except Exception:
+            _observe(name, "miss")
+            raise
+        _observe(name, outcome)
+        if outcome == "stale" and key not in _inflight:
+            _start(name, key, compute, ttl, stale, cache_if, version, background=True)
+    return loads(payload) if payload is not None else value
+
+
+# ─── Versions ────────────────────────────────────────────────────────
+
+_versions: Dict[str, tuple] = {}  # gid -> (read at, {family: version})
+_version_reads: Dict[str, asyncio.Task] = {}
+
+
+def note_cache_write(pipe, gid, *families: str):
+    """Queue version bumps of `families` of guild gid on the writer's pipeline."""
+    for family in families:
+        pipe.hincrby(K_CACHE_VERSION(gid), family, 1)
+    _versions.pop(str(gid), None)
+
+
+async def bump_cache_version(r, gid, *families: str):
+    """note_cache_write() for writers without a pipeline."""
+    pipe = r.pipeline(transaction=False)
+    note_cache_write(pipe, gid, *families)
+    await pipe.execute()
+
+
+async def _read_versions(gid: str) -> Dict[str, str]:
+    r = await get_redis()
+    try:
+        pipe = r.pipeline(transaction=False)
+        pipe.hmget(K_CACHE_VERSION(gid), list(FAMILIES))
+        pipe.get(K_GLOBAL_CONFIG_VERSION)
+        values, global_config = await pipe.execute()
+    finally:
+        await r.aclose()
+    versions = {f: v or "0" for f, v in zip(FAMILIES, values)}
+    versions["config"] = f"{versions['config']}.{global_config or 0}"
+    _versions[gid] = (time.monotonic(), versions)
+    return versions
+
+
+async def cache_versions(gid) -> Dict[str, str]:
+    """
+    {family: version} of guild gid, "config" including the global one. Read
+    at most once per VERSION_CHECK_INTERVAL, by one task for all callers.
+    """
+    gid = str(gid)
+    memo = _versions.get(gid)
+    if memo is not None and time.monotonic() - memo[0] < VERSION_CHECK_INTERVAL:
+        return memo[1]
+    task = _version_reads.get(gid)
+    if task is None:
+        task = _version_reads[gid] = asyncio.ensure_future(_read_versions(gid))
+
+        def done(t: asyncio.Task):
+            _version_reads.pop(gid, None)
+            if not t.cancelled():
+                t.exception()  # retrieved; the callers re-raise it
+
+        task.add_done_callback(done)
+    return await asyncio.shield(task)
+
+
+def is_finalized(end_date) -> bool:
+    """Does a range ending at end_date (YYYY-MM-DD or a date) lie entirely before today (UTC)?"""
+    if end_date is None:
+        return False
+    return str(end_date)[:10] < datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+async def get_versioned(name: str, key: str, compute: Callable[[], Awaitable], gid, families: Sequence[str],
+                        ttl: int = 300, stale: Optional[int] = None,
+                        cache_if: Optional[Callable[[Any], bool]] = None, finalized: bool = False):
+    """get_or_compute() in the versioned namespace of guild gid (see the module docstring)."""
+    try:
+        versions = await cache_versions(gid)
+    except Exception as e:
+        print(f"Cache version read failed for {gid}: {e}")
+        return await compute()
+    key = f"{key}:v{versions['config']}"
+    if finalized:
+        return await get_or_compute(name, key, compute, ttl=None, cache_if=cache_if)
+    version = ".".join(versions[f] for f in families if f != "config")
+    return await get_or_compute(name, key, compute, ttl, stale, cache_if, version)
+
+
+# ─── Decorator ───────────────────────────────────────────────────────
+
+_KEY_TYPES = (str, int, float, bool, type(None))
+
+
+def _key_part(value) -> Optional[str]:
+    if isinstance(value, _KEY_TYPES):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)) and all(isinstance(v, _KEY_TYPES) for v in value):
+        return ",".join(str(v) for v in value)
+    return None  # clients, requests: not part of the key
+
+
+def make_key(name: str, args: tuple, kwargs: dict) -> str:
+    parts = [p for p in map(_key_part, args) if p is not None]
+    parts += [f"{k}={p}" for k, p in ((k, _key_part(v)) for k, v in sorted(kwargs.items())) if p is not None]
+    raw = ":".join(parts)
+    if len(raw) > MAX_KEY_LENGTH:
+        raw = hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+    return f"{name}:{raw}"
+
+
+def cached(ttl: int = 300, stale: Optional[int] = None, cache_if: Optional[Callable[[Any], bool]] = None,
+           families: Optional[Sequence[str]] = None):
+    """
+    Cache an async function by its primitive arguments (str/int/float/bool/
+    None, dates and lists of those; anything else, such as a Redis client,
+    is left out of the key). See get_or_compute() for ttl, stale and
+    cache_if. With `families` the entry lives in the versioned namespace of
+    the guild_id (or gid, or first of guild_ids) argument, and a range whose
+    end_date argument is before today is kept until config changes.
+    """
+    def decorator(func):
+        name = func.__name__
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = make_key(name, args, kwargs)
+            call = lambda: func(*args, **kwargs)
+            if families is not None:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                params = bound.arguments
+                gid = params.get("guild_id", params.get("gid", params.get("guild_ids")))
+                if isinstance(gid, (list, tuple)):
+                    gid = gid[0] if gid else None
+                if gid is not None:
+                    return await get_versioned(name, key, call, gid, families, ttl, stale, cache_if,
+                                               finalized=is_finalized(params.get("end_date")))
+            return await get_or_compute(name, key, call, ttl, stale, cache_if)
+        return wrapper
+    return decorator
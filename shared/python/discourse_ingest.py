@@ -0,0 +1,114 @@
+"""
+Incremental ingestion of Discourse posts into the pattern signals of the
+synthetic guild 999.
+
+Discourse posts go through the same writer as Discord messages
+(pattern_logic.queue_message_signals: pat:day rollup, pat:last_act,
+pat:active, pat:first_msg, pat:user_join) plus stats:user_daily, so
+PatternScanner scans Discourse users exactly like Discord members.
+
+DiscourseIngester keeps a post-id watermark in Redis and on every cycle
+pages through posts with a larger id only. The counters of a page and the
+new watermark are written in one MULTI/EXEC, so a crash never counts a
+page twice. Without a watermark the ingester starts at the current newest
+post; history is loaded once with scripts/backfill_discourse_patterns.py,
+which stops at the watermark.
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+from .cache import note_cache_write
+from .pattern_logic import PAT_TTL, queue_message_signals
+
+logger = logging.getLogger("DiscourseIngest")
+
+DISCOURSE_GID = 999
+K_INGEST_WATERMARK = "discourse:ingest:last_post_id"
+
+PAGE_SIZE = 500
+MAX_PAGES = 20  # per cycle; a larger backlog continues next cycle
+STAFF_REFRESH = 600  # seconds
+
+
+def _epoch(ts: datetime) -> int:
+    """Discourse timestamps are naive UTC."""
+    return int(ts.replace(tzinfo=timezone.utc).timestamp())
+
+
+def record_post(pipe, uid: int, text: str, ts: datetime, *, is_reply: bool = False,
+                joined_at: Optional[datetime] = None, post_id: Optional[int] = None,
+                gid: int = DISCOURSE_GID) -> int:
+    """Queue the pattern signals of one non-staff post on a Redis pipeline; returns its keyword hits."""
+    date_str = ts.strftime("%Y%m%d")
+    total_hits = queue_message_signals(
+        pipe, gid, uid, text, date_str, _epoch(ts), ts.hour, is_reply=is_reply, msg_id=post_id,
+        joined_ts=_epoch(joined_at) if joined_at is not None else None,
+    )
+
+    # Activity index read by the scanner and the snapshot
+    daily_idx = f"stats:user_daily:{gid}:{date_str}"
+    pipe.zincrby(daily_idx, 1, str(uid))
+    pipe.expire(daily_idx, PAT_TTL)
+    return total_hits
+
+
+class DiscourseIngester:
+    def __init__(self, db, get_redis, page_size: int = PAGE_SIZE):
+        self.db = db
+        self.get_redis = get_redis
+        self.page_size = page_size
+        self._staff: Set[int] = set()
+        self._staff_at = 0.0
+
+    async def _staff_ids(self) -> Set[int]:
+        if time.monotonic() - self._staff_at > STAFF_REFRESH:
+            self._staff = await self.db.staff_ids()
+            self._staff_at = time.monotonic()
+        return self._staff
+
+    async def run_once(self, max_pages: int = MAX_PAGES) -> Dict[str, int]:
+        """Ingest posts newer than the watermark, at most max_pages pages."""
+        counts = {"posts": 0, "skipped": 0, "pages": 0, "watermark": 0}
+        r = await self.get_redis()
+        try:
+            mark = await r.get(K_INGEST_WATERMARK)
+            if mark is None:
+                start = await self.db.max_post_id()
+                # NX: a concurrent backfill or ingester may have set it meanwhile
+                await r.set(K_INGEST_WATERMARK, start, nx=True)
+                logger.info(f"Discourse ingest starts after post {start}")
+                counts["watermark"] = start
+                return counts
+
+            last_id = int(mark)
+            staff = await self._staff_ids()
+            for _ in range(max_pages):
+                rows = await self.db.posts_after(last_id, self.page_size)
+                if not rows:
+                    break
+                pipe = r.pipeline(transaction=True)
+                for row in rows:
+                    uid = int(row["user_id"])
+                    if uid in staff:
+                        counts["skipped"] += 1
+                        continue
+                    record_post(
+                        pipe, uid, row["raw"] or "", row["created_at"],
+                        is_reply=bool(row.get("reply_to_post_number")),
+                        joined_at=row.get("user_created_at"), post_id=int(row["id"]),
+                    )
+                    counts["posts"] += 1
+                last_id = int(rows[-1]["id"])
+                pipe.set(K_INGEST_WATERMARK, last_id)
+                note_cache_write(pipe, DISCOURSE_GID, "patterns")
+                await pipe.execute()
+                counts["pages"] += 1
+                if len(rows) < self.page_size:
+                    break
+            counts["watermark"] = last_id
+            return counts
+        finally:
+            await r.aclose()
@@ -0,0 +1,292 @@
+"""
+Queued, batched publishing of pattern alert cards to Discourse.
+
+The scanner only enqueues; a long-lived drain loop in the worker publishes.
+Pending work lives in Redis, deduplicated per Discourse user:
+
+  discourse:publish_queue   ZSET  user id -> due time (unix)
+  discourse:publish_jobs    HASH  user id -> job JSON (latest card wins)
+  discourse:publish_failed  LIST  jobs that exhausted their retries
+
+A user with a card already waiting gets the newer card instead of a
+second post. Failed jobs are retried with exponential backoff.
+
+Publishers take a whole batch:
+
+  RailsRunnerPublisher   one `rails runner` per batch (the Rails boot is
+                         paid once, not per alert), jobs passed on stdin
+  DiscourseAPIPublisher  Discourse HTTP API (DISCOURSE_URL +
+                         DISCOURSE_API_KEY), one persistent client
+
+Anything with an async publish(jobs) -> {user_id: PublishResult} and an
+async close() can stand in for them, e.g. a stub in tests.
+"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+K_PUBLISH_QUEUE = "discourse:publish_queue"
+K_PUBLISH_JOBS = "discourse:publish_jobs"
+K_PUBLISH_FAILED = "discourse:publish_failed"
+
+ALERT_CATEGORY_ID = int(os.getenv("DISCOURSE_ALERT_CATEGORY", "11"))
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+RETRY_BASE = 60  # seconds, doubled per attempt
+FAILED_KEEP = 200
+RUNNER_TIMEOUT = 900
+
+
+@dataclass
+class PublishJob:
+    user_id: int
+    title: str
+    raw: str
+    topic_id: int = 0  # known topic to reply to (0 = look up by title or create)
+    attempts: int = 0
+    enqueued: float = 0.0
+
+
+@dataclass
+class PublishResult:
+    topic_id: Optional[int] = None
+    created: bool = False
+    error: Optional[str] = None
+
+
+class DiscoursePublishQueue:
+    def __init__(self, get_redis):
+        self.get_redis = get_redis
+
+    async def enqueue(self, user_id: int, title: str, raw: str):
+        job = PublishJob(user_id=int(user_id), title=title, raw=raw, enqueued=time.time())
+        r = await self.get_redis()
+        try:
+            pipe = r.pipeline(transaction=True)
+            pipe.hset(K_PUBLISH_JOBS, str(user_id), json.dumps(asdict(job), ensure_ascii=False))
+            # NX keeps the user's place (and any retry backoff) if a card is already waiting
+            pipe.zadd(K_PUBLISH_QUEUE, {str(user_id): job.enqueued}, nx=True)
+            await pipe.execute()
+        finally:
+            await r.aclose()
+
+    async def due(self, limit: int = BATCH_SIZE) -> List[tuple]:
+        """Up to `limit` due jobs as (stored JSON, PublishJob), oldest first."""
+        r = await self.get_redis()
+        try:
+            uids = await r.zrangebyscore(K_PUBLISH_QUEUE, "-inf", time.time(), start=0, num=limit)
+            raws = await r.hmget(K_PUBLISH_JOBS, uids) if uids else []
+            orphans = [uid for uid, raw in zip(uids, raws) if raw is None]
+            if orphans:
+                await r.zrem(K_PUBLISH_QUEUE, *orphans)
+        finally:
+            await r.aclose()
+        return [(raw, PublishJob(**json.loads(raw))) for raw in raws if raw is not None]
+
+    async def depth(self) -> int:
+        r = await self.get_redis()
+        try:
+            return await r.zcard(K_PUBLISH_QUEUE)
+        finally:
+            await r.aclose()
+
+    async def ack(self, stored: str, job: PublishJob) -> bool:
+        """Drop the job unless a newer card for the same user arrived meanwhile."""
+        return await self._replace(stored, job, None)
+
+    async def retry(self, stored: str, job: PublishJob, error: str) -> bool:
+        """Back off and retry; after MAX_ATTEMPTS move the job to the failed list. True if it was given up."""
+        job.attempts += 1
+        if job.attempts >= MAX_ATTEMPTS:
+            await self._replace(stored, job, None, failed=error)
+            return True
+        await self._replace(stored, job, time.time() + RETRY_BASE * 2 ** (job.attempts - 1))
+        return False
+
+    async def _replace(self, stored: str, job: PublishJob, due_at: Optional[float], failed: str = None) -> bool:
+        uid = str(job.user_id)
+        r = await self.get_redis()
+        try:
+            async with r.pipeline(transaction=True) as pipe:
+                await pipe.watch(K_PUBLISH_JOBS)
+                if await pipe.hget(K_PUBLISH_JOBS, uid) != stored:
+                    # A newer card replaced this one; it stays queued as it is
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                if due_at is None:
+                    pipe.hdel(K_PUBLISH_JOBS, uid)
+                    pipe.zrem(K_PUBLISH_QUEUE, uid)
+                else:
+                    pipe.hset(K_PUBLISH_JOBS, uid, json.dumps(asdict(job), ensure_ascii=False))
+                    pipe.zadd(K_PUBLISH_QUEUE, {uid: due_at})
+                if failed:
+                    pipe.lpush(K_PUBLISH_FAILED, json.dumps({**asdict(job), "error": failed}, ensure_ascii=False))
+                    pipe.ltrim(K_PUBLISH_FAILED, 0, FAILED_KEEP - 1)
+                await pipe.execute()
+                return True
+        except Exception as e:
+            print(f"[Discourse] Aktualizace fronty pro {uid} selhala: {e}")
+            return False
+        finally:
+            await r.aclose()
+
+
+# ─── Publishers ──────────────────────────────────────────────────────
+
+_RUBY_BATCH = """
+require 'json'
+jobs = JSON.parse(STDIN.read)
+jobs.each do |job|
+  begin
+    topic = job['topic_id'].to_i > 0 ? Topic.find_by(id: job['topic_id'].to_i) : nil
+    topic ||= Topic.where(category_id: %(category)d, title: job['title']).first
+    if topic
+      post = PostCreator.new(Discourse.system_user, topic_id: topic.id, raw: job['raw'], skip_validations: true).create
+      created = false
+    else
+      post = PostCreator.new(Discourse.system_user, title: job['title'], raw: job['raw'], category: %(category)d, tags: ['novy'], skip_validations: true).create
+      created = true
+    end
+    if post && post.persisted?
+      puts 'RESULT:' + { user_id: job['user_id'], topic_id: post.topic_id, created: created }.to_json
+    else
+      puts 'RESULT:' + { user_id: job['user_id'], error: (post ? post.errors.full_messages.join(', ') : 'create failed') }.to_json
+    end
+  rescue => e
+    puts 'RESULT:' + { user_id: job['user_id'], error: e.message }.to_json
+  end
+end
+"""
+
+
+class RailsRunnerPublisher:
+    """All jobs of a batch in one `rails runner` inside the Discourse container."""
+
+    def __init__(self, container: str = "app", category_id: int = ALERT_CATEGORY_ID):
+        self.container = container
+        self.script = _RUBY_BATCH % {"category": category_id}
+
+    async def publish(self, jobs: List[PublishJob]) -> Dict[int, PublishResult]:
+        payload = json.dumps([asdict(job) for job in jobs], ensure_ascii=False).encode("utf-8")
+        cmd = ["docker", "exec", "-i", "-u", "discourse", "-w", "/var/www/discourse", self.container,
+               "bundle", "exec", "rails", "runner", self.script]
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(payload), RUNNER_TIMEOUT)
+        except asyncio.TimeoutError:
+            proc.kill()
+            raise
+        results = {}
+        for line in out.decode("utf-8", errors="replace").splitlines():
+            if line.startswith("RESULT:"):
+                data = json.loads(line[len("RESULT:"):])
+                results[int(data["user_id"])] = PublishResult(data.get("topic_id"), data.get("created", False), data.get("error"))
+        if not results and proc.returncode != 0:
+            raise RuntimeError(f"rails runner failed: {err.decode(errors='replace')[-500:]}")
+        return results
+
+    async def close(self):
+        pass
+
+
+class DiscourseAPIPublisher:
+    """Posts through the Discourse HTTP API as the system user."""
+
+    def __init__(self, base_url: str, api_key: str, username: str = "system",
+                 category_id: int = ALERT_CATEGORY_ID, concurrency: int = 4):
+        self.category_id = category_id
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"), timeout=30.0,
+            headers={"Api-Key": api_key, "Api-Username": username},
+        )
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def _find_topic(self, title: str) -> Optional[int]:
+        """Topic with exactly this title in the alert category, as the rails path looks it up."""
+        response = await self._client.get(
+            "/search.json", params={"q": f'"{title}" category:{self.category_id} in:title'},
+        )
+        response.raise_for_status()
+        for topic in response.json().get("topics") or []:
+            if topic.get("title") == title and topic.get("category_id") == self.category_id:
+                return int(topic["id"])
+        return None
+
+    async def _publish_one(self, job: PublishJob) -> PublishResult:
+        async with self._slots:
+            try:
+                # The user's topic id may have expired from Redis; reuse the topic by title
+                topic_id = job.topic_id or await self._find_topic(job.title)
+                if topic_id:
+                    body = {"topic_id": topic_id, "raw": job.raw}
+                else:
+                    body = {"title": job.title, "raw": job.raw, "category": self.category_id, "tags": ["novy"]}
+                response = await self._client.post("/posts.json", json=body)
+                if response.status_code >= 400:
+                    return PublishResult(error=f"HTTP {response.status_code}: {response.text[:200]}")
+                data = response.json()
+                return PublishResult(topic_id=data.get("topic_id"), created=not topic_id)
+            except Exception as e:
+                return PublishResult(error=str(e))
+
+    async def publish(self, jobs: List[PublishJob]) -> Dict[int, PublishResult]:
+        results = await asyncio.gather(*(self._publish_one(job) for job in jobs))
+        return {job.user_id: res for job, res in zip(jobs, results)}
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_publisher():
+    url = os.getenv("DISCOURSE_URL")
+    key = os.getenv("DISCOURSE_API_KEY")
+    if url and key:
+        return DiscourseAPIPublisher(url, key)
+    return RailsRunnerPublisher(os.getenv("DISCOURSE_CONTAINER", "app"))
+
+
+async def drain(queue: DiscoursePublishQueue, publisher,
+                lookup_topics: Callable[[List[int]], Awaitable[Dict[int, int]]] = None,
+                batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """
+    Publish one batch of due jobs. lookup_topics(user_ids) -> {user_id: topic_id}
+    fills in each job's reply target. Returns counts plus {user_id: topic_id}
+    of the published jobs under "topics".
+    """
+    due = await queue.due(batch_size)
+    counts = {"published": 0, "created": 0, "retried": 0, "failed": 0, "topics": {}}
+    if not due:
+        return counts
+    jobs = [job for _, job in due]
+    known = await lookup_topics([job.user_id for job in jobs]) if lookup_topics else {}
+    for job in jobs:
+        job.topic_id = int(known.get(job.user_id) or job.topic_id or 0)
+
+    try:
+        results = await publisher.publish(jobs)
+    except Exception as e:
+        print(f"[Discourse] Publikace dávky ({len(jobs)}) selhala: {e}")
+        results = {}
+
+    for stored, job in due:
+        res = results.get(job.user_id) or PublishResult(error="no result")
+        if res.error or not res.topic_id:
+            if await queue.retry(stored, job, res.error or "no topic"):
+                counts["failed"] += 1
+            else:
+                counts["retried"] += 1
+            continue
+        await queue.ack(stored, job)
+        counts["published"] += 1
+        counts["created"] += int(res.created)
+        counts["topics"][job.user_id] = int(res.topic_id)
+    return counts
@@ -0,0 +1,214 @@
+"""
+Per-day, per-user activity rollups built from the packed event buckets.
+
+A finalized day is stored once as JSON in agg:events:{gid}:{YYYYMMDD}:
+
+    {uid: {"m": msgs, "l": total len, "r": replies, "s": sessions,
+           "c": 1 if the first session continues the previous day's last one,
+           "v": voice seconds, "a": {action type: count}}}
+
+Sessions are counted as in the original chat-time formula (a new session
+whenever the gap between two messages exceeds SESSION_GAP). Storing the
+continuation flag keeps multi-day sums exact: a session that crosses
+midnight is only counted once when both days are in the range.
+
+Past days are finalized by the worker's hourly compactor, and lazily by
+any reader that finds one missing. Today is always computed from its live
+bucket, so a date range is answered from at most N rollups and never by
+rescanning raw events.
+"""
+
+import json
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import numpy as np
+
+from .event_codec import K_EVB, MSG_FLAG_REPLY, action_type_name, decode
+
+SESSION_GAP = 300
+ROLLUP_TTL = 400 * 86400
+
+ACTION_METRICS = {
+    "ban": "bans", "kick": "kicks", "timeout": "timeouts",
+    "unban": "unbans", "role_update": "role_updates",
+    "msg_delete": "msg_deleted", "verification": "verifications",
+}
+
+
+def K_EVAGG(gid: int, d: str) -> str:
+    """Finalized per-user rollup of one UTC day."""
+    return f"agg:events:{gid}:{d}"
+
+
+def utc_today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%d")
+
+
+def day_range(start: datetime, end: datetime) -> List[str]:
+    """YYYYMMDD strings from start to end (inclusive, calendar days)."""
+    days = []
+    d = start.date()
+    while d <= end.date():
+        days.append(d.strftime("%Y%m%d"))
+        d += timedelta(days=1)
+    return days
+
+
+def _prev_day(d: str) -> str:
+    return (datetime.strptime(d, "%Y%m%d") - timedelta(days=1)).strftime("%Y%m%d")
+
+
+def build_day_rollup(msgs: np.ndarray, voice: np.ndarray, actions: np.ndarray,
+                     prev_msgs: np.ndarray) -> Dict[str, Dict]:
+    """Aggregate one day's decoded buckets; `prev_msgs` is the previous day's msg bucket."""
+    out = {}
+
+    if len(msgs):
+        order = np.lexsort((msgs["ts"], msgs["uid"]))
+        uid = msgs["uid"][order]
+        ts = msgs["ts"][order].astype(np.int64)
+        new_session = np.ones(len(uid), dtype=bool)
+        new_session[1:] = (uid[1:] != uid[:-1]) | ((ts[1:] - ts[:-1]) > SESSION_GAP)
+
+        users, starts = np.unique(uid, return_index=True)
+        counts = np.diff(np.append(starts, len(uid)))
+        lengths = np.add.reduceat(msgs["len"][order].astype(np.int64), starts)
+        replies = np.add.reduceat(((msgs["flags"][order] & MSG_FLAG_REPLY) > 0).astype(np.int64), starts)
+        sessions = np.add.reduceat(new_session.astype(np.int64), starts)
+
+        prev_last = {}
+        if len(prev_msgs):
+            late = prev_msgs[prev_msgs["ts"] >= ts.min() - SESSION_GAP]
+            for u, t in zip(late["uid"].tolist(), late["ts"].tolist()):
+                if t > prev_last.get(u, 0):
+                    prev_last[u] = t
+
+        for u, first_ts, m, l, r, s in zip(users.tolist(), ts[starts].tolist(), counts.tolist(),
+                                           lengths.tolist(), replies.tolist(), sessions.tolist()):
+            cont = 1 if u in prev_last and first_ts - prev_last[u] <= SESSION_GAP else 0
+            out[str(u)] = {"m": m, "l": l, "r": r, "s": s, "c": cont}
+
+    if len(voice):
+        voice_uids, inverse = np.unique(voice["uid"], return_inverse=True)
+        durations = np.bincount(inverse, weights=voice["duration"])
+        for u, v in zip(voice_uids.tolist(), durations.tolist()):
+            out.setdefault(str(u), {})["v"] = int(v)
+
+    for (u, code), count in Counter(zip(actions["uid"].tolist(), actions["type"].tolist())).items():
+        row = out.setdefault(str(u), {})
+        row.setdefault("a", {})[action_type_name(code)] = count
+
+    return out
+
+
+async def _compute_days(rb, gid: int, days: List[str]) -> Dict[str, Dict]:
+    """Build rollups for `days` from raw buckets in one MGET (plus each previous day's msgs)."""
+    msg_days = sorted(set(days) | {_prev_day(d) for d in days})
+    keys = [K_EVB("msg", gid, d) for d in msg_days]
+    keys += [K_EVB(kind, gid, d) for kind in ("voice", "action") for d in days]
+    blobs = await rb.mget(keys)
+    msg_blobs = dict(zip(msg_days, blobs[:len(msg_days)]))
+    voice_blobs = blobs[len(msg_days):len(msg_days) + len(days)]
+    action_blobs = blobs[len(msg_days) + len(days):]
+
+    result = {}
+    for d, vb, ab in zip(days, voice_blobs, action_blobs):
+        result[d] = build_day_rollup(
+            decode("msg", [msg_blobs[d]]), decode("voice", [vb]),
+            decode("action", [ab]), decode("msg", [msg_blobs[_prev_day(d)]]),
+        )
+    return result
+
+
+async def load_day_rollups(r, rb, gid: int, days: List[str]) -> List[Dict[str, Dict]]:
+    """
+    Rollups for `days` (ascending), finalizing any missing past day on the way.
+    `r` decodes responses, `rb` is the binary client for the raw buckets.
+    """
+    if not days:
+        return []
+    today = utc_today()
+    stored = await r.mget([K_EVAGG(gid, d) for d in days])
+    rollups = {}
+    missing = []
+    for d, raw in zip(days, stored):
+        if raw is not None and d < today:
+            rollups[d] = json.loads(raw)
+        elif d <= today:
+            missing.append(d)
+        else:
+            rollups[d] = {}
+
+    if missing:
+        computed = await _compute_days(rb, gid, missing)
+        pipe = r.pipeline()
+        for d, data in computed.items():
+            rollups[d] = data
+            if d < today:
+                pipe.set(K_EVAGG(gid, d), json.dumps(data), ex=ROLLUP_TTL)
+        await pipe.execute()
+
+    return [rollups[d] for d in days]
+
+
+async def finalize_days(r, rb, gid: int, days: List[str], overwrite: bool = False) -> int:
+    """
+    Compactor entry point: build and store rollups of past days. Already
+    finalized days are kept unless `overwrite` (after a bucket rebuild).
+    Returns the number of days written.
+    """
+    today = utc_today()
+    days = [d for d in days if d < today]
+    if days and not overwrite:
+        stored = await r.mget([K_EVAGG(gid, d) for d in days])
+        days = [d for d, raw in zip(days, stored) if raw is None]
+    if not days:
+        return 0
+    computed = await _compute_days(rb, gid, days)
+    pipe = r.pipeline()
+    for d, data in computed.items():
+        pipe.set(K_EVAGG(gid, d), json.dumps(data), ex=ROLLUP_TTL)
+    await pipe.execute()
+    return len(days)
+
+
+def sum_rollups(day_rollups: List[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """
+    Per-user totals over consecutive days (ascending). A session continuing
+    from the previous day is only dropped when that day is part of the range.
+    """
+    totals = {}
+    for i, day in enumerate(day_rollups):
+        for uid, row in day.items():
+            t = totals.setdefault(uid, {"m": 0, "l": 0, "r": 0, "s": 0, "v": 0, "a": Counter()})
+            t["m"] += row.get("m", 0)
+            t["l"] += row.get("l", 0)
+            t["r"] += row.get("r", 0)
+            t["s"] += row.get("s", 0) - (row.get("c", 0) if i > 0 else 0)
+            t["v"] += row.get("v", 0)
+            t["a"].update(row.get("a", {}))
+    return totals
+
+
+def rollup_chat_time(row: Dict, weights: dict) -> float:
+    """Session-weighted chat time (before the chat_time multiplier) of a rollup row."""
+    return (
+        row.get("s", 0) * weights.get("session_base", 180)
+        + row.get("l", 0) * weights.get("char_weight", 1)
+        + row.get("m", 0) * weights.get("msg_weight", 0)
+        + row.get("r", 0) * weights.get("reply_weight", 60)
+    )
+
+
+def weighted_seconds(row: Dict, weights: dict) -> float:
+    """Weighted activity of a rollup row: action weights + voice time + chat time."""
+    score = 0.0
+    for action_type, count in row.get("a", {}).items():
+        score += float(weights.get(ACTION_METRICS.get(action_type, action_type + "s"), 0)) * count
+    score += float(row.get("v", 0) * weights.get("voice_time", 1))
+    chat = rollup_chat_time(row, weights)
+    if chat > 0:
+        score += float(chat * weights.get("chat_time", 1))
+    return score
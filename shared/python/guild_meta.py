@@ -0,0 +1,46 @@
+"""
+Guild metadata index, so request paths can tell how much history a guild
+has without KEYS/SCAN over stats:hourly:{gid}:*:
+
+    guild:days:{gid}   ZSET  YYYYMMDD -> int(YYYYMMDD)   days with message stats
+    guild:meta:{gid}   HASH  total_msgs
+
+Writers of stats:hourly / stats:total_msgs
+(scripts/maintenance/backfill_stats.py) call note_guild_activity() on the
+pipeline they already use. scripts/rebuild_guild_meta.py bootstraps the
+index from existing keys.
+"""
+
+from typing import Dict, Iterable
+
+from .keys import K_GUILD_DAYS, K_GUILD_META
+
+
+def note_guild_activity(pipe, gid: int, days: Iterable[str] = (), msgs: int = 0):
+    """Queue index updates for `msgs` new messages spread over `days` (YYYYMMDD)."""
+    days = {d: int(d) for d in days}
+    if days:
+        pipe.zadd(K_GUILD_DAYS(gid), days)
+    if msgs:
+        pipe.hincrby(K_GUILD_META(gid), "total_msgs", msgs)
+
+
+async def get_guild_meta(r, gids: Iterable) -> Dict[str, Dict]:
+    """{gid: {"first_day", "days", "total_msgs"}} for all guilds in one pipeline."""
+    gids = [str(g) for g in gids]
+    pipe = r.pipeline(transaction=False)
+    for gid in gids:
+        pipe.zrange(K_GUILD_DAYS(gid), 0, 0)
+        pipe.zcard(K_GUILD_DAYS(gid))
+        pipe.hget(K_GUILD_META(gid), "total_msgs")
+    res = await pipe.execute() if gids else []
+
+    meta = {}
+    for i, gid in enumerate(gids):
+        first, days, total = res[3 * i:3 * i + 3]
+        meta[gid] = {
+            "first_day": first[0] if first else None,
+            "days": int(days or 0),
+            "total_msgs": int(total or 0),
+        }
+    return meta
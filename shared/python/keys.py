@@ -49,3 +49,27 @@ def K_EVENTS_VOICE(gid: int, uid: int) -> str:
 def K_EVENTS_ACTION(gid: int, uid: int) -> str:
     """User mod action events sorted set key."""
     return f"events:action:{gid}:{uid}"
+
+def K_GUILD_DAYS(gid: int) -> str:
+    """Days with message stats (YYYYMMDD members scored as int) sorted set key."""
+    return f"guild:days:{gid}"
+
+def K_GUILD_META(gid: int) -> str:
+    """Guild metadata index hash key (total_msgs)."""
+    return f"guild:meta:{gid}"
+
+def K_TRAINING_RESULTS(uid) -> str:
+    """Moderator training results list key."""
+    return f"training:results:{uid}"
+
+def K_TRAINING_USERS() -> str:
+    """Set of user IDs that have training results."""
+    return "training:users"
+
+def K_AUTOMOD_PENDING_INDEX() -> str:
+    """Pending automod message IDs sorted set key (score = queued at)."""
+    return "automod:pending_index"
+
+def K_LLM_METRICS() -> str:
+    """Local LLM scheduler metrics hash (queue depth, counters, latency percentiles)."""
+    return "llm:metrics"
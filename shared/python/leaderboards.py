@@ -0,0 +1,209 @@
+"""
+Materialized message leaderboards.
+
+The worker's compactor folds every finalized day (agg:events:*, see
+event_rollups.py) into rolling boards, so a leaderboard page is one
+ZREVRANGE plus one pipelined batch of profile reads:
+
+  leaderboard:messages:{gid}           all time, zset uid -> messages
+  leaderboard:msg_len_sum:{gid}        all time, hash uid -> characters
+  leaderboard:msg_len_count:{gid}      all time, hash uid -> messages the sum covers
+  leaderboard:messages:{gid}:{n}d      last n finalized days, zset uid -> messages
+  leaderboard:msg_len:{gid}:{n}d       last n finalized days, hash uid -> characters
+  leaderboard:day:{gid}                last day folded in (YYYYMMDD)
+
+Advancing adds each new day's rollup and subtracts the day that left each
+window, in one transaction with the watermark. The all-time average length
+is a running sum/count; it replaces the unbounded per-user
+leaderboard:msg_lengths:{gid}:{uid} lists.
+
+This module is the boards' only writer. The first run, and every bucket
+rebuild (scripts/rebuild_event_buckets.py, which both backfills end with),
+recompute all of them from the rollups of every day with a message bucket,
+so history is never counted twice or skipped.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import WatchError
+
+from .cache import note_cache_write
+from .event_codec import K_EVB
+from .event_rollups import load_day_rollups, utc_today
+
+WINDOWS = (7, 30, 90)
+CATCHUP_DAYS = 7  # longer gaps rebuild the windows instead of stepping through them
+REBUILD_CHUNK_DAYS = 90  # rollups loaded per round-trip by rebuild_leaderboards()
+
+
+def K_LB(gid: int, window: Optional[int] = None) -> str:
+    """Message leaderboard, all time or over the last `window` finalized days."""
+    return f"leaderboard:messages:{gid}" if window is None else f"leaderboard:messages:{gid}:{window}d"
+
+def K_LB_LEN(gid: int, window: int) -> str:
+    return f"leaderboard:msg_len:{gid}:{window}d"
+
+def K_LB_LEN_SUM(gid: int) -> str:
+    return f"leaderboard:msg_len_sum:{gid}"
+
+def K_LB_LEN_COUNT(gid: int) -> str:
+    return f"leaderboard:msg_len_count:{gid}"
+
+def K_LB_DAY(gid: int) -> str:
+    return f"leaderboard:day:{gid}"
+
+def K_LB_LENGTHS_LEGACY(gid: int, uid="*") -> str:
+    return f"leaderboard:msg_lengths:{gid}:{uid}"
+
+
+def shift_day(d: str, days: int) -> str:
+    return (datetime.strptime(d, "%Y%m%d") + timedelta(days=days)).strftime("%Y%m%d")
+
+
+def _tally(day_rollups: List[Dict[str, Dict]]) -> Tuple[Counter, Counter]:
+    """Messages and characters per user over some days."""
+    msgs, chars = Counter(), Counter()
+    for day in day_rollups:
+        for uid, row in day.items():
+            if row.get("m"):
+                msgs[uid] += row["m"]
+                chars[uid] += row.get("l", 0)
+    return msgs, chars
+
+
+def _queue_windows(pipe, gid: int, day_rollups: List[Dict[str, Dict]]) -> None:
+    """Replace every window with the totals of its share of `day_rollups` (ascending, max(WINDOWS) days)."""
+    for n in WINDOWS:
+        msgs, chars = _tally(day_rollups[-n:])
+        pipe.delete(K_LB(gid, n), K_LB_LEN(gid, n))
+        if msgs:
+            pipe.zadd(K_LB(gid, n), dict(msgs))
+            pipe.hset(K_LB_LEN(gid, n), mapping=dict(chars))
+
+
+def _window_days(through: str) -> List[str]:
+    return [shift_day(through, -i) for i in range(max(WINDOWS) - 1, -1, -1)]
+
+
+async def rebuild_leaderboards(r, rb, gid: int) -> int:
+    """
+    Recompute every board from the rollups of all days with a message bucket
+    through yesterday, replacing what was there, and drop the legacy length
+    lists. Returns the number of days counted.
+    """
+    yesterday = shift_day(utc_today(), -1)
+    prefix = K_EVB("msg", gid, "")
+    days = sorted({k[len(prefix):] for k in [key async for key in r.scan_iter(K_EVB("msg", gid, "*"), count=1000)]})
+    days = [d for d in days if d.isdigit() and d <= yesterday]
+
+    msgs, chars = Counter(), Counter()
+    for start in range(0, len(days), REBUILD_CHUNK_DAYS):
+        day_msgs, day_chars = _tally(await load_day_rollups(r, rb, gid, days[start:start + REBUILD_CHUNK_DAYS]))
+        msgs.update(day_msgs)
+        chars.update(day_chars)
+    window_rollups = await load_day_rollups(r, rb, gid, _window_days(yesterday))
+    legacy = [k async for k in r.scan_iter(K_LB_LENGTHS_LEGACY(gid), count=1000)]
+
+    pipe = r.pipeline()
+    pipe.delete(K_LB(gid), K_LB_LEN_SUM(gid), K_LB_LEN_COUNT(gid), *legacy)
+    if msgs:
+        pipe.zadd(K_LB(gid), dict(msgs))
+        pipe.hset(K_LB_LEN_SUM(gid), mapping=dict(chars))
+        pipe.hset(K_LB_LEN_COUNT(gid), mapping=dict(msgs))
+    _queue_windows(pipe, gid, window_rollups)
+    pipe.set(K_LB_DAY(gid), yesterday)
+    note_cache_write(pipe, gid, "messages")
+    await pipe.execute()
+    return len(days)
+
+
+async def advance_leaderboards(r, rb, gid: int) -> int:
+    """
+    Fold the days finalized since the last run into every board; the first
+    run rebuilds them all from the rollups. The watermark is watched, so a
+    concurrent rebuild makes this run a no-op instead of counting a day
+    twice. Returns the number of days folded.
+    """
+    yesterday = shift_day(utc_today(), -1)
+    async with r.pipeline() as pipe:
+        await pipe.watch(K_LB_DAY(gid))
+        last = await pipe.get(K_LB_DAY(gid))
+        if last is None:
+            await pipe.reset()
+            await rebuild_leaderboards(r, rb, gid)
+            return 0
+        if last >= yesterday:
+            return 0
+
+        new_days = []
+        d = shift_day(last, 1)
+        while d <= yesterday:
+            new_days.append(d)
+            d = shift_day(d, 1)
+        step = len(new_days) <= CATCHUP_DAYS
+
+        # New days plus the days they push out of every window (or all window days on a rebuild)
+        if step:
+            days = set(new_days) | {shift_day(d, -n) for d in new_days for n in WINDOWS}
+        else:
+            days = set(new_days) | set(_window_days(yesterday))
+        days = sorted(days)
+        rollups = dict(zip(days, await load_day_rollups(r, rb, gid, days)))
+        msgs, chars = _tally([rollups[d] for d in new_days])
+
+        pipe.multi()
+        for uid, m in msgs.items():
+            pipe.zincrby(K_LB(gid), m, uid)
+            pipe.hincrby(K_LB_LEN_SUM(gid), uid, chars[uid])
+            pipe.hincrby(K_LB_LEN_COUNT(gid), uid, m)
+
+        touched = []  # (window, uid, position of its ZINCRBY in the transaction)
+        if step:
+            for n in WINDOWS:
+                gone_msgs, gone_chars = _tally([rollups[shift_day(d, -n)] for d in new_days])
+                delta_msgs, delta_chars = Counter(msgs), Counter(chars)
+                delta_msgs.subtract(gone_msgs)
+                delta_chars.subtract(gone_chars)
+                for uid, m in delta_msgs.items():
+                    if m:
+                        touched.append((n, uid, len(pipe)))
+                        pipe.zincrby(K_LB(gid, n), m, uid)
+                    if delta_chars[uid]:
+                        pipe.hincrby(K_LB_LEN(gid, n), uid, delta_chars[uid])
+        else:
+            _queue_windows(pipe, gid, [rollups[d] for d in _window_days(yesterday)])
+        pipe.set(K_LB_DAY(gid), yesterday)
+        note_cache_write(pipe, gid, "messages")
+        try:
+            results = await pipe.execute()
+        except WatchError:
+            return 0
+
+    # Users whose count in a window dropped to zero leave it
+    emptied = [(n, uid) for n, uid, pos in touched if results[pos] <= 0]
+    if emptied:
+        pipe = r.pipeline()
+        for n, uid in emptied:
+            pipe.zrem(K_LB(gid, n), uid)
+            pipe.hdel(K_LB_LEN(gid, n), uid)
+        await pipe.execute()
+    return len(new_days)
+
+
+def window_for_range(start_date: str, end_date: str) -> Optional[int]:
+    """
+    Rolling window answering a YYYY-MM-DD range, if any: the finalized part
+    of a range ending today or yesterday must be exactly one window. The
+    dashboard's "last N days" (today minus N through today) maps to the
+    N-day window; today's unfinished activity is not on the boards.
+    """
+    start = start_date.replace("-", "")
+    end = end_date.replace("-", "")
+    today = utc_today()
+    yesterday = shift_day(today, -1)
+    if end not in (today, yesterday) or start > yesterday:
+        return None
+    span = (datetime.strptime(yesterday, "%Y%m%d") - datetime.strptime(start, "%Y%m%d")).days + 1
+    return span if span in WINDOWS else None
@@ -0,0 +1,280 @@
+"""
+Priority scheduler for the local Ollama model.
+
+Every call to OLLAMA_HOST/api/generate goes through one LLMScheduler per
+process, so the CPU-bound model serves prompts in priority order:
+
+  DRAFT      interactive "AI Návrh" requests a moderator is waiting for
+  SUMMARY    summaries and precomputed drafts
+  SENTIMENT  background sentiment of chat messages
+
+The queue is bounded (LLM_QUEUE_MAX). When it is full a new job is rejected
+unless it outranks the oldest job of the lowest queued class, which is
+dropped in its place. Jobs may carry a maximum age; a job that waited longer
+is dropped unanswered when a worker reaches it, so a busy hour of sentiment
+never builds up behind itself.
+
+One httpx.AsyncClient is kept for the process, every request asks Ollama to
+keep the model loaded (keep_alive) and models registered with keep_warm()
+are pinged when idle. Queue depth, counters and wait/run latency
+percentiles come from metrics() and are published to the llm:metrics hash.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, Optional
+
+import httpx
+
+from .keys import K_LLM_METRICS
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "256"))
+WORKERS = int(os.getenv("LLM_WORKERS", "1"))
+
+WARM_INTERVAL = 240  # seconds of idleness before a registered model is pinged
+METRICS_INTERVAL = 30
+LATENCY_WINDOW = 500  # samples per class kept for percentiles
+DEFAULT_TIMEOUT = 120.0
+
+
+class Priority(IntEnum):
+    DRAFT = 0
+    SUMMARY = 1
+    SENTIMENT = 2
+
+
+class LLMJobDropped(Exception):
+    """The job never reached the model (queue full, too old or scheduler closed)."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"LLM job dropped: {reason}")
+        self.reason = reason
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    model: str = field(compare=False)
+    prompt: str = field(compare=False)
+    options: Optional[dict] = field(compare=False)
+    timeout: float = field(compare=False)
+    enqueued: float = field(compare=False)
+    deadline: Optional[float] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+def _percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMScheduler:
+    def __init__(self, host: str = None, max_queue: int = QUEUE_MAX, workers: int = WORKERS,
+                 keep_alive: str = KEEP_ALIVE, get_redis=None):
+        self.host = (host or OLLAMA_HOST).rstrip("/")
+        self.max_queue = max_queue
+        self.workers = max(1, workers)
+        self.keep_alive = keep_alive
+        self.get_redis = get_redis
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._tasks = []
+        self._running = 0
+        self._warm: Dict[str, float] = {}  # model -> last request (monotonic)
+        self._counters = {p: dict.fromkeys(("submitted", "done", "failed", "expired", "rejected", "evicted"), 0)
+                          for p in Priority}
+        self._wait = {p: deque(maxlen=LATENCY_WINDOW) for p in Priority}
+        self._run = {p: deque(maxlen=LATENCY_WINDOW) for p in Priority}
+
+    # ─── Lifecycle ───────────────────────────────────────────────────
+    def _ensure_started(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._client = httpx.AsyncClient(
+            base_url=self.host,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=self.workers + 1, max_keepalive_connections=self.workers + 1),
+        )
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._housekeeping()))
+
+    async def close(self):
+        """Stop the workers, fail queued jobs and close the HTTP client; the next submit restarts it."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self._heap:
+            if not job.future.done():
+                job.future.set_exception(LLMJobDropped("closed"))
+        self._heap = []
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def keep_warm(self, model: str):
+        """Keep `model` loaded in Ollama while this process runs."""
+        self._warm.setdefault(model, 0.0)
+
+    # ─── Submission ──────────────────────────────────────────────────
+    def submit(self, model: str, prompt: str, priority: Priority, options: dict = None,
+               timeout: float = DEFAULT_TIMEOUT, max_age: float = None) -> asyncio.Future:
+        """
+        Queue a prompt and return a future for the response text. Raises
+        LLMJobDropped("full") right away if the queue has no room for it.
+        """
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        priority = Priority(priority)
+        counters = self._counters[priority]
+
+        live = self._live_jobs()
+        if len(live) >= self.max_queue:
+            victim = max(live, key=lambda j: (j.priority, -j.seq))
+            if victim.priority <= priority:
+                counters["rejected"] += 1
+                raise LLMJobDropped("full")
+            self._counters[Priority(victim.priority)]["evicted"] += 1
+            victim.future.set_exception(LLMJobDropped("evicted"))
+        if len(self._heap) > 2 * self.max_queue:
+            self._heap = live
+            heapq.heapify(self._heap)
+
+        now = loop.time()
+        job = _Job(
+            priority=int(priority), seq=next(self._seq), model=model, prompt=prompt, options=options,
+            timeout=timeout, enqueued=now, deadline=now + max_age if max_age else None,
+            future=loop.create_future(),
+        )
+        heapq.heappush(self._heap, job)
+        counters["submitted"] += 1
+        self._wakeup.set()
+        return job.future
+
+    async def generate(self, model: str, prompt: str, priority: Priority, options: dict = None,
+                       timeout: float = DEFAULT_TIMEOUT, max_age: float = None) -> str:
+        """Queue a prompt and wait for the response text (raises LLMJobDropped or the HTTP error)."""
+        return await self.submit(model, prompt, priority, options, timeout, max_age)
+
+    def _live_jobs(self):
+        # Jobs cancelled by their caller or evicted stay in the heap until popped
+        return [job for job in self._heap if not job.future.done()]
+
+    # ─── Workers ─────────────────────────────────────────────────────
+    async def _next_job(self) -> _Job:
+        while True:
+            while not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            job = heapq.heappop(self._heap)
+            if not job.future.done():
+                return job
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._next_job()
+            priority = Priority(job.priority)
+            started = loop.time()
+            if job.deadline and started > job.deadline:
+                self._counters[priority]["expired"] += 1
+                job.future.set_exception(LLMJobDropped("expired"))
+                continue
+
+            self._wait[priority].append(started - job.enqueued)
+            self._running += 1
+            try:
+                text = await self._post(job)
+            except Exception as e:
+                self._counters[priority]["failed"] += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self._counters[priority]["done"] += 1
+                if not job.future.done():
+                    job.future.set_result(text)
+            finally:
+                self._running -= 1
+                self._run[priority].append(loop.time() - started)
+
+    async def _post(self, job: _Job) -> str:
+        payload = {"model": job.model, "prompt": job.prompt, "stream": False, "keep_alive": self.keep_alive}
+        if job.options:
+            payload["options"] = job.options
+        if job.model in self._warm:
+            self._warm[job.model] = time.monotonic()
+        response = await self._client.post("/api/generate", json=payload, timeout=job.timeout)
+        response.raise_for_status()
+        return response.json().get("response", "").strip()
+
+    async def _housekeeping(self):
+        last_publish = 0.0
+        while True:
+            await asyncio.sleep(5)
+            now = time.monotonic()
+            if not self._heap and not self._running:
+                for model, last in list(self._warm.items()):
+                    if now - last >= WARM_INTERVAL:
+                        await self._ping(model)
+            if self.get_redis and now - last_publish >= METRICS_INTERVAL:
+                last_publish = now
+                await self.publish_metrics()
+
+    async def _ping(self, model: str):
+        # A generate request without a prompt only loads the model
+        self._warm[model] = time.monotonic()
+        try:
+            await self._client.post("/api/generate", json={"model": model, "keep_alive": self.keep_alive}, timeout=DEFAULT_TIMEOUT)
+        except Exception as e:
+            print(f"[LLM] Warm-up {model} selhal: {e}")
+
+    # ─── Metrics ─────────────────────────────────────────────────────
+    def metrics(self) -> Dict[str, float]:
+        """Flat snapshot: queue depth, per-class counters and wait/run p50/p95 in ms."""
+        live = self._live_jobs()
+        out = {"queue_depth": len(live), "running": self._running, "queue_max": self.max_queue}
+        for p in Priority:
+            name = p.name.lower()
+            out[f"{name}_queued"] = sum(1 for job in live if job.priority == p)
+            for counter, value in self._counters[p].items():
+                out[f"{name}_{counter}"] = value
+            for kind, samples in (("wait", self._wait[p]), ("run", self._run[p])):
+                out[f"{name}_{kind}_p50_ms"] = round(_percentile(samples, 0.50) * 1000, 1)
+                out[f"{name}_{kind}_p95_ms"] = round(_percentile(samples, 0.95) * 1000, 1)
+        return out
+
+    async def publish_metrics(self):
+        try:
+            r = await self.get_redis()
+            try:
+                await r.hset(K_LLM_METRICS(), mapping={**self.metrics(), "updated": int(time.time())})
+            finally:
+                await r.aclose()
+        except Exception as e:
+            print(f"[LLM] Publikace metrik selhala: {e}")
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """The process-wide scheduler for OLLAMA_HOST."""
+    global _scheduler
+    if _scheduler is None:
+        from .redis_client import get_redis_client
+        _scheduler = LLMScheduler(get_redis=get_redis_client)
+    return _scheduler
@@ -0,0 +1,342 @@
+"""
+Batched NSFW avatar scoring.
+
+The scan pipeline has three stages connected by asyncio queues:
+
+  download   `concurrency` coroutines fetch images through the caller's
+             fetch() (the cog's shared aiohttp session)
+  preprocess PIL decode/resize + Caffe-style normalisation in a thread pool
+             (PIL and NumPy release the GIL for the heavy parts)
+  inference  micro-batches of up to `batch_size` images (N x 224 x 224 x 3)
+             run through onnxruntime in a single-thread executor
+
+so the event loop never decodes or infers itself and a slow download does
+not stall the model. Avatars already in the score cache (NSFWScoreCache)
+skip all three stages.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+from PIL import Image
+
+INPUT_SIZE = 224
+# Model expects BGR [0, 255] with mean subtraction (Caffe-style: B=104, G=117, R=123)
+CAFFE_MEAN = np.array([104, 117, 123], dtype=np.float32)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_BATCH_SIZE = 16
+BATCH_WAIT = 0.05  # seconds a partial batch waits for more images
+
+SCORE_CACHE_MAX = 200_000
+EVICT_EVERY = 100  # puts between LRU eviction checks
+
+
+def load_session(model_path: str, threads: int = None):
+    """ONNX session for the avatar model (intra-op threads default to min(4, CPUs))."""
+    import onnxruntime as ort
+
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = threads or min(4, os.cpu_count() or 1)
+    opts.inter_op_num_threads = 1
+    return ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+
+
+def image_hash(img_bytes: bytes) -> str:
+    return hashlib.md5(img_bytes).hexdigest()
+
+
+def model_version(model_path: str) -> str:
+    """Short content hash of the model file; cached scores are only valid for the same model."""
+    md5 = hashlib.md5()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            md5.update(chunk)
+    return md5.hexdigest()[:12]
+
+
+def preprocess(img_bytes: bytes) -> Optional[np.ndarray]:
+    """Decode one image into a 224 x 224 x 3 float32 BGR array (None if unreadable)."""
+    try:
+        img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+        img = img.resize((INPUT_SIZE, INPUT_SIZE))
+        arr = np.asarray(img, dtype=np.float32)[:, :, ::-1]
+        return arr - CAFFE_MEAN
+    except Exception as e:
+        print(f"[NSFW] Chyba při preprocessingu: {e}")
+        return None
+
+
+class NSFWScorer:
+    """Micro-batched inference on top of an onnxruntime session."""
+
+    def __init__(self, session):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name if session else None
+        # Models exported with a fixed batch dimension of 1 are fed image by image
+        batch_dim = session.get_inputs()[0].shape[0] if session else 1
+        self.batched = not isinstance(batch_dim, int) or batch_dim > 1
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nsfw-infer")
+
+    def predict_batch(self, batch: np.ndarray) -> List[Optional[List[float]]]:
+        """[[sfw, nsfw], ...] for an N x 224 x 224 x 3 batch (blocking); None rows if inference failed."""
+        if not self.session:
+            return [[0.0, 0.0] for _ in range(len(batch))]
+        try:
+            batch = np.ascontiguousarray(batch, dtype=np.float32)
+            if self.batched:
+                out = self.session.run(None, {self.input_name: batch})[0]
+            else:
+                out = np.concatenate([self.session.run(None, {self.input_name: arr[None]})[0] for arr in batch])
+            return [[float(x) for x in row] for row in out]
+        except Exception as e:
+            print(f"[NSFW] Chyba při predikci: {e}")
+            return [None] * len(batch)
+
+    async def predict(self, arrs: List[np.ndarray]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.predict_batch, np.stack(arrs))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class NSFWScoreCache:
+    """
+    Persistent avatar score cache in Redis, keyed by Discord's avatar hash
+    (avatar URLs are already content-addressed) and the model version:
+
+        nsfw:score:{model}        HASH  avatar hash -> "sfw,nsfw"
+        nsfw:score_lru:{model}    ZSET  avatar hash -> last use (unix time)
+        nsfw:score_stats:{model}  HASH  hits, misses
+
+    Beyond `max_entries` the least recently used entries are evicted.
+    `get_redis` is an async factory such as get_redis_client.
+    """
+
+    def __init__(self, get_redis, version: str, max_entries: int = SCORE_CACHE_MAX):
+        self.get_redis = get_redis
+        self.version = version
+        self.max_entries = max_entries
+        self.key = f"nsfw:score:{version}"
+        self.lru_key = f"nsfw:score_lru:{version}"
+        self.stats_key = f"nsfw:score_stats:{version}"
+        self.hits = 0
+        self.misses = 0
+        self._unflushed = {"hits": 0, "misses": 0}
+        self._puts = 0
+
+    async def get(self, avatar_key: str) -> Optional[List[float]]:
+        r = await self.get_redis()
+        try:
+            pipe = r.pipeline(transaction=False)
+            pipe.hget(self.key, avatar_key)
+            pipe.zadd(self.lru_key, {avatar_key: time.time()}, xx=True)
+            raw, _ = await pipe.execute()
+        finally:
+            await r.aclose()
+        counter = "hits" if raw else "misses"
+        setattr(self, counter, getattr(self, counter) + 1)
+        self._unflushed[counter] += 1
+        return [float(x) for x in raw.split(",")] if raw else None
+
+    async def put(self, avatar_key: str, scores: List[float]):
+        r = await self.get_redis()
+        try:
+            pipe = r.pipeline(transaction=False)
+            pipe.hset(self.key, avatar_key, ",".join(f"{x:.6f}" for x in scores))
+            pipe.zadd(self.lru_key, {avatar_key: time.time()})
+            await pipe.execute()
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                await self.evict(r)
+        finally:
+            await r.aclose()
+
+    async def evict(self, r):
+        overflow = await r.zcard(self.lru_key) - self.max_entries
+        if overflow > 0:
+            oldest = [member for member, _ in await r.zpopmin(self.lru_key, overflow)]
+            if oldest:
+                await r.hdel(self.key, *oldest)
+
+    async def flush_stats(self) -> Dict[str, int]:
+        """Add this process's hit/miss counts to the Redis counters; returns the totals."""
+        r = await self.get_redis()
+        try:
+            pipe = r.pipeline(transaction=False)
+            for counter, count in self._unflushed.items():
+                if count:
+                    pipe.hincrby(self.stats_key, counter, count)
+            pipe.hgetall(self.stats_key)
+            totals = (await pipe.execute())[-1]
+        finally:
+            await r.aclose()
+        self._unflushed = {"hits": 0, "misses": 0}
+        return {k: int(v) for k, v in totals.items()}
+
+
+@dataclass
+class ScanResult:
+    item: Any
+    url: str
+    img_hash: Optional[str] = None
+    scores: Optional[List[float]] = None
+    error: Optional[str] = None
+    cached: bool = False
+
+
+@dataclass
+class ScanStats:
+    total: int = 0
+    done: int = 0
+    scored: int = 0
+    cached: int = 0
+    failed: int = 0
+    batches: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        return self.done / max(self.elapsed, 1e-9)
+
+    def summary(self) -> str:
+        return (
+            f"{self.done}/{self.total} avatarů za {self.elapsed:.1f}s ({self.rate:.1f}/s), "
+            f"model {self.scored} v {self.batches} dávkách, cache {self.cached}, chyby {self.failed}"
+        )
+
+
+async def scan_images(
+    items: Iterable[tuple],
+    fetch: Callable[[str], Awaitable[Optional[bytes]]],
+    scorer: NSFWScorer,
+    on_result: Callable[[ScanResult], Awaitable[None]] = None,
+    cache_get: Callable[[Any], Awaitable[Optional[List[float]]]] = None,
+    cache_put: Callable[[Any, List[float]], Awaitable[None]] = None,
+    on_progress: Callable[[ScanStats], Awaitable[None]] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress_every: int = 100,
+) -> ScanStats:
+    """
+    Score `items` ((item, url) pairs) and hand every ScanResult to on_result,
+    in completion order. cache_get/cache_put take the item, so a cached
+    avatar is answered before it is downloaded. Returns the final statistics.
+    """
+    items = list(items)
+    stats = ScanStats(total=len(items))
+    loop = asyncio.get_running_loop()
+    todo: asyncio.Queue = asyncio.Queue()
+    ready: asyncio.Queue = asyncio.Queue(maxsize=batch_size * 4)
+    for entry in items:
+        todo.put_nowait(entry)
+
+    async def emit(result: ScanResult):
+        stats.done += 1
+        if result.error:
+            stats.failed += 1
+        if on_result:
+            try:
+                await on_result(result)
+            except Exception as e:
+                print(f"[NSFW] Chyba při zpracování výsledku {result.url}: {e}")
+        if on_progress and stats.done % progress_every == 0:
+            await on_progress(stats)
+
+    async def download_worker(pool: ThreadPoolExecutor):
+        while True:
+            try:
+                item, url = todo.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            scores = None
+            if cache_get:
+                try:
+                    scores = await cache_get(item)
+                except Exception as e:
+                    # The cache only saves work; score the image instead
+                    print(f"[NSFW] Chyba při čtení z cache {url}: {e}")
+            if scores is not None:
+                stats.cached += 1
+                await emit(ScanResult(item, url, scores=scores, cached=True))
+                continue
+            img_bytes = await fetch(url)
+            if not img_bytes:
+                await emit(ScanResult(item, url, error="download"))
+                continue
+            img_hash = image_hash(img_bytes)
+            arr = await loop.run_in_executor(pool, preprocess, img_bytes)
+            if arr is None:
+                await emit(ScanResult(item, url, img_hash, error="preprocess"))
+                continue
+            await ready.put((item, url, img_hash, arr))
+
+    async def inference_worker():
+        while True:
+            first = await ready.get()
+            if first is None:
+                return
+            batch = [first]
+            finished = False
+            deadline = loop.time() + BATCH_WAIT
+            while len(batch) < batch_size:
+                try:
+                    nxt = await asyncio.wait_for(ready.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+                if nxt is None:
+                    finished = True
+                    break
+                batch.append(nxt)
+
+            scores = await scorer.predict([arr for _, _, _, arr in batch])
+            stats.batches += 1
+            stats.scored += len(batch)
+            for (item, url, img_hash, _), s in zip(batch, scores):
+                if s is None:
+                    await emit(ScanResult(item, url, img_hash, error="inference"))
+                    continue
+                if cache_put:
+                    try:
+                        await cache_put(item, s)
+                    except Exception as e:
+                        print(f"[NSFW] Chyba při ukládání do cache {url}: {e}")
+                await emit(ScanResult(item, url, img_hash, s))
+            if finished:
+                return
+
+    with ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="nsfw-prep") as pool:
+        downloads = [asyncio.create_task(download_worker(pool)) for _ in range(max(1, concurrency))]
+        inference = asyncio.create_task(inference_worker())
+        tasks = downloads + [inference]
+        try:
+            # A failing stage stops the others instead of leaving them blocked on the queues
+            pending = set(tasks)
+            while not all(task.done() for task in downloads):
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception():
+                        raise task.exception()
+            await ready.put(None)
+            await inference
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    if on_progress and stats.done % progress_every:
+        await on_progress(stats)
+    return stats
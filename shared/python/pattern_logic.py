@@ -4,7 +4,7 @@ Used by both the PatternDetectorCog and standalone backfill scripts.
 """
 
 import re
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 # ─── Keyword Groups (Czech) ──────────────────────────────────────────
 
@@ -37,6 +37,14 @@ KEYWORD_GROUPS = {
     "survival": ["survival", "přežití", "krizový plán", "krizáč", "nouzovka", "sos", "panika"],
 }
 
+# Clinically significant keywords (boosted in AI summaries, gate the sentiment pre-classifier)
+CLINICAL_KEYWORDS = {
+    "relaps", "recidiva", "selhání", "selhani", "sexting", "grindr", "tinder", "badoo", "seznamka", "porno", "pornoherečka", "poker", "hazard", "sázení", "sazeni", 
+    "alkohol", "drogy", "pervitin", "tráva", "marihuana", "koks", "kokain", "chuť", "chut", "bažení", "bazeni", "pokušení", "pokuseni", "pokušenie", "krize", "kriza", 
+    "deprese", "úzkost", "uzkost", "strach", "samota", "nuda", "únava", "unava", "hněv", "hnev", "vzteky", "vztek", "stydím", "stud", "vina", "zklamání", "zklamani",
+    "deník", "denik", "plán", "plan", "metodika", "survival", "terapie", "terapeut", "pomoc", "abstinence", "střízlivost", "strizlivost", "čistý", "cisty", "vztah", "partner", "manžel", "manželka"
+}
+
 # Match whole words for short keywords to avoid false positives
 SHORT_WORDS = {"nic", "vždy", "stále", "zase", "znovu", "super", "ahoj", "znov"}
 
@@ -60,19 +68,96 @@ def normalize_text(text: str) -> str:
     return re.sub(r"\s+", " ", text.lower().strip())
 
 
+def _trie_regex(words: List[str]) -> str:
+    """
+    Regex source matching any of `words`, factored into a prefix trie so the
+    engine never retries shared prefixes. Optional tails are greedy, so the
+    longest matching word wins.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+def _is_word_char(ch: str) -> bool:
+    """Same definition of a word character as `\\w` in `re` for str patterns."""
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    """
+    Precompiled matcher for all keyword groups. One regex pass over a prefix
+    trie finds every position where some keyword starts, capturing the longest one; all
+    other keywords matching there are its prefixes and are looked up from a
+    precomputed table. Counting rules match the original per-group
+    implementation: short words (<= 4 chars or in SHORT_WORDS) count whole-word
+    matches, longer phrases count substrings; occurrences of one keyword never
+    overlap.
+    """
+
+    def __init__(self, groups: Dict[str, List[str]]):
+        self.groups = {g: list(kws) for g, kws in groups.items()}
+        keywords = sorted({kw for kws in self.groups.values() for kw in kws if kw}, key=len, reverse=True)
+        self._whole_word = {kw for kw in keywords if len(kw) <= 4 or kw in SHORT_WORDS}
+        # Longest keyword -> every keyword that is a prefix of it (itself included)
+        self._prefixes = {kw: [p for p in keywords if kw.startswith(p)] for kw in keywords}
+        # Zero-width lookahead so overlapping keywords are all seen; captures the longest match
+        self._starts = re.compile(f"(?=({_trie_regex(keywords)}))") if keywords else None
+
+    def keyword_counts(self, norm: str) -> Dict[str, int]:
+        """Hit count per keyword in already normalized text."""
+        if not norm or self._starts is None:
+            return {}
+        counts = {}
+        next_free = {}  # keyword -> end of its last counted occurrence
+        n = len(norm)
+        for m in self._starts.finditer(norm):
+            pos = m.start()
+            for kw in self._prefixes[m.group(1)]:
+                if pos < next_free.get(kw, 0):
+                    continue
+                end = pos + len(kw)
+                if kw in self._whole_word:
+                    # `\b` on both sides; string edges count as non-word characters
+                    before = pos > 0 and _is_word_char(norm[pos - 1])
+                    after = end < n and _is_word_char(norm[end])
+                    if before == _is_word_char(kw[0]) or after == _is_word_char(kw[-1]):
+                        continue
+                counts[kw] = counts.get(kw, 0) + 1
+                next_free[kw] = end
+        return counts
+
+    def hits(self, text: str) -> Dict[str, int]:
+        """Hits per group (groups without hits omitted), normalizing once."""
+        kw_counts = self.keyword_counts(normalize_text(text))
+        if not kw_counts:
+            return {}
+        out = {}
+        for group, kws in self.groups.items():
+            count = sum(kw_counts.get(kw, 0) for kw in kws)
+            if count > 0:
+                out[group] = count
+        return out
+
+
+_MATCHER = KeywordMatcher(KEYWORD_GROUPS)
+
+
 def count_keywords(text: str, group: str) -> int:
     """Count keyword hits for a group in text."""
-    norm = normalize_text(text)
-    if not norm:
-        return 0
-    count = 0
-    for kw in KEYWORD_GROUPS.get(group, []):
-        if len(kw) <= 4 or kw in SHORT_WORDS:
-            # Whole-word match for short words
-            count += len(re.findall(rf"\b{re.escape(kw)}\b", norm))
-        else:
-            count += norm.count(kw)
-    return count
+    return _MATCHER.hits(text).get(group, 0)
 
 
 def count_words(text: str) -> int:
@@ -82,10 +167,100 @@ def count_words(text: str) -> int:
     return len(text.split())
 
 def get_keyword_hits(text: str) -> Dict[str, int]:
-    """Get hits for all keyword groups."""
-    hits = {}
-    for group in KEYWORD_GROUPS:
-        count = count_keywords(text, group)
-        if count > 0:
-            hits[group] = count
-    return hits
+    """Get hits for all keyword groups in a single pass over the text."""
+    return _MATCHER.hits(text)
+
+# ─── Daily Rollup Layout ─────────────────────────────────────────────
+# All per-user daily counters live in one hash, pat:day:{gid}:{uid}:{YYYYMMDD}:
+#   word_count, msg_count, char_count, reply_count, mention_count
+#   kw:<group>   keyword group hits (plus kw:analytical_hits)
+#   h:<0-23>     messages per UTC hour
+#   del, del_long, edit
+
+DAY_MSG_FIELDS = ("word_count", "msg_count", "char_count", "reply_count", "mention_count")
+PAT_TTL = 730 * 86400  # 2 years
+
+
+def kw_field(group: str) -> str:
+    """Rollup field holding keyword hits of a group."""
+    return f"kw:{group}"
+
+
+def hour_field(hour: int) -> str:
+    """Rollup field holding the message count of an hour."""
+    return f"h:{hour}"
+
+
+def parse_day_rollup(data: Dict) -> Dict:
+    """Split a raw pat:day hash into msg stats, keyword hits, hour buckets and counters."""
+    out = {"msg": {}, "kw": {}, "hours": {}, "del": 0, "del_long": 0, "edit": 0}
+    for field, raw in (data or {}).items():
+        try:
+            val = int(raw)
+        except (TypeError, ValueError):
+            continue
+        if field.startswith("kw:"):
+            out["kw"][field[3:]] = val
+        elif field.startswith("h:"):
+            if field[2:].isdigit():
+                out["hours"][int(field[2:])] = val
+        elif field in DAY_MSG_FIELDS:
+            out["msg"][field] = val
+        elif field in ("del", "del_long", "edit"):
+            out[field] = val
+    return out
+
+
+# ─── Message Signal Writes ───────────────────────────────────────────
+# One path for Discord messages (PatternSignals.on_message) and Discourse
+# posts (discourse_ingest.record_post), queued on the caller's pipeline.
+
+def queue_text_signals(pipe, day_key: str, text: str, hour: int) -> int:
+    """Keyword, analytical-style and hour counters of one message; returns its keyword hits."""
+    total_hits = 0
+    if len(text) > 3:
+        for group, hits in get_keyword_hits(text).items():
+            pipe.hincrby(day_key, kw_field(group), hits)
+            total_hits += hits
+        if is_analytical_style(text):
+            pipe.hincrby(day_key, kw_field("analytical_hits"), 1)
+    pipe.hincrby(day_key, hour_field(hour), 1)
+    pipe.expire(day_key, PAT_TTL)
+    return total_hits
+
+
+def queue_message_signals(pipe, gid: int, uid: int, text: str, day: str, act_ts: int, hour: int, *,
+                          is_reply: bool = False, mentions: int = 0, msg_id: Optional[int] = None,
+                          channel_id: Optional[int] = None, joined_ts: Optional[int] = None) -> int:
+    """
+    Queue the pattern signals of one non-staff message: the pat:day rollup
+    of `day`, last activity, the scanner's active index, the first message
+    and the join date. Returns its keyword hits.
+    """
+    day_key = f"pat:day:{gid}:{uid}:{day}"
+    pipe.hincrby(day_key, "word_count", count_words(text))
+    pipe.hincrby(day_key, "msg_count", 1)
+    pipe.hincrby(day_key, "char_count", len(text))
+    if is_reply:
+        pipe.hincrby(day_key, "reply_count", 1)
+    if mentions > 0:
+        pipe.hincrby(day_key, "mention_count", mentions)
+    total_hits = queue_text_signals(pipe, day_key, text, hour)
+
+    # Last activity for follow-ups, and the active-user index the scanner reads instead of a SCAN
+    pipe.set(f"pat:last_act:{gid}:{uid}", str(act_ts), ex=PAT_TTL)
+    pipe.zadd(f"pat:active:{gid}", {str(uid): act_ts}, gt=True)
+
+    first_key = f"pat:first_msg:{gid}:{uid}"
+    if msg_id is not None:
+        pipe.hsetnx(first_key, "msg_id", str(msg_id))
+    pipe.hsetnx(first_key, "timestamp", str(act_ts))
+    if channel_id is not None:
+        pipe.hsetnx(first_key, "channel_id", str(channel_id))
+    pipe.expire(first_key, PAT_TTL)
+
+    if joined_ts is not None:
+        join_key = f"pat:user_join:{gid}:{uid}"
+        pipe.setnx(join_key, str(joined_ts))
+        pipe.expire(join_key, PAT_TTL)
+    return total_hits
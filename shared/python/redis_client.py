@@ -1,26 +1,302 @@
+"""
+Process-wide Redis connections.
 
+Every service gets its clients from here instead of calling redis.from_url
+itself. Clients returned by get_redis() share one pool per (URL, decoding),
+so `await r.aclose()` after an event only hands the connection back; the
+pools are closed once with close_redis() at shutdown.
 
+Pools are sized and hardened through the environment:
+
+  REDIS_URL               primary
+  REDIS_REPLICA_URL       optional read replica for get_redis(readonly=True)
+  REDIS_POOL_SIZE         connections per pool (default 32); callers wait up
+                          to REDIS_POOL_TIMEOUT seconds for a free one
+  REDIS_HEALTH_CHECK      PING idle connections older than this (seconds)
+  REDIS_RETRIES           retries with exponential backoff on connection
+                          errors and timeouts
+
+Instrumentation: async clients count commands, round-trips (a pipeline is
+one), errors and latency per call site, the first module.function outside
+redis itself. redis_stats() returns the counters, publish_redis_stats()
+stores them in Redis so the dashboard can show which cog or endpoint
+hammers Redis, and observe_redis() hooks every round-trip (the dashboard
+attributes them to the current request). REDIS_INSTRUMENT=0 turns it off.
+"""
+
+import json
 import os
-import redis.asyncio as redis
+import sys
+import time
+from collections import defaultdict, deque
+from typing import Callable, Dict, List, Optional
 
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://172.22.0.2:6379/0")
+REDIS_REPLICA_URL = os.getenv("REDIS_REPLICA_URL", "")
+POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "32"))
+POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK", "30"))
+SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "10"))
+RETRIES = int(os.getenv("REDIS_RETRIES", "3"))
+INSTRUMENT = os.getenv("REDIS_INSTRUMENT", "1") != "0"
+
+LATENCY_SAMPLES = 256  # per call site, for p95
+K_REDIS_STATS = "redis:callsites:{service}"
+
+
+# ─── Instrumentation ─────────────────────────────────────────────────
+
+class _SiteStats:
+    __slots__ = ("commands", "round_trips", "errors", "total_ms", "max_ms", "samples")
+
+    def __init__(self):
+        self.commands = 0
+        self.round_trips = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+
+    def add(self, commands: int, elapsed_ms: float, failed: bool):
+        self.commands += commands
+        self.round_trips += 1
+        self.errors += failed
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.samples.append(elapsed_ms)
+
+    def as_dict(self) -> Dict:
+        ordered = sorted(self.samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+        return {
+            "commands": self.commands,
+            "round_trips": self.round_trips,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.round_trips, 3) if self.round_trips else 0.0,
+            "p95_ms": round(p95, 3),
+            "max_ms": round(self.max_ms, 3),
+            "total_ms": round(self.total_ms, 1),
+        }
+
+
+_stats: Dict[str, _SiteStats] = defaultdict(_SiteStats)
+_observers: List[Callable] = []
+_SKIP_MODULES = ("redis.", __name__)
+
+
+def observe_redis(callback: Callable):
+    """
+    Call callback(site, commands, elapsed_ms, failed, bytes_out, bytes_in)
+    after every round-trip, in the caller's context. Byte counts are the
+    payload sizes of arguments and replies (not protocol framing).
+    """
+    _observers.append(callback)
+
+
+def _payload_size(value) -> int:
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (list, tuple, set)):
+        return sum(_payload_size(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_payload_size(k) + _payload_size(v) for k, v in value.items())
+    if value is None:
+        return 0
+    return len(str(value))
+
+
+def _call_site() -> str:
+    """module.function of the first frame outside redis-py and this module."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_SKIP_MODULES):
+            return f"{module}.{getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def _record(site: str, commands: int, started: float, failed: bool, sent=None, reply=None):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    _stats[site].add(commands, elapsed_ms, failed)
+    for callback in _observers:
+        callback(site, commands, elapsed_ms, failed, _payload_size(sent), _payload_size(reply))
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        if not INSTRUMENT or not self.command_stack:
+            return await super().execute(raise_on_error)
+        site, commands = _call_site(), len(self.command_stack)
+        sent = [cmd[0] for cmd in self.command_stack] if _observers else None
+        started, failed, result = time.perf_counter(), True, None
+        try:
+            result = await super().execute(raise_on_error)
+            failed = False
+            return result
+        finally:
+            _record(site, commands, started, failed, sent, result if _observers else None)
+
+    async def immediate_execute_command(self, *args, **options):
+        # Commands issued while WATCHing go out one by one
+        if not INSTRUMENT:
+            return await super().immediate_execute_command(*args, **options)
+        site, started, failed, result = _call_site(), time.perf_counter(), True, None
+        try:
+            result = await super().immediate_execute_command(*args, **options)
+            failed = False
+            return result
+        finally:
+            _record(site, 1, started, failed, args, result)
 
 
-_pool = None
+class InstrumentedRedis(redis.Redis):
+    async def execute_command(self, *args, **options):
+        if not INSTRUMENT:
+            return await super().execute_command(*args, **options)
+        site, started, failed, result = _call_site(), time.perf_counter(), True, None
+        try:
+            result = await super().execute_command(*args, **options)
+            failed = False
+            return result
+        finally:
+            _record(site, 1, started, failed, args, result)
 
-async def get_redis() -> redis.Redis:
-    """Get a Redis client from the connection pool."""
-    global _pool
-    if _pool is None:
-        _pool = redis.ConnectionPool.from_url(REDIS_URL, decode_responses=True)
-    return redis.Redis(connection_pool=_pool)
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def redis_stats(top: Optional[int] = None) -> Dict[str, Dict]:
+    """Per call site counters, busiest (by commands) first."""
+    rows = sorted(_stats.items(), key=lambda kv: kv[1].commands, reverse=True)
+    return {site: s.as_dict() for site, s in rows[:top]}
+
+
+def reset_redis_stats():
+    _stats.clear()
+
+
+async def publish_redis_stats(service: str, top: int = 50):
+    """Store this process's counters under redis:callsites:{service} (JSON per site)."""
+    stats = redis_stats(top)
+    if not stats:
+        return
+    r = await get_redis()
+    try:
+        key = K_REDIS_STATS.format(service=service)
+        pipe = r.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping={site: json.dumps(row) for site, row in stats.items()})
+        pipe.hset(key, "_updated", int(time.time()))
+        pipe.expire(key, 3600)
+        await pipe.execute()
+    finally:
+        await r.aclose()
+
+
+# ─── Connection Manager ──────────────────────────────────────────────
+
+class RedisManager:
+    """Lazily created, shared connection pools for one primary (and replica)."""
+
+    def __init__(self, url: str = REDIS_URL, replica_url: str = REDIS_REPLICA_URL,
+                 pool_size: int = POOL_SIZE, pool_timeout: float = POOL_TIMEOUT):
+        self.url = url
+        self.replica_url = replica_url
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self._pools: Dict[tuple, redis.ConnectionPool] = {}
+
+    def _pool(self, url: str, decode: bool) -> redis.ConnectionPool:
+        key = (url, decode)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = redis.BlockingConnectionPool.from_url(
+                url,
+                decode_responses=decode,
+                max_connections=self.pool_size,
+                timeout=self.pool_timeout,
+                health_check_interval=HEALTH_CHECK_INTERVAL,
+                socket_timeout=SOCKET_TIMEOUT,
+                socket_connect_timeout=SOCKET_TIMEOUT,
+                socket_keepalive=True,
+                retry=Retry(ExponentialBackoff(cap=2.0, base=0.05), RETRIES),
+                retry_on_error=[RedisConnectionError, RedisTimeoutError],
+            )
+            self._pools[key] = pool
+        return pool
+
+    def client(self, decode: bool = True, readonly: bool = False) -> redis.Redis:
+        url = self.replica_url if readonly and self.replica_url else self.url
+        return InstrumentedRedis(connection_pool=self._pool(url, decode))
+
+    def pool_info(self) -> Dict[str, Dict]:
+        info = {}
+        for (url, decode), pool in self._pools.items():
+            name = url.rsplit("@", 1)[-1] + ("" if decode else " (binary)")
+            in_use = len(getattr(pool, "_in_use_connections", ()))
+            idle = len(getattr(pool, "_available_connections", ()))
+            info[name] = {"max": pool.max_connections, "in_use": in_use, "idle": idle}
+        return info
+
+    async def close(self):
+        for pool in self._pools.values():
+            await pool.disconnect()
+        self._pools.clear()
+
+
+_manager = RedisManager()
+
+
+def configure_redis(manager: Optional[RedisManager] = None, **kwargs):
+    """
+    Replace the process-wide manager before first use: a new one built from
+    kwargs (e.g. another URL), or a prepared instance (the benchmark suite
+    passes one backed by an in-process fakeredis).
+    """
+    global _manager
+    _manager = manager or RedisManager(**kwargs)
+    return _manager
+
+
+def get_redis_manager() -> RedisManager:
+    return _manager
+
+
+async def get_redis(readonly: bool = False) -> redis.Redis:
+    """Get a Redis client from the shared pool; readonly=True may go to the replica."""
+    return _manager.client(readonly=readonly)
 
 async def get_redis_client() -> redis.Redis:
     """Alias for get_redis() - backwards compatibility."""
     return await get_redis()
 
-def get_redis_sync() -> redis.Redis:
+async def get_redis_binary() -> redis.Redis:
+    """Get a Redis client that returns raw bytes (for packed binary values)."""
+    return _manager.client(decode=False)
+
+async def ping_redis() -> float:
+    """Round-trip time of a PING to the primary in ms; raises if Redis is down."""
+    r = await get_redis()
+    try:
+        started = time.perf_counter()
+        await r.ping()
+        return (time.perf_counter() - started) * 1000
+    finally:
+        await r.aclose()
+
+async def close_redis():
+    """Disconnect all shared pools (shutdown)."""
+    await _manager.close()
+
+def get_redis_sync():
     """Get a synchronous Redis client (for scripts)."""
-    return redis.from_url(REDIS_URL, decode_responses=True)
+    import redis as redis_sync
+    return redis_sync.from_url(_manager.url, decode_responses=True)
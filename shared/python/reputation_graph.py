@@ -0,0 +1,211 @@
+"""
+Reputation graph analysis for the trust recalculation.
+
+The giver -> receiver points of a guild (rep:giver_counts:{uid}, one hash
+per receiver) are loaded in one pipelined sweep into a compact graph:
+node ids plus NumPy edge arrays, indexed CSR-style by giver. All users are
+then analyzed at once:
+
+  reciprocity         share of the points a user received from people they
+                      also gave points to
+  reciprocal_donors   top-3 donors (more than 2 points) the user gave back
+                      to; the pairwise clique check of the trust formula
+  ring                strongly connected component of three or more users
+                      over edges of at least RING_MIN_POINTS points: a
+                      group passing points around in a cycle (A -> B -> C
+                      -> A), invisible to a pairwise check. Its density
+                      (edges / possible edges) and each member's share of
+                      points received from inside the ring give the ring
+                      penalty.
+
+Pure computation apart from load_graph(); the engine decides what to store.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+RING_MIN_POINTS = 2     # points on an edge before it can form a ring
+RING_MIN_SIZE = 3       # pairs are covered by the reciprocity check
+RING_MIN_DENSITY = 0.5
+RING_PENALTY = 2.0      # abuse score of a fully dense ring feeding all of a member's points
+RECIPROCAL_MIN_POINTS = 3
+TOP_DONORS = 3
+
+
+class RepGraph:
+    """Weighted giver -> receiver graph with edges sorted by giver."""
+
+    def __init__(self, nodes: List[str], src: np.ndarray, dst: np.ndarray, points: np.ndarray):
+        self.nodes = nodes
+        self.index = {uid: i for i, uid in enumerate(nodes)}
+        order = np.lexsort((dst, src))
+        self.src = src[order]
+        self.dst = dst[order]
+        self.points = points[order]
+        self.indptr = np.searchsorted(self.src, np.arange(len(nodes) + 1))
+        # Same edges grouped by receiver
+        self._by_dst = np.argsort(self.dst, kind="stable")
+        self._dst_indptr = np.searchsorted(self.dst[self._by_dst], np.arange(len(nodes) + 1))
+
+    @classmethod
+    def from_counts(cls, giver_counts: Dict[str, Dict[str, int]]) -> "RepGraph":
+        """giver_counts: receiver -> {giver: points}."""
+        nodes: List[str] = []
+        index: Dict[str, int] = {}
+
+        def node(uid: str) -> int:
+            if uid not in index:
+                index[uid] = len(nodes)
+                nodes.append(uid)
+            return index[uid]
+
+        src, dst, points = [], [], []
+        for receiver, givers in giver_counts.items():
+            to = node(receiver)
+            for giver, count in givers.items():
+                if int(count) > 0 and giver != receiver:
+                    src.append(node(giver))
+                    dst.append(to)
+                    points.append(int(count))
+        return cls(nodes, np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64),
+                   np.array(points, dtype=np.int64))
+
+    def donors(self, uid: str) -> Dict[str, int]:
+        """giver -> points received by uid."""
+        i = self.index.get(uid)
+        if i is None:
+            return {}
+        edges = self._by_dst[self._dst_indptr[i]:self._dst_indptr[i + 1]]
+        return {self.nodes[g]: int(p) for g, p in zip(self.src[edges], self.points[edges])}
+
+    def receivers(self, uid: str) -> List[str]:
+        """Users uid gave points to."""
+        i = self.index.get(uid)
+        if i is None:
+            return []
+        return [self.nodes[j] for j in self.dst[self.indptr[i]:self.indptr[i + 1]]]
+
+
+async def load_graph(r, receivers: List[str], chunk: int = 1000) -> RepGraph:
+    """HGETALL rep:giver_counts of every receiver, pipelined in chunks."""
+    giver_counts: Dict[str, Dict[str, int]] = {}
+    for start in range(0, len(receivers), chunk):
+        batch = receivers[start:start + chunk]
+        pipe = r.pipeline(transaction=False)
+        for uid in batch:
+            pipe.hgetall(f"rep:giver_counts:{uid}")
+        for uid, counts in zip(batch, await pipe.execute()):
+            if counts:
+                giver_counts[uid] = counts
+    return RepGraph.from_counts(giver_counts)
+
+
+def strongly_connected_components(n: int, indptr: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Component label of every node (iterative Tarjan over CSR adjacency)."""
+    ptr = indptr.tolist()
+    adj = targets.tolist()
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack: List[int] = []
+    labels = np.full(n, -1, dtype=np.int64)
+    counter = 0
+    label = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, ptr[root])]
+        while work:
+            v, i = work[-1]
+            if i < ptr[v + 1]:
+                work[-1] = (v, i + 1)
+                w = adj[i]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, ptr[w]))
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[v] < low[parent]:
+                    low[parent] = low[v]
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    labels[w] = label
+                    if w == v:
+                        break
+                label += 1
+    return labels
+
+
+def analyze(graph: RepGraph) -> Dict[str, Dict]:
+    """
+    Per receiver: {"reciprocity", "reciprocal_donors", "ring_size",
+    "ring_density", "ring_share", "ring_penalty"}.
+    """
+    n = len(graph.nodes)
+    src, dst, points = graph.src, graph.dst, graph.points
+    if n == 0 or len(src) == 0:
+        return {}
+
+    received = np.bincount(dst, weights=points, minlength=n)
+
+    # Reciprocity: is the reverse edge present?
+    keys = src * n + dst
+    reverse = dst * n + src
+    mutual = np.isin(reverse, keys)
+    reciprocity = np.divide(np.bincount(dst, weights=points * mutual, minlength=n), received,
+                            out=np.zeros(n), where=received > 0)
+
+    # Top donors per receiver (most points first, ties by node order), given back to
+    order = np.lexsort((src, -points, dst))
+    first = np.searchsorted(dst[order], dst[order], side="left")
+    rank = np.arange(len(order)) - first
+    top = order[rank < TOP_DONORS]
+    flagged = top[(points[top] >= RECIPROCAL_MIN_POINTS) & mutual[top]]
+    reciprocal_donors = np.bincount(dst[flagged], minlength=n)
+
+    # Rings: SCCs over the strong edges (already sorted by giver)
+    strong = points >= RING_MIN_POINTS
+    s_src, s_dst = src[strong], dst[strong]
+    s_indptr = np.searchsorted(s_src, np.arange(n + 1))
+    labels = strongly_connected_components(n, s_indptr, s_dst)
+    sizes = np.bincount(labels)
+    inside = (labels[s_src] == labels[s_dst])
+    internal_edges = np.bincount(labels[s_src[inside]], minlength=len(sizes))
+    possible = sizes * (sizes - 1)
+    density = np.divide(internal_edges, possible, out=np.zeros(len(sizes)), where=possible > 0)
+
+    same_ring = labels[src] == labels[dst]
+    from_ring = np.bincount(dst[same_ring], weights=points[same_ring], minlength=n)
+    ring_share = np.divide(from_ring, received, out=np.zeros(n), where=received > 0)
+
+    node_size = sizes[labels]
+    node_density = density[labels]
+    in_ring = (node_size >= RING_MIN_SIZE) & (node_density >= RING_MIN_DENSITY)
+    ring_penalty = np.where(in_ring, RING_PENALTY * node_density * ring_share, 0.0)
+
+    result = {}
+    for i in np.flatnonzero(received > 0):
+        ring = bool(in_ring[i])
+        result[graph.nodes[i]] = {
+            "reciprocity": round(float(reciprocity[i]), 3),
+            "reciprocal_donors": int(reciprocal_donors[i]),
+            "ring_size": int(node_size[i]) if ring else 0,
+            "ring_density": round(float(node_density[i]), 3) if ring else 0.0,
+            "ring_share": round(float(ring_share[i]), 3) if ring else 0.0,
+            "ring_penalty": round(float(ring_penalty[i]), 3),
+        }
+    return result
@@ -0,0 +1,176 @@
+"""
+Micro-batched sentiment classification on top of the LLM scheduler.
+
+Messages are collected for up to BATCH_WINDOW_MS or BATCH_SIZE items and
+classified with one numbered prompt ("1: NEGATIVE", "2: NEUTRAL", ...), so
+the model's fixed per-request cost (prompt setup, template, load checks) is
+paid once per batch instead of once per message. Items the model leaves out
+of its answer are retried on their own.
+
+Messages with crisis cues (despair, relapse, survival keyword groups or
+self-harm wording) skip the batch window and the lexical pre-classifier:
+classify_now() sends them alone at SUMMARY priority and without a
+deadline, so a possible URGENT is never delayed or dropped.
+"""
+
+import asyncio
+import os
+import re
+from typing import List, Optional
+
+from .llm_scheduler import LLMJobDropped, LLMScheduler, Priority
+from .pattern_logic import KeywordMatcher, get_keyword_hits
+
+LABELS = ("POSITIVE", "NEUTRAL", "NEGATIVE", "URGENT")
+BATCH_WINDOW_MS = int(os.getenv("SENTIMENT_BATCH_WINDOW_MS", "500"))
+BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "16"))
+MAX_CHARS = 500  # per message in the prompt
+CRISIS_GROUPS = ("despair", "relapse_word", "survival")
+
+# Suicide and self-harm wording the keyword groups do not cover (with and without diacritics)
+SELF_HARM_CUES = [
+    "zabít", "zabit", "zabiju", "zabij se", "umřít", "umrit", "umřu", "umru", "zemřít", "zemrit",
+    "smrt", "smrti", "sebevra", "suicid", "nechci žít", "nechci zit", "nechci už žít", "nechci uz zit",
+    "smysl žít", "smysl zit", "nechci se probudit", "neprobudit", "ukončit to", "ukoncit to",
+    "ukončit život", "ukoncit zivot", "řezal", "rezal", "řežu", "rezu", "řezat", "rezat", "pořezal",
+    "porezal", "sebepoškoz", "sebeposkoz", "prášky", "prasky", "prášků", "prasku", "předávkov",
+    "predavkov", "celé balení", "cele baleni", "oběsit", "obesit", "oběsím", "obesim", "provaz",
+    "skočit z", "skocit z", "pod vlak", "nechyběl", "nechybel", "nechyběla", "nechybela",
+    "bez mě by", "bez me by", "beze mě", "beze me", "zmizet navždy", "zmizet navzdy",
+    "to ukončit", "to ukoncit", "na rozloučenou", "na rozloucenou", "důvod pokračovat", "duvod pokracovat",
+    "důvod žít", "duvod zit", "noc navždy", "noc navzdy",
+]
+_SELF_HARM = KeywordMatcher({"self_harm": SELF_HARM_CUES})
+
+OPTIONS = {"temperature": 0.1}
+TOKENS_PER_ITEM = 8  # "12: NEGATIVE\n" with some slack
+
+_LINE_RE = re.compile(r"^\W*(\d+)\W+(POSITIVE|NEUTRAL|NEGATIVE|URGENT)\b")
+
+
+def single_prompt(text: str) -> str:
+    return (
+        "Analyze the sentiment of this message from a user in a recovery community. "
+        "Respond with EXACTLY one of these words: POSITIVE, NEUTRAL, NEGATIVE, or URGENT.\n\n"
+        f"Message: {text[:MAX_CHARS]}"
+    )
+
+
+def batch_prompt(texts: List[str]) -> str:
+    numbered = "\n".join(f"{i}. {' '.join(t[:MAX_CHARS].split())}" for i, t in enumerate(texts, 1))
+    return (
+        "Analyze the sentiment of each numbered message from users in a recovery community. "
+        "For every message answer on its own line as `<number>: <LABEL>` where LABEL is EXACTLY "
+        "one of POSITIVE, NEUTRAL, NEGATIVE, or URGENT. Answer all "
+        f"{len(texts)} messages and write nothing else.\n\n{numbered}"
+    )
+
+
+def parse_single(response: str) -> str:
+    result = response.upper()
+    # Clean up response in case it returned more text
+    for word in LABELS:
+        if word in result:
+            return word
+    return "NEUTRAL"
+
+
+def parse_batch(response: str, n: int) -> List[Optional[str]]:
+    """Labels for items 1..n from a numbered answer; None where the model skipped an item."""
+    labels: List[Optional[str]] = [None] * n
+    for line in response.upper().splitlines():
+        m = _LINE_RE.match(line)
+        if m and 1 <= int(m.group(1)) <= n:
+            labels[int(m.group(1)) - 1] = m.group(2)
+    return labels
+
+
+def has_crisis_cues(text: str) -> bool:
+    if _SELF_HARM.hits(text).get("self_harm"):
+        return True
+    hits = get_keyword_hits(text)
+    return any(hits.get(group) for group in CRISIS_GROUPS)
+
+
+class SentimentBatcher:
+    def __init__(self, llm: LLMScheduler, model: str, max_age: float = None,
+                 window_ms: int = BATCH_WINDOW_MS, batch_size: int = BATCH_SIZE):
+        self.llm = llm
+        self.model = model
+        self.max_age = max_age
+        self.window = window_ms / 1000
+        self.batch_size = max(1, batch_size)
+        self._pending = []  # (text, future)
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._running = set()  # batch tasks, referenced until they finish
+        self.batches = 0
+        self.items = 0
+        self.retried = 0
+
+    def submit(self, text: str) -> asyncio.Future:
+        """Queue `text` for the next batch; the future resolves to a label."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return future
+
+    def classify_now(self, text: str) -> asyncio.Future:
+        """Fast path: classify alone, ahead of background sentiment and without a deadline."""
+        job = self.llm.submit(self.model, single_prompt(text), Priority.SUMMARY,
+                              options={**OPTIONS, "num_predict": 5}, timeout=30.0)
+        return asyncio.ensure_future(self._single(job))
+
+    def _flush(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch):
+        texts = [text for text, _ in batch]
+        try:
+            if len(batch) == 1:
+                labels = [await self._ask_single(texts[0])]
+            else:
+                response = await self.llm.submit(
+                    self.model, batch_prompt(texts), Priority.SENTIMENT,
+                    options={**OPTIONS, "num_predict": TOKENS_PER_ITEM * len(texts)},
+                    timeout=10.0 + 2.0 * len(texts), max_age=self.max_age,
+                )
+                labels = parse_batch(response, len(texts))
+                missing = [i for i, label in enumerate(labels) if label is None]
+                self.retried += len(missing)
+                for i, label in zip(missing, await asyncio.gather(
+                        *(self._ask_single(texts[i]) for i in missing), return_exceptions=True)):
+                    labels[i] = label if isinstance(label, str) else None
+            self.batches += 1
+            self.items += len(batch)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), label in zip(batch, labels):
+            if future.done():
+                continue
+            if label is None:
+                future.set_exception(LLMJobDropped("unanswered"))
+            else:
+                future.set_result(label)
+
+    async def _ask_single(self, text: str) -> str:
+        """Classify one item alone; a full queue fails only this item."""
+        job = self.llm.submit(self.model, single_prompt(text), Priority.SENTIMENT,
+                              options={**OPTIONS, "num_predict": 5}, timeout=10.0, max_age=self.max_age)
+        return parse_single(await job)
+
+    @staticmethod
+    async def _single(job: asyncio.Future) -> str:
+        return parse_single(await job)
@@ -0,0 +1,77 @@
+"""
+Lexical pre-classifier for chat sentiment.
+
+Most chat is short chit-chat ("díky, taky", "dobré ráno všem") that the
+model labels NEUTRAL or POSITIVE anyway. prefilter() labels such messages
+directly and returns None for everything else, which still goes to the LLM.
+Only an explicit allowlist is labeled locally:
+
+  * crisis or self-harm wording (has_crisis_cues) -> LLM, always first
+  * every word of the message in CHITCHAT_WORDS (greetings, thanks,
+    acknowledgements, small talk), at most CHITCHAT_MAX_WORDS words and no
+    emoji but positive ones -> POSITIVE with a positive word or emoji,
+    NEUTRAL otherwise
+  * anything else, however short -> LLM
+
+A word outside the allowlist ("zabít", "prášky", "nechyběl", a name, a
+typo) is enough to ask the model, so a message the model would call URGENT
+or NEGATIVE can only be labeled here if it is written entirely in
+greetings and thanks. scripts/benchmarks/bench_sentiment_prefilter.py
+measures the avoided calls, the agreement with the model on a labeled
+sample and that no message of its crisis set is labeled locally.
+"""
+
+import re
+from typing import Optional
+
+from .pattern_logic import normalize_text
+from .sentiment_batch import has_crisis_cues
+
+CHITCHAT_MAX_WORDS = 12
+
+# Words that carry a positive label on their own
+POSITIVE_WORDS = {
+    "díky", "diky", "dík", "dik", "děkuji", "dekuji", "děkuju", "dekuju", "děkujeme", "dekujeme",
+    "mockrát", "mockrat", "super", "paráda", "parada", "fajn", "skvělé", "skvele", "skvělý", "skvely",
+    "výborně", "vyborne", "gratuluji", "gratuluju", "gratulace", "vítej", "vitej", "vítejte", "vitejte",
+    "hezký", "hezky", "hezkou", "hezké", "hezke", "pěkný", "pekny", "pěkné", "pekne", "krásný",
+    "krasny", "krásné", "krasne", "dobré", "dobre", "dobrý", "dobry", "dobrou", "palec", "drž", "drz",
+    "zvládneš", "zvladnes",
+}
+
+CHITCHAT_WORDS = POSITIVE_WORDS | {
+    # Greetings
+    "ahoj", "ahojte", "čau", "cau", "čauky", "cauky", "nazdar", "zdravím", "zdravim", "zdravíčko",
+    "zdravicko", "ráno", "rano", "den", "odpoledne", "večer", "vecer", "noc", "víkend", "vikend",
+    "všem", "vsem", "všichni", "vsichni", "lidi", "přeji", "preji", "přeju", "preju",
+    # Small words of thanks and replies
+    "moc", "taky", "také", "take", "ty", "tobě", "tobe", "vám", "vam", "ti", "vy", "se", "mám", "mam",
+    "máš", "mas", "jak", "to", "je", "a", "i", "k", "ke", "na", "v", "ve", "za", "s", "tak", "teda", "tedy",
+    # Acknowledgements
+    "ok", "okay", "oki", "jo", "jasně", "jasne", "jj", "souhlas", "přesně", "presne", "rozumím",
+    "rozumim", "chápu", "chapu",
+    # Small talk about plans
+    "zítra", "zitra", "dnes", "dneska", "pak", "uvidíme", "uvidime", "ozvu", "brzy", "hned", "jdu",
+    "spát", "spat", "do", "práce", "prace", "práci", "praci", "dnům", "dnum", "dnů", "dnu",
+}
+
+_WORD = re.compile(r"\w+")
+_POSITIVE_EMOJI = re.compile("[\U0001F600-\U0001F60D\U0001F642\U0001F917\U0001F44D\U0001F64F❤\U0001F49A\U0001F4AA]")
+# Words, spaces, punctuation and emoji modifiers; any other symbol (😢, 💊) goes to the model
+_PLAIN = re.compile(r"[\w\s.,!?…:;'\"()\-\ufe0f\u200d\U0001F3FB-\U0001F3FF]")
+
+
+def prefilter(text: str) -> Optional[str]:
+    """NEUTRAL or POSITIVE when the message is allowlisted chit-chat, None to ask the model."""
+    if has_crisis_cues(text):
+        return None
+    words = _WORD.findall(normalize_text(text))
+    if not words or len(words) > CHITCHAT_MAX_WORDS:
+        return None
+    if any(w not in CHITCHAT_WORDS and not w.isdigit() for w in words):
+        return None
+    if _POSITIVE_EMOJI.sub("", _PLAIN.sub("", text)):
+        return None
+    if any(w in POSITIVE_WORDS for w in words) or _POSITIVE_EMOJI.search(text):
+        return "POSITIVE"
+    return "NEUTRAL"